@@ -0,0 +1,97 @@
+"""Memory benchmark for conversation history representations.
+
+Compares per-message dicts with the slotted ``Message`` type for many
+in-memory sessions.
+
+Usage:
+    uv run python -m benchmarks.bench_message_memory --sessions 1000 --messages 50
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from services.message import Message
+
+
+def measure(build: Callable[[], Any]) -> tuple[int, Any]:
+    """Measure the memory allocated by a builder.
+
+    Args:
+        build: Function building the data to measure.
+
+    Returns:
+        Tuple of allocated bytes and the built data, kept alive while measuring.
+    """
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, data
+
+
+def build_sessions(
+    sessions: int, messages: int, contents: list[str], compact: bool
+) -> list[list[Any]]:
+    """Build histories for many sessions.
+
+    Message contents are shared between both representations so only the
+    per-message overhead is compared.
+
+    Args:
+        sessions: Number of sessions.
+        messages: Messages per session.
+        contents: Message texts to reuse.
+        compact: Build ``Message`` objects instead of dicts.
+
+    Returns:
+        One history list per session.
+    """
+    now = time.time()
+    histories = []
+    for _ in range(sessions):
+        history: list[Any] = []
+        for i in range(messages):
+            # Roles come from decoded JSON or the API, so they are not interned
+            role = "".join(("user",) if i % 2 == 0 else ("assist", "ant"))
+            content = contents[i % len(contents)]
+            if compact:
+                history.append(Message(role, content, tokens=len(content) // 4, created_at=now))
+            else:
+                history.append(
+                    {
+                        "role": role,
+                        "content": content,
+                        "tokens": len(content) // 4,
+                        "created_at": now,
+                    }
+                )
+        histories.append(history)
+    return histories
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description="Message history memory benchmark")
+    parser.add_argument("--sessions", type=int, default=1000, help="Number of sessions")
+    parser.add_argument("--messages", type=int, default=50, help="Messages per session")
+    args = parser.parse_args()
+
+    contents = [f"Sample message {i} " * 8 for i in range(64)]
+    total = args.sessions * args.messages
+
+    dict_bytes, _ = measure(lambda: build_sessions(args.sessions, args.messages, contents, False))
+    slot_bytes, _ = measure(lambda: build_sessions(args.sessions, args.messages, contents, True))
+
+    print(f"{args.sessions} sessions x {args.messages} messages ({total} messages)")
+    print(f"dict history:    {dict_bytes / 1e6:8.2f} MB ({dict_bytes / total:6.1f} B/message)")
+    print(f"Message history: {slot_bytes / 1e6:8.2f} MB ({slot_bytes / total:6.1f} B/message)")
+    print(f"saving:          {(1 - slot_bytes / dict_bytes) * 100:8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
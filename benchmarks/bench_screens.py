@@ -0,0 +1,348 @@
+"""UI build and update micro-benchmarks for the screens.
+
+Builds ``ProviderScreen`` parts for growing provider counts and runs
+``ChatScreen`` turns on growing transcripts against a recording page. The
+page diffs its mounted controls with Flet's own patch code and encodes the
+patches as the socket server would, so the byte counts are what a browser
+session would receive.
+
+Results are compared with the tracked baselines in
+``benchmarks/baselines/bench_screens.json``. Control counts and payload
+sizes are deterministic and fail the check when they grow beyond the
+tolerance; timings depend on the machine and are only reported.
+
+Usage:
+    uv run python -m benchmarks.bench_screens
+    uv run python -m benchmarks.bench_screens --check
+    uv run python -m benchmarks.bench_screens --save-baseline
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+import msgpack
+from flet.controls.base_control import BaseControl
+from flet.controls.object_patch import ObjectPatch
+from flet.messaging.protocol import configure_encode_object_for_msgpack
+
+from benchmarks.load_generator import StandInProvider
+from screens.chat_screen import ChatScreen
+from screens.provider_screen import ProviderScreen
+from services.conversation_store import ConversationStore
+from services.message import Message
+from services.provider_manager import ProviderSettings
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "bench_screens.json"
+
+# Metrics that do not depend on the machine and are checked against the baseline
+CHECKED_METRICS = ("controls", "bytes", "updates", "bytes_per_update")
+
+
+class RecordingPage:
+    """Page stand-in that measures what each ``update()`` would send.
+
+    Mounted controls are diffed against their last sent state on every
+    update, like ``Session.patch_control`` does, and the patch is encoded
+    with msgpack. Background work runs inline so a measured call includes
+    everything it triggers.
+    """
+
+    def __init__(self) -> None:
+        """Initialize recording page."""
+        self.dialog: Any = None
+        self.banner: Any = None
+        self.roots: list[BaseControl] = []
+        self.update_sizes: list[int] = []
+        self._encode = configure_encode_object_for_msgpack(BaseControl)
+
+    def _send(self, prev: BaseControl | None, control: BaseControl) -> tuple[int, int]:
+        """Diff a control and encode the patch.
+
+        Args:
+            prev: Previously sent control, or None for a first render.
+            control: Control to send.
+
+        Returns:
+            Tuple of encoded bytes (0 when nothing changed) and the number of
+            controls added.
+        """
+        patch, added, _ = ObjectPatch.from_diff(prev, control, control_cls=BaseControl)
+        message = patch.to_message()
+        if len(message) <= 1:
+            return 0, len(added)
+        return len(msgpack.packb(message, default=self._encode)), len(added)
+
+    def mount(self, control: BaseControl) -> tuple[int, int]:
+        """Render a control for the first time.
+
+        Args:
+            control: Root control to show.
+
+        Returns:
+            Tuple of encoded bytes and number of controls in the tree.
+        """
+        self.roots.append(control)
+        return self._send(None, control)
+
+    def update(self, *controls: BaseControl) -> None:
+        # The chat screen shows itself by setting ``page.dialog``
+        if self.dialog is not None and self.dialog not in self.roots:
+            self.mount(self.dialog)
+        size = sum(self._send(root, root)[0] for root in controls or self.roots)
+        self.update_sizes.append(size)
+
+    def run_thread(self, handler: Callable[..., Any], *args: Any) -> None:
+        handler(*args)
+
+    def run_task(self, handler: Callable[..., Any], *args: Any) -> None:
+        # Focusing controls needs a connected client; there is none here
+        return None
+
+
+@dataclass
+class BenchResult:
+    """Measurements of one benchmark case."""
+    name: str
+    ms: float
+    controls: int = 0
+    bytes: int = 0
+    updates: int = 0
+    bytes_per_update: int = 0
+
+
+def timed(run: Callable[[], Any], repeat: int) -> tuple[float, Any]:
+    """Time a function.
+
+    Args:
+        run: Function to time.
+        repeat: Number of runs.
+
+    Returns:
+        Tuple of the median time in milliseconds and the last result.
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def provider_screen(providers: int) -> ProviderScreen:
+    """Build a provider screen with a number of providers.
+
+    Args:
+        providers: Total number of providers, including the default one.
+
+    Returns:
+        Provider screen on a recording page.
+    """
+    screen = ProviderScreen(RecordingPage())
+    for i in range(1, providers):
+        screen.provider_manager.add_provider(ProviderSettings(name=f"Provider{i}", api_key=""))
+    return screen
+
+
+def bench_provider_screen(providers: int, repeat: int) -> list[BenchResult]:
+    """Benchmark building the provider screen and its parts.
+
+    Args:
+        providers: Number of providers.
+        repeat: Runs per timing.
+
+    Returns:
+        Results for the full build, the sidebar and the form.
+    """
+    screen = provider_screen(providers)
+    results = []
+    for name, build in (
+        ("build", screen.build),
+        ("sidebar", screen._build_sidebar),
+        ("form", screen._build_provider_form),
+    ):
+        ms, control = timed(build, repeat)
+        size, controls = RecordingPage().mount(control)
+        results.append(BenchResult(f"provider_{name}[{providers}]", ms, controls, size))
+    return results
+
+
+def bench_chat_turn(messages: int, tokens: int, repeat: int, store_dir: Path) -> BenchResult:
+    """Benchmark a chat turn on a transcript of a given length.
+
+    Args:
+        messages: Messages already in the conversation.
+        tokens: Tokens streamed per reply.
+        repeat: Number of turns to send.
+        store_dir: Directory for the conversation log.
+
+    Returns:
+        Turn time with page updates and bytes sent per turn.
+    """
+    store = ConversationStore(store_dir / f"chat-{messages}")
+    for i in range(messages):
+        role = "user" if i % 2 == 0 else "assistant"
+        store.append("bench", Message(role, f"Message {i} " + "lorem ipsum " * 20).to_record())
+
+    page = RecordingPage()
+    chat = ChatScreen(page, store=store, conversation_id="bench")
+    chat.mistral_api.client = StandInProvider(tokens=tokens, ttft=0, interval=0)
+    page.dialog = chat.build()
+    _, controls = page.mount(page.dialog)
+    page.update_sizes.clear()
+
+    def turn() -> None:
+        chat.send_message("Benchmark message", chat.input_field)
+
+    ms, _ = timed(turn, repeat)
+    chat.updates.close()
+    sent = sum(page.update_sizes)
+    updates = len(page.update_sizes)
+    return BenchResult(
+        f"chat_turn[{messages}]",
+        ms,
+        controls,
+        sent // repeat,
+        round(updates / repeat),
+        sent // max(updates, 1),
+    )
+
+
+def run_benchmarks(
+    providers: list[int], messages: list[int], tokens: int, repeat: int
+) -> list[BenchResult]:
+    """Run every benchmark case.
+
+    Args:
+        providers: Provider counts for the provider screen.
+        messages: Transcript lengths for chat turns.
+        tokens: Tokens streamed per reply.
+        repeat: Runs per case.
+
+    Returns:
+        All results.
+    """
+    results = []
+    for count in providers:
+        results.extend(bench_provider_screen(count, repeat))
+    with tempfile.TemporaryDirectory(prefix="flet-chat-bench-") as temp_dir:
+        for count in messages:
+            results.append(bench_chat_turn(count, tokens, repeat, Path(temp_dir)))
+    return results
+
+
+def compare(
+    results: list[BenchResult], baseline: dict[str, dict[str, float]], tolerance: float
+) -> tuple[list[list[str]], list[str]]:
+    """Compare results with the baseline.
+
+    Args:
+        results: Current results.
+        baseline: Baseline metrics per case.
+        tolerance: Allowed relative growth of checked metrics.
+
+    Returns:
+        Tuple of table rows and regression messages.
+    """
+    rows = []
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name, {})
+        row = [result.name]
+        for metric in ("ms", *CHECKED_METRICS):
+            value = getattr(result, metric)
+            cell = f"{value:.2f}" if metric == "ms" else str(value)
+            if base.get(metric):
+                change = value / base[metric] - 1
+                cell += f" ({change:+.0%})"
+                if metric in CHECKED_METRICS and change > tolerance:
+                    regressions.append(
+                        f"{result.name} {metric}: {base[metric]} -> {value} ({change:+.0%})"
+                    )
+            row.append(cell)
+        rows.append(row)
+    return rows, regressions
+
+
+def format_table(rows: list[list[str]]) -> str:
+    """Format rows as a text table.
+
+    Args:
+        rows: Table rows without header.
+
+    Returns:
+        Table text.
+    """
+    lines = [["case", "ms", *CHECKED_METRICS], *rows]
+    widths = [max(len(line[column]) for line in lines) for column in range(len(lines[0]))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(line, widths, strict=True)).rstrip()
+        for line in lines
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the screen benchmarks.
+
+    Args:
+        argv: Command line arguments. Defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark screen builds and updates")
+    parser.add_argument("--providers", default="1,10,100", help="Provider counts")
+    parser.add_argument("--messages", default="0,100,1000", help="Transcript lengths")
+    parser.add_argument("--tokens", type=int, default=100, help="Tokens per streamed reply")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="Allowed growth of checked metrics"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="Exit with an error on regressions"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Write the results as the new baseline"
+    )
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+    with tempfile.TemporaryDirectory(prefix="flet-chat-bench-data-") as data_dir:
+        # Keep ledgers and indexes of the benchmark out of the real data
+        os.environ["FLET_CHAT_DATA_DIR"] = data_dir
+        results = run_benchmarks(
+            [int(count) for count in args.providers.split(",")],
+            [int(count) for count in args.messages.split(",")],
+            args.tokens,
+            args.repeat,
+        )
+
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    rows, regressions = compare(results, baseline, args.tolerance)
+    print(format_table(rows))
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        data = {result.name: asdict(result) for result in results}
+        for metrics in data.values():
+            del metrics["name"]
+            metrics["ms"] = round(metrics["ms"], 3)
+        args.baseline.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+        print(f"Saved baseline to {args.baseline}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""Multi-session load generator for the chat UI.
+
+Simulates concurrent browser sessions, each building its own
+``ProviderScreen`` and driving the real ``ChatScreen`` code paths (open the
+chat, send, stream the reply, close) against a local stand-in provider.
+Reports per-session memory, event-loop lag and reply latency percentiles
+for each concurrency level.
+
+Usage:
+    uv run python -m benchmarks.load_generator --sessions 1,10,50 --turns 3
+    uv run python -m benchmarks.load_generator --cassette recorded.jsonl --speed 0
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+from screens.chat_screen import ChatScreen
+from screens.provider_screen import ProviderScreen
+from services.app_context import AppContext
+from services.cassette import Cassette, ReplayClient
+from services.conversation_store import ConversationStore
+from services.mistral_api import MistralAPI
+from services.usage_ledger import UsageLedger
+
+
+class _Body(dict):
+    """Response body with the SDK model interface."""
+
+    def model_dump(self) -> dict[str, Any]:
+        return dict(self)
+
+
+class StandInStream:
+    """Synthetic chat stream with the SDK event stream interface."""
+
+    def __init__(self, tokens: int, ttft: float, interval: float) -> None:
+        """Initialize stand-in stream.
+
+        Args:
+            tokens: Number of tokens to stream.
+            ttft: Delay before the first token, in seconds.
+            interval: Delay between tokens, in seconds.
+        """
+        self.tokens = tokens
+        self.ttft = ttft
+        self.interval = interval
+
+    def __enter__(self) -> "StandInStream":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        return None
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        time.sleep(self.ttft)
+        for i in range(self.tokens):
+            if i:
+                time.sleep(self.interval)
+            chunk = _Body(choices=[{"delta": {"content": f"token{i} "}}])
+            if i == self.tokens - 1:
+                chunk["usage"] = {"prompt_tokens": 10, "completion_tokens": self.tokens}
+            yield SimpleNamespace(data=chunk)
+
+
+class StandInProvider:
+    """Local stand-in for the Mistral SDK client streaming synthetic replies."""
+
+    def __init__(self, tokens: int = 50, ttft: float = 0.2, interval: float = 0.01) -> None:
+        """Initialize stand-in provider.
+
+        Args:
+            tokens: Tokens per reply.
+            ttft: Delay before the first token, in seconds.
+            interval: Delay between tokens, in seconds.
+        """
+        self.tokens = tokens
+        self.ttft = ttft
+        self.interval = interval
+        self.chat = SimpleNamespace(stream=self._stream)
+        self.models = SimpleNamespace(list=self._list_models)
+
+    def _stream(self, **request: Any) -> StandInStream:
+        return StandInStream(self.tokens, self.ttft, self.interval)
+
+    def _list_models(self, **request: Any) -> _Body:
+        return _Body(data=[{"id": "mistral-medium-latest"}])
+
+
+class LoadPage:
+    """Page stand-in for one browser session.
+
+    Handlers run on threads as in Flet web mode, and every ``update()``
+    schedules a callback on the shared event loop like sending a patch to
+    the session's connection would.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Initialize load page.
+
+        Args:
+            loop: Event loop serving all sessions.
+        """
+        self.loop = loop
+        self.dialog: Any = None
+        self.banner: Any = None
+        self.update_count = 0
+        self._lock = threading.Lock()
+
+    def update(self, *controls: Any) -> None:
+        with self._lock:
+            self.update_count += 1
+        self.loop.call_soon_threadsafe(lambda: None)
+
+    def run_thread(self, handler: Callable[..., Any], *args: Any) -> None:
+        threading.Thread(target=handler, args=args, daemon=True).start()
+
+    def run_task(self, handler: Callable[..., Any], *args: Any) -> None:
+        # Focusing controls needs a connected client; there is none here
+        return None
+
+
+@dataclass
+class Session:
+    """One simulated browser session and its measurements."""
+    index: int
+    page: LoadPage
+    screen: ProviderScreen | None = None
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def chat(self) -> ChatScreen:
+        """The session's open chat screen."""
+        assert self.screen is not None and self.screen.chat_screen is not None
+        return self.screen.chat_screen
+
+
+@dataclass
+class LevelReport:
+    """Results of one concurrency level."""
+    sessions: int
+    turns: int
+    errors: int
+    memory_per_session: float | None
+    loop_lag: list[float]
+    latencies: list[float]
+    ttfts: list[float]
+    updates_per_turn: float
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    """Get a nearest-rank percentile.
+
+    Args:
+        values: Sample values.
+        p: Percentile between 0 and 100.
+
+    Returns:
+        The percentile, or None without samples.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def open_session(session: Session, context: AppContext) -> None:
+    """Build the provider screen and open its chat window.
+
+    Args:
+        session: Session to open.
+        context: State shared by the sessions, as in the web deployment.
+    """
+    screen = session.screen = ProviderScreen(session.page, context, f"load-{session.index}")
+    screen.build()
+    screen.open_chat_window(None)
+
+
+def run_turns(session: Session, turns: int, timeout: float = 120.0) -> None:
+    """Send messages and wait for each streamed reply.
+
+    Args:
+        session: Open session.
+        turns: Number of messages to send.
+        timeout: Maximum time to wait for one reply, in seconds.
+    """
+    chat = session.chat
+    for turn in range(turns):
+        start = time.perf_counter()
+        chat.send_message(f"Load test message {turn}", chat.input_field)
+        while chat.is_generating:
+            if time.perf_counter() - start > timeout:
+                chat.stop_generation()
+                session.errors += 1
+                break
+            time.sleep(0.002)
+        session.latencies.append(time.perf_counter() - start)
+        if chat.transcript.entries[-1].role == "error":
+            session.errors += 1
+
+
+async def monitor_loop(lags: list[float], stop: asyncio.Event, interval: float = 0.01) -> None:
+    """Measure how late the event loop wakes up from short sleeps.
+
+    Args:
+        lags: List receiving each lag in seconds.
+        stop: Event ending the measurement.
+        interval: Sleep interval in seconds.
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - start - interval))
+
+
+async def run_level(
+    sessions: int,
+    turns: int,
+    client_factory: Callable[[], Any],
+    store_dir: Path,
+    measure_memory: bool = True,
+) -> LevelReport:
+    """Run one concurrency level.
+
+    Args:
+        sessions: Number of concurrent sessions.
+        turns: Messages sent per session.
+        client_factory: Builds the SDK client stand-in of an API client.
+        store_dir: Directory for conversation logs.
+        measure_memory: Trace allocations to report memory per session.
+
+    Returns:
+        Level report.
+    """
+    loop = asyncio.get_running_loop()
+    ledger = UsageLedger(":memory:")
+
+    def stand_in_api(*args: Any, **kwargs: Any) -> MistralAPI:
+        api = MistralAPI(*args, **kwargs)
+        api.client = client_factory()
+        return api
+
+    # The level's own clients talk to the stand-in; nothing shared is patched
+    context = AppContext(
+        conversation_store=ConversationStore(store_dir),
+        usage_ledger=ledger,
+        api_factory=stand_in_api,
+        max_sessions=sessions + 1,
+    )
+    lags: list[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop(lags, stop))
+    level = [Session(index, LoadPage(loop)) for index in range(sessions)]
+
+    def run(session: Session, turns: int) -> None:
+        open_session(session, context)
+        run_turns(session, turns)
+
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        # Shared clients and stores open lazily; do that before measuring
+        warm_up = Session(sessions, LoadPage(loop))
+        await loop.run_in_executor(executor, run, warm_up, 1)
+        await loop.run_in_executor(executor, warm_up.chat.close_chat)
+
+        gc.collect()
+        if measure_memory:
+            tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0] if measure_memory else 0
+
+        await asyncio.gather(*(loop.run_in_executor(executor, run, s, turns) for s in level))
+
+        # All sessions are open with their history; measure before closing
+        memory_per_session = None
+        if measure_memory:
+            gc.collect()
+            memory_per_session = (tracemalloc.get_traced_memory()[0] - baseline) / sessions
+            tracemalloc.stop()
+
+        await asyncio.gather(
+            *(loop.run_in_executor(executor, s.chat.close_chat) for s in level)
+        )
+
+    stop.set()
+    await monitor
+    records = ledger.records(limit=sessions * turns)
+    context.close()
+    turns_done = sum(len(s.latencies) for s in level)
+    return LevelReport(
+        sessions=sessions,
+        turns=turns_done,
+        errors=sum(s.errors for s in level),
+        memory_per_session=memory_per_session,
+        loop_lag=lags,
+        latencies=[latency for s in level for latency in s.latencies],
+        ttfts=[r.ttft for r in records if r.ttft is not None],
+        updates_per_turn=sum(s.page.update_count for s in level) / max(turns_done, 1),
+    )
+
+
+def format_reports(reports: list[LevelReport]) -> str:
+    """Format level reports as a text table.
+
+    Args:
+        reports: Reports to show.
+
+    Returns:
+        Table with one line per concurrency level.
+    """
+
+    def ms(value: float | None) -> str:
+        return f"{value * 1000:.1f}" if value is not None else "-"
+
+    header = [
+        "sessions",
+        "turns",
+        "errors",
+        "KiB/session",
+        "lag p50",
+        "lag p99",
+        "lag max",
+        "lat p50",
+        "lat p95",
+        "lat p99",
+        "ttft p50",
+        "ttft p95",
+        "upd/turn",
+    ]
+    lines = [header]
+    for report in reports:
+        memory = report.memory_per_session
+        lines.append(
+            [
+                str(report.sessions),
+                str(report.turns),
+                str(report.errors),
+                f"{memory / 1024:.0f}" if memory is not None else "-",
+                ms(percentile(report.loop_lag, 50)),
+                ms(percentile(report.loop_lag, 99)),
+                ms(max(report.loop_lag, default=None)),
+                ms(percentile(report.latencies, 50)),
+                ms(percentile(report.latencies, 95)),
+                ms(percentile(report.latencies, 99)),
+                ms(percentile(report.ttfts, 50)),
+                ms(percentile(report.ttfts, 95)),
+                f"{report.updates_per_turn:.1f}",
+            ]
+        )
+    widths = [max(len(line[column]) for line in lines) for column in range(len(header))]
+    table = "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(line, widths, strict=True))
+        for line in lines
+    )
+    return f"{table}\n(times in ms)"
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the load generator.
+
+    Args:
+        argv: Command line arguments. Defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description="Simulate concurrent chat sessions")
+    parser.add_argument(
+        "--sessions", default="1,10,50", help="Comma separated concurrency levels"
+    )
+    parser.add_argument("--turns", type=int, default=3, help="Messages per session")
+    parser.add_argument("--tokens", type=int, default=50, help="Tokens per stand-in reply")
+    parser.add_argument("--ttft", type=float, default=0.2, help="Stand-in time to first token")
+    parser.add_argument(
+        "--token-interval", type=float, default=0.01, help="Stand-in delay between tokens"
+    )
+    parser.add_argument("--cassette", help="Replay a recorded cassette instead of the stand-in")
+    parser.add_argument("--speed", type=float, default=1.0, help="Cassette replay speed")
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Skip allocation tracing (lower overhead)"
+    )
+    parser.add_argument("--log-level", default="WARNING", help="Logging level")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level)
+    levels = [int(level) for level in args.sessions.split(",") if level.strip()]
+
+    if args.cassette:
+        cassette = Cassette(args.cassette, speed=args.speed)
+
+        def client_factory() -> Any:
+            return ReplayClient(cassette)
+
+    else:
+
+        def client_factory() -> Any:
+            return StandInProvider(args.tokens, args.ttft, args.token_interval)
+
+    with tempfile.TemporaryDirectory(prefix="flet-chat-load-") as temp_dir:
+        # Keep ledgers, indexes and logs of simulated sessions out of the real data
+        os.environ["FLET_CHAT_DATA_DIR"] = temp_dir
+        os.environ.setdefault("MISTRAL_API_KEY", "load-test")
+        # One untraced session first so one-time imports and caches are not counted
+        asyncio.run(
+            run_level(1, 1, client_factory, Path(temp_dir) / "warm-up", measure_memory=False)
+        )
+        reports = []
+        for sessions in levels:
+            report = asyncio.run(
+                run_level(
+                    sessions,
+                    args.turns,
+                    client_factory,
+                    Path(temp_dir) / f"level-{sessions}",
+                    measure_memory=not args.no_memory,
+                )
+            )
+            reports.append(report)
+            print(f"{sessions} sessions done", flush=True)
+    print(format_reports(reports))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,28 +2,49 @@
 
 import argparse
 import logging
-import sys
+import os
+import secrets
+from pathlib import Path
 
 import flet as ft
 
 from screens.provider_screen import ProviderScreen
+from services.app_context import app_context
+from services.document_store import upload_dir
+from services.logging_pipeline import configure_logging
+from services.shared_state import default_path
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 
-def setup_logging(log_level: str = "INFO") -> None:
+def setup_logging(
+    log_level: str = "INFO",
+    log_format: str = "text",
+    log_file: str | None = None,
+    log_max_bytes: int = 10 * 1024 * 1024,
+) -> None:
     """Setup logging configuration.
     
+    Records are written by a background thread, so logging does not block
+    the UI or streaming threads.
+
     Args:
         log_level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+        log_format: Console format, ``text`` or ``json``.
+        log_file: Optional JSON lines log file, rotated by size.
+        log_max_bytes: Size at which the log file is rotated.
     """
-    logging.basicConfig(
+    configure_logging(
         level=log_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        stream=sys.stdout,
+        log_format=log_format,
+        log_file=log_file,
+        max_bytes=log_max_bytes,
+        # Third-party request logs are noisy at DEBUG
+        sample_rates={"httpx": 0.1, "httpcore": 0.1, "flet": 0.1},
+        secrets=[os.getenv("MISTRAL_API_KEY", "")],
     )
-    logger.info(f"Logging configured with level: {log_level}")
+    logger.info("Logging configured with level: %s", log_level)
 
 
 def main(page: ft.Page) -> None:
@@ -39,7 +60,11 @@ def main(page: ft.Page) -> None:
 
     # Initialize provider screen
     logger.info("Initializing provider screen")
-    provider_screen = ProviderScreen(page)
+    # Clients, stores and the request scheduler are shared by every session
+    context = app_context()
+    context.start_reaper()
+    provider_screen = ProviderScreen(page, context, session_id=page.session.id)
+    page.on_close = lambda e: context.close_session(provider_screen.session.session_id)
 
     # Add the screen to the page
     logger.info("Building and adding provider screen to page")
@@ -48,6 +73,58 @@ def main(page: ft.Page) -> None:
     logger.info("Application started successfully")
 
 
+def create_app():
+    """Build the ASGI application of one worker process.
+
+    Used by ``--workers``: uvicorn imports this module and calls it in every
+    worker. A browser session stays on the worker holding its websocket.
+    Options of the parent process arrive through the environment, and each
+    worker writes its own log file.
+
+    Returns:
+        FastAPI application serving the Flet app.
+    """
+    # Provided by flet-web, part of flet[all]
+    import flet.fastapi as flet_fastapi
+
+    log_file = os.getenv("FLET_CHAT_LOG_FILE")
+    if log_file:
+        path = Path(log_file)
+        log_file = str(path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}"))
+    setup_logging(
+        os.getenv("FLET_CHAT_LOG_LEVEL", "INFO"),
+        os.getenv("FLET_CHAT_LOG_FORMAT", "text"),
+        log_file,
+        int(os.getenv("FLET_CHAT_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+    )
+    logger.info(f"Worker {os.getpid()} started")
+    return flet_fastapi.app(
+        main,
+        before_main=None,
+        upload_dir=str(upload_dir()),
+        secret_key=os.getenv("FLET_SECRET_KEY"),
+    )
+
+
+def run_workers(args: argparse.Namespace) -> None:
+    """Serve the web app from several worker processes on one port.
+
+    Args:
+        args: Parsed command line arguments.
+    """
+    import uvicorn
+
+    os.environ["FLET_CHAT_LOG_LEVEL"] = args.log_level
+    os.environ["FLET_CHAT_LOG_FORMAT"] = args.log_format
+    os.environ["FLET_CHAT_LOG_MAX_BYTES"] = str(args.log_max_bytes)
+    if args.log_file:
+        os.environ["FLET_CHAT_LOG_FILE"] = args.log_file
+    logger.info(f"Starting {args.workers} workers on {args.host}:{args.port}")
+    uvicorn.run(
+        "main:create_app", factory=True, host=args.host, port=args.port, workers=args.workers
+    )
+
+
 if __name__ == "__main__":
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Mistral AI Provider Settings")
@@ -57,11 +134,66 @@ if __name__ == "__main__":
         choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
         help="Set the logging level (default: INFO)",
     )
+    parser.add_argument(
+        "--log-format",
+        default="text",
+        choices=["text", "json"],
+        help="Console log format (default: text)",
+    )
+    parser.add_argument("--log-file", help="Also write JSON logs to this file")
+    parser.add_argument(
+        "--log-max-bytes",
+        type=int,
+        default=10 * 1024 * 1024,
+        help="Rotate the log file at this size (default: 10 MiB)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Serve the web app from this many processes (default: 1, desktop app)",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Web host with --workers")
+    parser.add_argument("--port", type=int, default=8550, help="Web port with --workers")
+    parser.add_argument(
+        "--shared-cache",
+        action="store_true",
+        help="Cache model lists and completions in the data directory (on with --workers)",
+    )
+    parser.add_argument(
+        "--cache-ttl", type=float, default=300.0, help="Shared cache lifetime in seconds"
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, help="Upstream requests per second across all workers"
+    )
+    parser.add_argument(
+        "--semantic-cache",
+        type=float,
+        metavar="THRESHOLD",
+        help="Answer prompts this similar (0-1) to earlier ones from cache; needs numpy",
+    )
     args = parser.parse_args()
 
+    # Workers share the model catalog, completion cache and rate limit through SQLite
+    if args.workers > 1 or args.shared_cache or args.rate_limit:
+        os.environ.setdefault("FLET_CHAT_SHARED_STATE", str(default_path()))
+        caching = args.workers > 1 or args.shared_cache
+        os.environ["FLET_CHAT_CACHE_TTL"] = str(args.cache_ttl if caching else 0)
+        if args.rate_limit:
+            os.environ["FLET_CHAT_RATE_LIMIT"] = str(args.rate_limit)
+
+    if args.semantic_cache:
+        os.environ["FLET_CHAT_SEMANTIC_CACHE"] = str(args.semantic_cache)
+
+    # Signs the URLs browsers upload documents to; every worker must share it
+    os.environ.setdefault("FLET_SECRET_KEY", secrets.token_urlsafe(32))
+
     # Setup logging
-    setup_logging(args.log_level)
+    setup_logging(args.log_level, args.log_format, args.log_file, args.log_max_bytes)
 
     # Run the application
     logger.info(f"Running application with log level: {args.log_level}")
-    ft.run(main)
+    if args.workers > 1:
+        run_workers(args)
+    else:
+        ft.run(main, upload_dir=str(upload_dir()))
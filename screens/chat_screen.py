@@ -1,30 +1,164 @@
 """Chat window screen."""
 
 import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Sequence
+from pathlib import Path
 
 import flet as ft
 
-from services.mistral_api import MistralAPI
+from screens.chat_transcript import ChatTranscript, TranscriptEntry
+from screens.update_scheduler import UpdateScheduler
+from services.app_context import ClientPool
+from services.compare import ProviderRunStats, run_comparison
+from services.conversation_store import ConversationStore
+from services.conversation_tree import ConversationNode, ConversationTree, StoredPath
+from services.document_store import DocumentStore, grounding_message, upload_dir
+from services.map_reduce import MapReduceProgress, estimate_tokens, map_reduce_stream
+from services.message import Message
+from services.mistral_api import MistralAPI, delta_text
+from services.provider_manager import ProviderManager, ProviderSettings
+from services.request_scheduler import QueueFullError, RequestScheduler
+from services.search_index import SearchHit, SearchIndex
+from services.shared_state import cache_key
+from services.usage_ledger import UsageLedger, UsageRecord
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Comparison results kept per chat window
+MAX_COMPARISONS = 20
+
+# Document chunks added to each turn
+RETRIEVED_CHUNKS = 4
+
+# Files offered when adding documents
+DOCUMENT_EXTENSIONS = ["txt", "md", "rst", "csv", "json", "html", "py"]
+
+# Seconds a browser may take to start uploading a document
+UPLOAD_EXPIRES = 600
+
+# Messages longer than this are answered by map-reduce instead of in one request
+MAP_REDUCE_TOKENS = 24_000
+MAP_REDUCE_INSTRUCTION = (
+    "Respond to the user's message. The user's request may be in any part; "
+    "note it wherever it appears."
+)
+
 
 
 class ChatScreen:
     """Chat window UI and logic."""
 
-    def __init__(self, page: ft.Page, provider_name: str = "MistralMedium") -> None:
+    def __init__(
+        self,
+        page: ft.Page,
+        provider_name: str = "MistralMedium",
+        max_fps: float = 20.0,
+        provider_manager: ProviderManager | None = None,
+        store: ConversationStore | None = None,
+        conversation_id: str | None = None,
+        search_index: SearchIndex | None = None,
+        scheduler: RequestScheduler | None = None,
+        usage_ledger: UsageLedger | None = None,
+        clients: ClientPool | None = None,
+        on_activity: Callable[[], None] | None = None,
+        documents: DocumentStore | None = None,
+    ) -> None:
         """Initialize chat screen.
         
         Args:
             page: Flet page instance.
             provider_name: Name of provider to use.
+            max_fps: Maximum page updates per second while streaming.
+            provider_manager: Optional provider store to read settings from.
+            store: Optional conversation store to resume and persist the chat.
+            conversation_id: Conversation to resume. Defaults to the provider name.
+            search_index: Optional full-text index updated as messages are added.
+            scheduler: Optional request scheduler shared with other API users.
+            usage_ledger: Optional ledger recording the usage of every request.
+            clients: Optional API clients shared with other sessions.
+            on_activity: Optional callback run whenever the user sends a message.
+            documents: Optional document store; the passages most relevant to
+                each message are sent with it instead of whole documents.
         """
         self.page = page
         self.provider_name = provider_name
-        self.mistral_api = MistralAPI()
-        self.messages: list[dict[str, str]] = []
+        self.provider_manager = provider_manager
+        self.scheduler = scheduler
+        self.usage_ledger = usage_ledger
+        self.clients = clients if clients is not None else ClientPool(scheduler)
+        self.mistral_api = self.clients.default
+        self.on_activity = on_activity
+        self.documents = documents
+        self.documents_button: ft.IconButton | None = None
+        self.documents_label: ft.Text | None = None
+        # Kept until its uploads are reported
+        self._upload_picker: ft.FilePicker | None = None
+        self.tree = ConversationTree()
+        # Replies stream in on worker threads, so the transcript is changed
+        # and sent to the page under one lock
+        transcript_lock = threading.RLock()
+        self.updates = UpdateScheduler(page, max_fps=max_fps, lock=transcript_lock)
+        self.transcript = ChatTranscript(
+            on_change=self.updates.request_update, lock=transcript_lock
+        )
+        self.send_button: ft.IconButton | None = None
+        self.stop_button: ft.IconButton | None = None
+        self.input_field: ft.TextField | None = None
+        self.regenerate_button: ft.IconButton | None = None
+        self.edit_button: ft.IconButton | None = None
+        self.prev_branch_button: ft.IconButton | None = None
+        self.next_branch_button: ft.IconButton | None = None
+        self.branch_label: ft.Text | None = None
+        self._editing: ConversationNode | None = None
+        self.compare_switch: ft.Switch | None = None
+        self.search_results: ft.Column | None = None
+        self.search_index = search_index
+        self.search_page_size = 10
+        self._search_query = ""
+        self._search_offset = 0
+        self.comparisons: deque[list[ProviderRunStats]] = deque(maxlen=MAX_COMPARISONS)
+        self._cancel_event: threading.Event | None = None
+
+        # Resume a stored conversation, loading only what is displayed
+        self.store = store
+        self.conversation_id = conversation_id or provider_name
+        self._history_loaded = store is None
+        self._stored_path: StoredPath | None = None
+        # Transcript index of each shown message; resumed ones are shown at their depth
+        self._entry_for_seq: dict[int, int] = {}
+        if store is not None:
+            self._stored_path = StoredPath(store, self.conversation_id)
+            count = self._stored_path.length
+            if count:
+                logger.info(f"Resuming conversation {self.conversation_id} ({count} messages)")
+                self.transcript.load_history(count, self._load_entries)
+
+    @property
+    def settings(self) -> ProviderSettings:
+        """Settings of the provider used for this chat."""
+        settings = None
+        if self.provider_manager is not None:
+            settings = self.provider_manager.get_provider(self.provider_name)
+        return settings or ProviderSettings(name=self.provider_name, api_key="")
+
+    @property
+    def messages(self) -> list[Message]:
+        """Messages of the current branch, sent to the API."""
+        return self.tree.messages()
+
+    @property
+    def is_generating(self) -> bool:
+        """Whether a reply is currently being generated."""
+        return self._cancel_event is not None
+
+    @property
+    def compare_mode(self) -> bool:
+        """Whether messages are sent to all providers side by side."""
+        return bool(self.compare_switch is not None and self.compare_switch.value)
 
     def build(self) -> ft.AlertDialog:
         """Build the chat window dialog.
@@ -33,35 +167,112 @@ class ChatScreen:
             Flet AlertDialog containing the chat UI.
         """
         # Message list
-        message_list = ft.ListView(
-            controls=[],
-            expand=True,
-            spacing=10,
-            auto_scroll=True,
-        )
+        message_list = self.transcript.build()
 
         # Input field
         input_field = ft.TextField(
             hint_text="Type a message...",
             expand=True,
-            on_submit=lambda e: self.send_message(input_field.value, input_field, message_list),
+            on_submit=lambda e: self.send_message(input_field.value, input_field),
         )
+        self.input_field = input_field
 
         # Send button
         send_button = ft.IconButton(
             icon=ft.Icons.SEND,
-            on_click=lambda e: self.send_message(input_field.value, input_field, message_list),
+            on_click=lambda e: self.send_message(input_field.value, input_field),
+        )
+        self.send_button = send_button
+
+        # Stop button, shown while a reply is being generated
+        stop_button = ft.IconButton(
+            icon=ft.Icons.STOP_CIRCLE_OUTLINED,
+            tooltip="Stop",
+            visible=False,
+            on_click=lambda e: self.stop_generation(),
+        )
+        self.stop_button = stop_button
+
+        # Compare mode switch
+        compare_switch = ft.Switch(
+            label="Compare",
+            value=False,
+            tooltip="Send to all providers side by side",
+            disabled=self.provider_manager is None,
+        )
+        self.compare_switch = compare_switch
+
+        # Regenerate, edit and switch between alternative answers
+        self.regenerate_button = ft.IconButton(
+            icon=ft.Icons.REFRESH,
+            tooltip="Regenerate",
+            on_click=lambda e: self.regenerate(),
+        )
+        self.edit_button = ft.IconButton(
+            icon=ft.Icons.EDIT,
+            tooltip="Edit last message",
+            on_click=lambda e: self.edit_last_message(),
+        )
+        self.prev_branch_button = ft.IconButton(
+            icon=ft.Icons.CHEVRON_LEFT,
+            tooltip="Previous version",
+            on_click=lambda e: self.switch_branch(-1),
+        )
+        self.next_branch_button = ft.IconButton(
+            icon=ft.Icons.CHEVRON_RIGHT,
+            tooltip="Next version",
+            on_click=lambda e: self.switch_branch(1),
+        )
+        self.branch_label = ft.Text("", size=12)
+        self._refresh_branch_controls()
+
+        # Documents the replies are grounded on
+        self.documents_button = ft.IconButton(
+            icon=ft.Icons.ATTACH_FILE,
+            tooltip="Add documents",
+            visible=self.documents is not None,
+            on_click=self.pick_documents,
+        )
+        self.documents_label = ft.Text("", size=12)
+        self._refresh_documents_label()
+
+        # History search, with results shown above the transcript
+        search_field = ft.TextField(
+            hint_text="Search history...",
+            prefix_icon=ft.Icons.SEARCH,
+            dense=True,
+            visible=self.search_index is not None,
+            on_submit=lambda e: self.search_history(search_field.value),
+        )
+        self.search_results = ft.Column(
+            controls=[], visible=False, scroll=ft.ScrollMode.AUTO, height=150
         )
 
         return ft.AlertDialog(
             title=ft.Text("Mistral AI Chat"),
             content=ft.Column(
                 controls=[
+                    search_field,
+                    self.search_results,
                     message_list,
                     ft.Row(
                         controls=[
+                            self.documents_button,
+                            self.documents_label,
+                            self.prev_branch_button,
+                            self.branch_label,
+                            self.next_branch_button,
+                            self.regenerate_button,
+                            self.edit_button,
+                        ],
+                        alignment=ft.MainAxisAlignment.END,
+                    ),
+                    ft.Row(
+                        controls=[
+                            compare_switch,
                             input_field,
                             send_button,
+                            stop_button,
                         ],
                         alignment=ft.MainAxisAlignment.END,
                     ),
@@ -76,92 +287,691 @@ class ChatScreen:
             actions_alignment=ft.MainAxisAlignment.END,
         )
 
-    def send_message(
-        self,
-        message: str,
-        input_field: ft.TextField,
-        message_list: ft.ListView,
-    ) -> None:
+    def send_message(self, message: str, input_field: ft.TextField) -> None:
         """Send a message to Mistral API.
+
+        The reply is generated on a background thread so the event handler
+        returns immediately.
         
         Args:
             message: Message text to send.
             input_field: Input field control.
-            message_list: Message list control.
         """
         if not message.strip():
             logger.info("Empty message, not sending")
             return
+        if self.is_generating:
+            logger.info("Reply in progress, not sending")
+            return
+        if self.on_activity is not None:
+            self.on_activity()
 
-        logger.info(f"Sending message: {message}")
+        # Message text is only formatted if DEBUG logging is enabled
+        logger.info("Sending message (%d chars)", len(message))
+        logger.debug("Message text: %s", message)
+        self._ensure_history()
+        if self._editing is not None:
+            # The edited message becomes a new branch next to the original
+            self._switch_head(self._editing.parent)
+            self._editing = None
 
         # Add user message to UI
-        user_message = ft.Container(
-            content=ft.Text(message, size=14),
-            padding=10,
-            bgcolor=ft.colors.BLUE_100,
-            border_radius=10,
-            alignment=ft.Alignment.CENTER_RIGHT,
-        )
-        message_list.controls.append(user_message)
+        user_index = self.transcript.append("user", message)
 
         # Clear input
         input_field.value = ""
-        input_field.focus()
+        self.page.run_task(input_field.focus)
+
+        if self.compare_mode:
+            # Comparison turns are not added to the history
+            cancel_event = threading.Event()
+            messages = [*self.messages, Message("user", message, created_at=time.time())]
+            providers = self.provider_manager.list_providers()
+            pending_index = self.transcript.append_columns([p.name for p in providers])
+            self._set_generating(cancel_event)
+            self.updates.update_now()
+            self.page.run_thread(
+                self._generate_comparison, pending_index, messages, providers, cancel_event
+            )
+            return
 
         # Add user message to history
-        self.messages.append({"role": "user", "content": message})
+        self._record("user", message, user_index)
+
+        self._start_reply()
+
+    def regenerate(self) -> None:
+        """Generate a new answer to the last user message.
+
+        The previous answer is kept as an alternative branch.
+        """
+        if self.is_generating:
+            return
+        self._ensure_history()
+        head = self.tree.head
+        if head is None:
+            return
+        logger.info("Regenerating the last answer")
+        self._switch_head(head.parent if head.message.role == "assistant" else head)
+        if self.tree.head is None:
+            return
+        # A cached answer would repeat the one being replaced
+        self._start_reply(cached=False)
 
-        # Show typing indicator
-        typing_indicator = ft.Container(
-            content=ft.Text("...", size=14),
-            padding=10,
-            bgcolor=ft.colors.GREY_200,
-            border_radius=10,
-            alignment=ft.Alignment.CENTER_LEFT,
+    def edit_last_message(self) -> None:
+        """Put the last user message in the input field to send an edited version."""
+        if self.is_generating or self.input_field is None:
+            return
+        self._ensure_history()
+        node = next(
+            (node for node in reversed(self.tree.path()) if node.message.role == "user"), None
         )
-        message_list.controls.append(typing_indicator)
-        self.page.update()
+        if node is None:
+            return
+        self._editing = node
+        self.input_field.value = node.message.content
+        self.page.run_task(self.input_field.focus)
+        self.updates.update_now()
+
+    def switch_branch(self, step: int) -> None:
+        """Show another version of the latest message that has alternatives.
+
+        Args:
+            step: Number of versions to move by, negative to go back.
+        """
+        if self.is_generating:
+            return
+        self._ensure_history()
+        node = self.tree.branch_point()
+        if node is None:
+            return
+        siblings = self.tree.siblings(node)
+        target = siblings[(siblings.index(node) + step) % len(siblings)]
+        self._switch_head(self.tree.leaf(target))
+        self._refresh_branch_controls()
+        self.updates.update_now()
+
+    def _start_reply(self, cached: bool = True) -> None:
+        """Show a typing indicator and generate the reply in the background.
+
+        Args:
+            cached: Allow an answer from the semantic cache.
+        """
+        pending_index = self.transcript.append("pending", "...")
+        cancel_event = threading.Event()
+        self._set_generating(cancel_event)
+        self.updates.update_now()
+
+        self.page.run_thread(self._generate_reply, pending_index, cancel_event, cached)
+
+    def _switch_head(self, node: ConversationNode | None) -> None:
+        """Make a node the head and show its branch.
+
+        Only the messages after the prefix shared with the shown branch are
+        removed from the transcript and appended again.
+
+        Args:
+            node: New head, or None to show an empty branch.
+        """
+        old_path = self.tree.path()
+        common = self.tree.common_prefix(self.tree.head, node)
+        if common < len(old_path):
+            cut = self._entry_index(old_path[common])
+        elif old_path:
+            cut = self._entry_index(old_path[-1]) + 1
+        else:
+            cut = 0
+        self.transcript.truncate(cut)
+        self.tree.head = node
+        for shown in self.tree.path(node)[common:]:
+            message = shown.message
+            self._entry_for_seq[shown.seq] = self.transcript.append(message.role, message.content)
+        logger.debug(f"Switched branch, kept {common} messages")
+
+    def _entry_index(self, node: ConversationNode) -> int:
+        """Get the transcript index of a message of the shown branch.
+
+        Args:
+            node: Node of the shown branch.
+
+        Returns:
+            Transcript entry index.
+        """
+        return self._entry_for_seq.get(node.seq, node.depth)
 
-        # Call Mistral API
+    def _refresh_branch_controls(self) -> None:
+        """Show the version switcher when the branch has alternatives."""
+        if self.branch_label is None:
+            return
+        node = self.tree.branch_point()
+        for control in (self.prev_branch_button, self.branch_label, self.next_branch_button):
+            control.visible = node is not None
+        if node is not None:
+            siblings = self.tree.siblings(node)
+            self.branch_label.value = f"{siblings.index(node) + 1}/{len(siblings)}"
+        for control in (
+            self.prev_branch_button,
+            self.next_branch_button,
+            self.regenerate_button,
+            self.edit_button,
+        ):
+            control.disabled = self.is_generating
+
+    def stop_generation(self) -> None:
+        """Cancel the reply currently being generated."""
+        if self._cancel_event is not None:
+            logger.info("Stopping reply generation")
+            self._cancel_event.set()
+
+    def _generate_reply(
+        self, pending_index: int, cancel_event: threading.Event, cached: bool = True
+    ) -> None:
+        """Stream the assistant reply into the transcript.
+
+        Args:
+            pending_index: Transcript index of the typing indicator.
+            cancel_event: Event set when the user stops the reply.
+            cached: Allow an answer from the semantic cache.
+        """
+        settings = self.settings
+        parts: list[str] = []
+        usage: dict = {}
+        start = time.monotonic()
+        ttft: float | None = None
+        error: str | None = None
+        cache_hit = False
+        recorded = False
         try:
-            logger.info("Calling Mistral API for chat completion")
-            # Get response from API
-            response = self.mistral_api.chat_completion(self.messages)
-            logger.info("Received response from Mistral API")
-
-            # Extract assistant message
-            assistant_message = response.get("choices", [{}])[0].get("message", {}).get("content", "")
-
-            # Add to message history
-            self.messages.append({"role": "assistant", "content": assistant_message})
-
-            # Update UI with response
-            message_list.controls.remove(typing_indicator)
-            response_container = ft.Container(
-                content=ft.Text(assistant_message, size=14),
-                padding=10,
-                bgcolor=ft.colors.GREY_200,
-                border_radius=10,
-                alignment=ft.Alignment.CENTER_LEFT,
-            )
-            message_list.controls.append(response_container)
+            messages = self._grounded(self.messages)
+            client = self._client_for(settings)
+            if estimate_tokens(messages[-1].content) > MAP_REDUCE_TOKENS:
+                logger.info("Message exceeds the context; answering with map-reduce")
+                chunks = map_reduce_stream(
+                    client,
+                    MAP_REDUCE_INSTRUCTION,
+                    messages[-1].content,
+                    model=settings.model,
+                    max_tokens=settings.max_tokens,
+                    temperature=settings.temperature,
+                    on_progress=lambda progress: self._show_progress(pending_index, progress),
+                    cancel_event=cancel_event,
+                    session=self.conversation_id,
+                    timeout=settings.request_timeout,
+                )
+            else:
+                logger.info("Calling Mistral API for chat completion")
+                chunks = client.chat_completion_stream(
+                    messages,
+                    model=settings.model,
+                    max_tokens=settings.max_tokens,
+                    temperature=settings.temperature,
+                    top_p=settings.top_p,
+                    timeout=settings.request_timeout,
+                    cancel_event=cancel_event,
+                    session=self.conversation_id,
+                    cached=cached,
+                )
+            for chunk in chunks:
+                cache_hit = cache_hit or bool(chunk.get("cache_hit"))
+                usage = chunk.get("usage") or usage
+                delta = delta_text(chunk)
+                if not delta:
+                    continue
+                if parts:
+                    self.transcript.append_text(pending_index, delta)
+                else:
+                    ttft = time.monotonic() - start
+                    self.transcript.update(pending_index, text=delta, role="assistant")
+                parts.append(delta)
+                self.updates.request_update()
+
+            if cancel_event.is_set():
+                logger.info("Reply stopped by user")
+            else:
+                logger.info("Received response from Mistral API")
+
+            # Add to message history, keeping partial replies that were stopped
+            if parts:
+                recorded = True
+                self._record(
+                    "assistant", "".join(parts), pending_index, usage.get("completion_tokens")
+                )
+            elif cancel_event.is_set():
+                self.transcript.update(pending_index, text="Stopped", role="error")
+            else:
+                self.transcript.update(pending_index, text="", role="assistant")
+
+        except TimeoutError as e:
+            logger.warning(f"Reply timed out: {e!s}")
+            error = f"Timed out: {e!s}"
+            self._show_error(pending_index, parts, error, recorded)
+
+        except QueueFullError as e:
+            error = f"Busy: {e!s}"
+            self._show_error(pending_index, parts, error, recorded)
 
         except Exception as e:
-            # Show error
-            message_list.controls.remove(typing_indicator)
-            error_container = ft.Container(
-                content=ft.Text(f"Error: {e!s}", size=14, color=ft.colors.RED),
-                padding=10,
-                bgcolor=ft.colors.RED_50,
-                border_radius=10,
-                alignment=ft.Alignment.CENTER_LEFT,
+            error = f"Error: {e!s}"
+            self._show_error(pending_index, parts, error, recorded)
+
+        finally:
+            # Mistral streams roughly one token per chunk when usage is missing
+            completion_tokens = usage.get("completion_tokens") or len(parts)
+            self._record_usage(
+                UsageRecord(
+                    provider=settings.name,
+                    model=settings.model,
+                    prompt_tokens=usage.get("prompt_tokens") or 0,
+                    completion_tokens=0 if cache_hit else completion_tokens,
+                    latency=time.monotonic() - start,
+                    # A cached answer says nothing about the provider's latency
+                    ttft=None if cache_hit else ttft,
+                    cache_hit=cache_hit,
+                    session=self.conversation_id,
+                    error=error,
+                )
             )
-            message_list.controls.append(error_container)
+            self._set_generating(None)
+            self.updates.update_now()
 
-        self.page.update()
+    def _show_progress(self, pending_index: int, progress: MapReduceProgress) -> None:
+        """Show map-reduce progress in place of the typing indicator.
+
+        Args:
+            pending_index: Transcript index of the typing indicator.
+            progress: Current progress.
+        """
+        self.transcript.update(pending_index, text=progress.describe(), role="pending")
+        self.updates.request_update()
+
+    def _generate_comparison(
+        self,
+        index: int,
+        messages: list[Message],
+        providers: Sequence[ProviderSettings],
+        cancel_event: threading.Event,
+    ) -> None:
+        """Stream the answers of several providers side by side.
+
+        Args:
+            index: Transcript index of the comparison row.
+            messages: Messages sent to every provider.
+            providers: Providers to compare.
+            cancel_event: Event set when the user stops the comparison.
+        """
+        started: set[int] = set()
+
+        def on_delta(column: int, delta: str) -> None:
+            if column in started:
+                self.transcript.append_column_text(index, column, delta)
+            else:
+                started.add(column)
+                self.transcript.update_column(index, column, text=delta, role="assistant")
+            self.updates.request_update()
+
+        def on_done(column: int, stats: ProviderRunStats) -> None:
+            self._record_usage(
+                UsageRecord(
+                    provider=stats.provider,
+                    model=stats.model,
+                    prompt_tokens=stats.prompt_tokens,
+                    completion_tokens=stats.completion_tokens,
+                    latency=stats.total_latency or 0.0,
+                    ttft=stats.ttft,
+                    cache_hit=stats.cache_hit,
+                    session=self.conversation_id,
+                    error=stats.error,
+                )
+            )
+            title = f"{stats.provider} ({stats.model}) · {stats.summary()}"
+            if stats.error is not None:
+                self.transcript.update_column(
+                    index, column, text=f"Error: {stats.error}", role="error", title=title
+                )
+            else:
+                self.transcript.update_column(index, column, role="assistant", title=title)
+            self.updates.request_update()
+
+        try:
+            results = run_comparison(
+                messages,
+                providers,
+                self._client_for,
+                on_delta=on_delta,
+                on_done=on_done,
+                cancel_event=cancel_event,
+                session=self.conversation_id,
+            )
+            self.comparisons.append(results)
+        finally:
+            self._set_generating(None)
+            self.updates.update_now()
+
+    def _client_for(self, settings: ProviderSettings) -> MistralAPI:
+        """Get the API client for a provider.
+
+        Providers without their own API key share the default client.
+
+        Args:
+            settings: Provider settings.
+
+        Returns:
+            MistralAPI client for the provider.
+        """
+        return self.clients.client_for(settings)
+
+    def search_history(self, query: str, more: bool = False) -> list[SearchHit]:
+        """Search the chat history and show a page of results.
+
+        Args:
+            query: Free text to search for.
+            more: Append the next page to the current results instead of
+                starting a new search.
+
+        Returns:
+            Hits of the page that was shown.
+        """
+        if self.search_index is None or self.search_results is None:
+            return []
+        if not more:
+            self._search_query = query
+            self._search_offset = 0
+            self.search_results.controls = []
+        # Only this conversation is searched; other sessions' history stays private
+        hits = self.search_index.search(
+            self._search_query,
+            limit=self.search_page_size + 1,
+            offset=self._search_offset,
+            conversation_id=self.conversation_id,
+        )
+        has_more = len(hits) > self.search_page_size
+        hits = hits[: self.search_page_size]
+        self._search_offset += len(hits)
+        logger.debug(f"Search returned {len(hits)} hits")
+
+        controls = self.search_results.controls
+        if controls and isinstance(controls[-1], ft.TextButton):
+            controls.pop()
+        controls.extend(
+            ft.ListTile(
+                title=ft.Text(hit.snippet, size=13),
+                subtitle=ft.Text(f"{hit.conversation_id} #{hit.seq} · {hit.role}", size=11),
+                dense=True,
+                on_click=lambda e, hit=hit: self.show_search_hit(hit),
+            )
+            for hit in hits
+        )
+        if has_more:
+            controls.append(
+                ft.TextButton(
+                    "More results", on_click=lambda e: self.search_history(query, more=True)
+                )
+            )
+        if not controls:
+            controls.append(ft.Text("No results", size=13, italic=True))
+        self.search_results.visible = bool(self._search_query.strip())
+        self.updates.update_now()
+        return hits
+
+    def show_search_hit(self, hit: SearchHit) -> None:
+        """Show the message of a search hit in the transcript.
+
+        Args:
+            hit: Search hit to show.
+        """
+        if hit.conversation_id != self.conversation_id:
+            return
+        self._ensure_history()
+        if hit.seq >= len(self.tree.nodes):
+            return
+        node = self.tree.nodes[hit.seq]
+        if self.tree.common_prefix(self.tree.head, node) <= node.depth:
+            # The message is on another branch
+            if self.is_generating:
+                return
+            self._switch_head(self.tree.leaf(node))
+            self._refresh_branch_controls()
+        self.transcript.jump_to(self._entry_index(node))
+        self.updates.update_now()
+
+    def _record(
+        self,
+        role: str,
+        content: str,
+        entry_index: int,
+        tokens: int | None = None,
+        error: str | None = None,
+    ) -> None:
+        """Add a message to the history, persist and index it.
+
+        Args:
+            role: Message role.
+            content: Message text.
+            entry_index: Transcript index showing the message.
+            tokens: Optional token count of the message.
+            error: Optional error that ended a partial reply.
+        """
+        message = Message(role, content, tokens=tokens, created_at=time.time(), error=error)
+        node = self.tree.add(message)
+        # Let the transcript share the history's string instead of a copy
+        with self.transcript.lock:
+            self.transcript.entries[entry_index].text = message.content
+        if self.store is not None:
+            # The record is built for the position it is actually stored at
+            seq = self.store.append(
+                self.conversation_id, lambda seq: self.tree.to_record(node, seq)
+            )
+            if seq != node.seq:
+                node = self._resync(node, seq)
+        self._entry_for_seq[node.seq] = entry_index
+        if self.search_index is not None:
+            self.search_index.add(self.conversation_id, node.seq, role, content)
+
+    def _resync(self, node: ConversationNode, seq: int) -> ConversationNode:
+        """Reload the history after another writer appended to the conversation.
+
+        Args:
+            node: Node just recorded, numbered as if no one else had written.
+            seq: Sequence number it was stored at.
+
+        Returns:
+            The recorded message's node in the reloaded tree.
+        """
+        logger.warning(
+            f"Conversation {self.conversation_id} was changed elsewhere; reloading its history"
+        )
+        shown = [self._entry_index(old) for old in self.tree.path(node)[:-1]]
+        self.tree = ConversationTree.from_records(self.store.read_all(self.conversation_id))
+        self.tree.head = self.tree.nodes[seq]
+        self._entry_for_seq = {
+            new.seq: index for new, index in zip(self.tree.path(), shown, strict=False)
+        }
+        return self.tree.head
+
+    def _ensure_history(self) -> None:
+        """Load the full stored history before it is sent to the API."""
+        if not self._history_loaded:
+            self.tree = ConversationTree.from_records(self.store.read_all(self.conversation_id))
+            self._stored_path = None
+            self._history_loaded = True
+
+    def _load_entries(self, start: int, stop: int) -> list[TranscriptEntry]:
+        """Load stored messages for the transcript.
+
+        Args:
+            start: First message index.
+            stop: One past the last message index.
+
+        Returns:
+            Transcript entries for the messages.
+        """
+        if self._stored_path is None:
+            return [
+                TranscriptEntry(role=node.message.role, text=node.message.content)
+                for node in self.tree.path()[start:stop]
+            ]
+        return [
+            TranscriptEntry(role=record["role"], text=record["content"])
+            for record in self._stored_path.read(start, stop)
+        ]
+
+    async def pick_documents(self, e: ft.ControlEvent) -> None:
+        """Let the user choose text files to add to the documents.
+
+        Args:
+            e: Control event.
+        """
+        picker = ft.FilePicker(on_upload=self._on_document_upload)
+        files = await picker.pick_files(
+            dialog_title="Add documents",
+            file_type=ft.FilePickerFileType.CUSTOM,
+            allowed_extensions=DOCUMENT_EXTENSIONS,
+            allow_multiple=True,
+        )
+        if not self.page.web:
+            paths = [file.path for file in files if file.path]
+            if paths:
+                self.page.run_thread(self.add_documents, paths)
+            return
+        # Browsers do not expose file paths, so the files are uploaded first
+        if not files:
+            return
+        self._upload_picker = picker
+        await picker.upload(
+            [
+                ft.FilePickerUploadFile(
+                    upload_url=self.page.get_upload_url(
+                        f"{self._upload_folder}/{file.name}", UPLOAD_EXPIRES
+                    ),
+                    id=file.id,
+                )
+                for file in files
+            ]
+        )
+
+    @property
+    def _upload_folder(self) -> str:
+        """Folder of the upload storage this chat's documents arrive in."""
+        return cache_key(self.conversation_id)
+
+    def _on_document_upload(self, e: ft.FilePickerUploadEvent) -> None:
+        """Add a document once the browser has uploaded it.
+
+        Args:
+            e: Upload progress event.
+        """
+        if e.error:
+            logger.error(f"Failed to upload document {e.file_name}: {e.error}")
+        elif e.progress is not None and e.progress >= 1.0:
+            path = upload_dir() / self._upload_folder / e.file_name
+            self.page.run_thread(self.add_documents, [str(path)], True)
+
+    def add_documents(self, paths: list[str], remove: bool = False) -> None:
+        """Chunk and embed files into the document store.
+
+        Args:
+            paths: Files to add.
+            remove: Delete the files afterwards, e.g. uploaded copies.
+        """
+        if self.documents is None:
+            return
+        for path in paths:
+            if self.documents_label is not None:
+                self.documents_label.value = f"Adding {Path(path).name}..."
+                self.updates.request_update()
+            try:
+                self.documents.add_file(path, owner=self.conversation_id)
+            except Exception as e:
+                logger.error(f"Failed to add document {path}: {e!s}")
+            finally:
+                if remove:
+                    Path(path).unlink(missing_ok=True)
+        self._refresh_documents_label()
+        self.updates.update_now()
+
+    def _refresh_documents_label(self) -> None:
+        """Show how many documents replies are grounded on."""
+        if self.documents_label is None or self.documents is None:
+            return
+        count = len(self.documents.documents(owner=self.conversation_id))
+        self.documents_label.value = f"{count} document{'s' if count != 1 else ''}" if count else ""
+
+    def _grounded(self, messages: list[Message]) -> list[Message]:
+        """Add the document passages relevant to the last message.
+
+        Args:
+            messages: Messages of the current branch.
+
+        Returns:
+            The messages, preceded by a system message quoting the
+            retrieved passages when there are any.
+        """
+        if self.documents is None or not messages or messages[-1].role != "user":
+            return messages
+        try:
+            chunks = self.documents.search(
+                messages[-1].content, k=RETRIEVED_CHUNKS, owner=self.conversation_id
+            )
+        except Exception as e:
+            logger.warning(f"Document search failed: {e!s}")
+            return messages
+        if not chunks:
+            return messages
+        logger.debug("Grounding reply on %d document chunks", len(chunks))
+        return [Message("system", grounding_message(chunks)), *messages]
+
+    def _record_usage(self, entry: UsageRecord) -> None:
+        """Record the usage of a request in the ledger, if there is one.
+
+        Args:
+            entry: Usage record.
+        """
+        if self.usage_ledger is None:
+            return
+        try:
+            self.usage_ledger.record(entry)
+        except Exception as e:
+            logger.warning(f"Failed to record usage: {e!s}")
+
+    def _show_error(
+        self, pending_index: int, parts: list[str], text: str, recorded: bool = False
+    ) -> None:
+        """Show an error for a failed reply.
+
+        Text received before the failure stays in the transcript, so it is
+        also added to the history, marked with the error.
+
+        Args:
+            pending_index: Transcript index of the reply.
+            parts: Text received before the failure.
+            text: Error text.
+            recorded: Whether the reply is already in the history.
+        """
+        if not parts:
+            self.transcript.update(pending_index, text=text, role="error")
+            return
+        if not recorded:
+            try:
+                self._record("assistant", "".join(parts), pending_index, error=text)
+            except Exception as e:
+                logger.error(f"Failed to record partial reply: {e!s}")
+        self.transcript.append("error", text)
+
+    def _set_generating(self, cancel_event: threading.Event | None) -> None:
+        """Toggle between the send and stop buttons.
+
+        Args:
+            cancel_event: Event for the running reply, or None when idle.
+        """
+        self._cancel_event = cancel_event
+        if self.send_button is not None and self.stop_button is not None:
+            self.send_button.visible = cancel_event is None
+            self.stop_button.visible = cancel_event is not None
+        self._refresh_branch_controls()
 
     def close_chat(self) -> None:
         """Close the chat window."""
+        self.stop_generation()
+        self.updates.close()
         self.page.dialog.open = False
         self.page.update()
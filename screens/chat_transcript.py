@@ -0,0 +1,432 @@
+"""Windowed chat transcript."""
+
+import logging
+import threading
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
+
+import flet as ft
+
+from screens.markdown_text import MarkdownText
+from screens.segmented_text import SegmentedText
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TranscriptEntry:
+    """A single message shown in the transcript.
+
+    Entries with ``columns`` show several messages side by side, e.g. the
+    answers of different providers in compare mode.
+    """
+    role: str
+    text: str
+    title: str = ""
+    columns: list["TranscriptEntry"] = field(default_factory=list)
+
+
+# Bubble styling per role: (background color, alignment, text color)
+BUBBLE_STYLES: dict[str, tuple[str, ft.Alignment, str | None]] = {
+    "user": (ft.Colors.BLUE_100, ft.Alignment.CENTER_RIGHT, None),
+    "assistant": (ft.Colors.GREY_200, ft.Alignment.CENTER_LEFT, None),
+    "pending": (ft.Colors.GREY_200, ft.Alignment.CENTER_LEFT, None),
+    "error": (ft.Colors.RED_50, ft.Alignment.CENTER_LEFT, ft.Colors.RED),
+}
+
+
+class ChatTranscript:
+    """Chat transcript that keeps only a window of messages as live controls.
+
+    All entries are kept as plain data. Only the slice ``[start, end)`` is
+    materialized as Flet controls; older or newer entries are materialized
+    page by page as the user scrolls, and controls outside the window plus
+    buffer are released so the control tree stays bounded.
+    """
+
+    def __init__(
+        self,
+        window_size: int = 40,
+        buffer_size: int = 20,
+        page_size: int = 20,
+        scroll_threshold: float = 50,
+        on_change: Callable[[], None] | None = None,
+        lock: AbstractContextManager | None = None,
+    ) -> None:
+        """Initialize chat transcript.
+
+        Args:
+            window_size: Number of messages normally kept live.
+            buffer_size: Extra live messages allowed before trimming.
+            page_size: Number of messages materialized per scroll step.
+            scroll_threshold: Distance in pixels from an edge that triggers paging.
+            on_change: Called after scrolling changed the live controls.
+                Defaults to updating the list view.
+            lock: Re-entrant lock guarding the entries and live controls,
+                e.g. shared with the page updates. Defaults to a new one.
+        """
+        self.window_size = window_size
+        self.buffer_size = buffer_size
+        self.page_size = page_size
+        self.scroll_threshold = scroll_threshold
+        # Replies are streamed in from worker threads while scroll events
+        # page entries in and out on the event loop
+        self.lock = lock or threading.RLock()
+        # Entries of a loaded history stay None until they are materialized
+        self.entries: list[TranscriptEntry | None] = []
+        self._loader: Callable[[int, int], list[TranscriptEntry]] | None = None
+        self.view = ft.ListView(
+            controls=[],
+            expand=True,
+            spacing=10,
+            auto_scroll=True,
+            on_scroll=self._on_scroll,
+        )
+        self.on_change = on_change or self.view.update
+        self._start = 0
+        self._end = 0
+
+    @property
+    def max_live(self) -> int:
+        """Maximum number of live message controls."""
+        return self.window_size + self.buffer_size
+
+    @property
+    def live_range(self) -> range:
+        """Indexes of the entries currently materialized as controls."""
+        return range(self._start, self._end)
+
+    def build(self) -> ft.ListView:
+        """Build the transcript list view.
+
+        Returns:
+            Flet ListView holding the live message controls.
+        """
+        return self.view
+
+    def load_history(
+        self, count: int, loader: Callable[[int, int], list[TranscriptEntry]]
+    ) -> None:
+        """Show a stored history, loading entries only when materialized.
+
+        Replaces the current entries. Only the latest window is loaded now;
+        older entries are fetched page by page as the user scrolls up.
+
+        Args:
+            count: Number of entries in the history.
+            loader: Returns the entries ``[start, stop)`` of the history.
+        """
+        with self.lock:
+            self.entries = [None] * count
+            self._loader = loader
+            self._reset_window_to_end()
+
+    def append(self, role: str, text: str) -> int:
+        """Append a message and show it at the bottom of the transcript.
+
+        If the user has scrolled away from the latest messages the window is
+        moved back to the end first.
+
+        Args:
+            role: Message role (user, assistant, pending or error).
+            text: Message text.
+
+        Returns:
+            Index of the new entry.
+        """
+        with self.lock:
+            index = len(self.entries)
+            if self._end < index:
+                self._reset_window_to_end()
+            self.entries.append(TranscriptEntry(role=role, text=text))
+            self.view.controls.append(self._build_bubble(self.entries[index]))
+            self._end = index + 1
+            self._trim_start()
+            self.view.auto_scroll = True
+            return index
+
+    def update(self, index: int, text: str | None = None, role: str | None = None) -> None:
+        """Update an entry and its control if it is live.
+
+        Args:
+            index: Entry index.
+            text: New text, if changed.
+            role: New role, if changed.
+        """
+        with self.lock:
+            entry = self.entries[index]
+            restyle = role is not None and role != entry.role
+            if text is not None:
+                entry.text = text
+            if role is not None:
+                entry.role = role
+            if index not in self.live_range:
+                return
+            if restyle:
+                self.view.controls[index - self._start] = self._build_bubble(entry)
+            else:
+                # Same style, so only the text of the live control changes
+                self.view.controls[index - self._start].data.set_text(entry.text)
+
+    def append_text(self, index: int, text: str) -> None:
+        """Append text to an entry, e.g. a streamed reply.
+
+        Only the live tail of the bubble changes, so the next page update
+        sends just the appended text.
+
+        Args:
+            index: Entry index.
+            text: Text to append.
+        """
+        with self.lock:
+            self.entries[index].text += text
+            if index in self.live_range:
+                self.view.controls[index - self._start].data.append(text)
+
+    def append_columns(self, titles: list[str], text: str = "...") -> int:
+        """Append a row of side-by-side messages.
+
+        Args:
+            titles: Caption for each column.
+            text: Initial text of every column.
+
+        Returns:
+            Index of the new entry.
+        """
+        with self.lock:
+            columns = [TranscriptEntry(role="pending", text=text, title=title) for title in titles]
+            index = self.append("columns", "")
+            self.entries[index].columns = columns
+            if index in self.live_range:
+                self.view.controls[index - self._start] = self._build_bubble(self.entries[index])
+            return index
+
+    def update_column(
+        self,
+        index: int,
+        column: int,
+        text: str | None = None,
+        role: str | None = None,
+        title: str | None = None,
+    ) -> None:
+        """Replace the text, role or title of one column.
+
+        Args:
+            index: Entry index.
+            column: Column position.
+            text: New text, if changed.
+            role: New role, if changed.
+            title: New caption, if changed.
+        """
+        with self.lock:
+            entry = self.entries[index].columns[column]
+            if text is not None:
+                entry.text = text
+            if role is not None:
+                entry.role = role
+            if title is not None:
+                entry.title = title
+            if index in self.live_range:
+                row = self.view.controls[index - self._start].content
+                row.controls[column] = self._build_column_bubble(entry)
+
+    def append_column_text(self, index: int, column: int, text: str) -> None:
+        """Append text to one column, sending only the appended text.
+
+        Args:
+            index: Entry index.
+            column: Column position.
+            text: Text to append.
+        """
+        with self.lock:
+            self.entries[index].columns[column].text += text
+            if index in self.live_range:
+                row = self.view.controls[index - self._start].content
+                row.controls[column].data.append(text)
+
+    def truncate(self, length: int) -> None:
+        """Remove the entries from ``length`` on.
+
+        The controls of the remaining entries are kept as they are, so a
+        branch switch only re-renders the messages after the shared prefix.
+
+        Args:
+            length: Number of entries to keep.
+        """
+        with self.lock:
+            if length >= len(self.entries):
+                return
+            del self.entries[length:]
+            if self._start >= length:
+                self._reset_window_to_end()
+            elif self._end > length:
+                del self.view.controls[length - self._start :]
+                self._end = length
+
+    def jump_to(self, index: int) -> None:
+        """Move the live window so that it starts at an entry.
+
+        Args:
+            index: Entry index to show.
+        """
+        with self.lock:
+            self._start = max(0, min(index, len(self.entries) - 1))
+            self._end = min(len(self.entries), self._start + self.window_size)
+            self.view.controls = self._build_bubbles(self._start, self._end)
+            self.view.auto_scroll = self._end == len(self.entries)
+
+    def live_control(self, index: int) -> ft.Container | None:
+        """Get the control currently showing an entry.
+
+        Args:
+            index: Entry index.
+
+        Returns:
+            The bubble control, or None if the entry is not materialized.
+        """
+        with self.lock:
+            if index in self.live_range:
+                return self.view.controls[index - self._start]
+            return None
+
+    def load_older(self) -> int:
+        """Materialize the page of entries before the live window.
+
+        Returns:
+            Number of entries materialized.
+        """
+        with self.lock:
+            new_start = max(0, self._start - self.page_size)
+            count = self._start - new_start
+            if count == 0:
+                return 0
+            self.view.controls[0:0] = self._build_bubbles(new_start, self._start)
+            self._start = new_start
+            self._trim_end()
+            self.view.auto_scroll = self._end == len(self.entries)
+            logger.debug(f"Materialized {count} older messages, live range {self.live_range}")
+            return count
+
+    def load_newer(self) -> int:
+        """Materialize the page of entries after the live window.
+
+        Returns:
+            Number of entries materialized.
+        """
+        with self.lock:
+            new_end = min(len(self.entries), self._end + self.page_size)
+            count = new_end - self._end
+            if count == 0:
+                return 0
+            self.view.controls.extend(self._build_bubbles(self._end, new_end))
+            self._end = new_end
+            self._trim_start()
+            self.view.auto_scroll = self._end == len(self.entries)
+            logger.debug(f"Materialized {count} newer messages, live range {self.live_range}")
+            return count
+
+    def _reset_window_to_end(self) -> None:
+        """Rebuild the live window from the latest entries."""
+        self._end = len(self.entries)
+        self._start = max(0, self._end - self.window_size)
+        self.view.controls = self._build_bubbles(self._start, self._end)
+
+    def _build_bubbles(self, start: int, stop: int) -> list[ft.Container]:
+        """Build the bubbles of a range of entries, loading missing ones.
+
+        Args:
+            start: First entry index.
+            stop: One past the last entry index.
+
+        Returns:
+            List of bubble controls.
+        """
+        missing = [i for i in range(start, stop) if self.entries[i] is None]
+        if missing and self._loader is not None:
+            first, last = missing[0], missing[-1] + 1
+            for i, entry in enumerate(self._loader(first, last), first):
+                if self.entries[i] is None:
+                    self.entries[i] = entry
+        return [self._build_bubble(entry) for entry in self.entries[start:stop]]
+
+    def _trim_start(self) -> None:
+        """Release controls at the top once the window exceeds its buffer."""
+        if self._end - self._start > self.max_live:
+            drop = self._end - self._start - self.window_size
+            del self.view.controls[:drop]
+            self._start += drop
+
+    def _trim_end(self) -> None:
+        """Release controls at the bottom once the window exceeds its buffer."""
+        if self._end - self._start > self.max_live:
+            drop = self._end - self._start - self.window_size
+            del self.view.controls[-drop:]
+            self._end -= drop
+
+    def _on_scroll(self, e: ft.OnScrollEvent) -> None:
+        """Page entries in or out when the list is scrolled near an edge.
+
+        Args:
+            e: Scroll event.
+        """
+        with self.lock:
+            changed = 0
+            if e.pixels <= e.min_scroll_extent + self.scroll_threshold:
+                changed = self.load_older()
+            elif e.pixels >= e.max_scroll_extent - self.scroll_threshold:
+                changed = self.load_newer()
+            if changed:
+                self.on_change()
+
+    def _build_bubble(self, entry: TranscriptEntry) -> ft.Container:
+        """Build the control for a single entry.
+
+        Args:
+            entry: Transcript entry.
+
+        Returns:
+            Flet Container showing the message.
+        """
+        if entry.columns:
+            return ft.Container(
+                content=ft.Row(
+                    controls=[self._build_column_bubble(column) for column in entry.columns],
+                    vertical_alignment=ft.CrossAxisAlignment.START,
+                ),
+            )
+        bgcolor, alignment, color = BUBBLE_STYLES.get(entry.role, BUBBLE_STYLES["assistant"])
+        # Assistant replies are Markdown; other messages are shown as typed
+        text: MarkdownText | SegmentedText
+        if entry.role == "assistant":
+            text = MarkdownText(entry.text)
+        else:
+            text = SegmentedText(entry.text, size=14, color=color)
+        content: ft.Control = text.control
+        if entry.title:
+            content = ft.Column(
+                controls=[ft.Text(entry.title, size=12, weight=ft.FontWeight.BOLD), text.control],
+                spacing=4,
+            )
+        return ft.Container(
+            content=content,
+            padding=10,
+            bgcolor=bgcolor,
+            border_radius=10,
+            alignment=alignment,
+            data=text,
+        )
+
+    def _build_column_bubble(self, entry: TranscriptEntry) -> ft.Container:
+        """Build a bubble that shares its row with other columns.
+
+        Args:
+            entry: Column entry.
+
+        Returns:
+            Flet Container expanding to its share of the row.
+        """
+        bubble = self._build_bubble(entry)
+        bubble.expand = True
+        return bubble
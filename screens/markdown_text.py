@@ -0,0 +1,245 @@
+"""Incrementally rendered Markdown text control."""
+
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import flet as ft
+
+from screens.segmented_text import SegmentedText
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Opening or closing line of a fenced code block, with an optional language
+FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})\s*([\w+#.-]*)")
+
+CODE_THEME = ft.MarkdownCodeTheme.ATOM_ONE_LIGHT
+
+
+@dataclass(frozen=True)
+class MarkdownBlock:
+    """A top-level Markdown block: a paragraph-like run of lines or a code block."""
+    text: str
+    end: int
+    code: bool = False
+    language: str = ""
+    complete: bool = True
+
+
+def split_blocks(text: str) -> tuple[MarkdownBlock, ...]:
+    """Split Markdown into top-level blocks.
+
+    Blocks are separated by blank lines outside code fences. A block is
+    complete once a later block has started or, for code, once its fence is
+    closed; only the last block can be incomplete.
+
+    Args:
+        text: Markdown text.
+
+    Returns:
+        Blocks in order, with the offset in ``text`` where each one ends.
+    """
+    blocks: list[MarkdownBlock] = []
+    lines: list[str] = []
+    fence = ""
+    language = ""
+    offset = 0
+
+    def flush(end: int, complete: bool) -> None:
+        if lines:
+            blocks.append(
+                MarkdownBlock(
+                    text="".join(lines).rstrip("\n"),
+                    end=end,
+                    code=bool(fence),
+                    language=language,
+                    complete=complete,
+                )
+            )
+            lines.clear()
+
+    for line in text.splitlines(keepends=True):
+        start, offset = offset, offset + len(line)
+        if fence:
+            lines.append(line)
+            stripped = line.strip()
+            if len(lines) > 1 and stripped.startswith(fence) and not stripped.strip(fence[0]):
+                flush(offset, complete=True)
+                fence = language = ""
+            continue
+        match = FENCE.match(line)
+        if match:
+            flush(start, complete=True)
+            fence, language = match.group(1), match.group(2)
+            lines.append(line)
+        elif not line.strip() and line.endswith("\n"):
+            flush(start, complete=True)
+        else:
+            lines.append(line)
+    flush(offset, complete=False)
+    return tuple(blocks)
+
+
+class MarkdownCache:
+    """Least recently used cache of parsed Markdown keyed by content hash.
+
+    Bubbles are rebuilt whenever messages scroll back into the transcript
+    window; the hash key avoids re-parsing them without keeping a second
+    reference to every message text.
+    """
+
+    def __init__(self, max_entries: int = 512) -> None:
+        """Initialize Markdown cache.
+
+        Args:
+            max_entries: Maximum number of parsed texts kept.
+        """
+        self.max_entries = max_entries
+        self._blocks: OrderedDict[bytes, tuple[MarkdownBlock, ...]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, text: str) -> tuple[MarkdownBlock, ...]:
+        """Split a text into blocks, reusing earlier results.
+
+        Args:
+            text: Markdown text.
+
+        Returns:
+            Blocks of the text.
+        """
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        blocks = self._blocks.get(key)
+        if blocks is not None:
+            self.hits += 1
+            self._blocks.move_to_end(key)
+            return blocks
+        self.misses += 1
+        blocks = split_blocks(text)
+        self._blocks[key] = blocks
+        if len(self._blocks) > self.max_entries:
+            self._blocks.popitem(last=False)
+        return blocks
+
+
+# Shared by every transcript in the application
+markdown_cache = MarkdownCache()
+
+
+class MarkdownText:
+    """Markdown shown as a column of sealed blocks plus one live tail block.
+
+    Complete blocks are rendered once as ``ft.Markdown`` and never change
+    again. Appending text only re-parses the tail: a paragraph tail is a
+    small Markdown control, and an unfinished code block is shown as plain
+    segmented text until its fence closes, so syntax highlighting only runs
+    on finished code.
+    """
+
+    def __init__(self, text: str = "", cache: MarkdownCache | None = None) -> None:
+        """Initialize Markdown text.
+
+        Args:
+            text: Initial Markdown text.
+            cache: Parse cache for whole texts. Defaults to the shared cache.
+        """
+        self.cache = cache or markdown_cache
+        self.control = ft.Column(controls=[], spacing=8, tight=True)
+        self._sealed: list[str] = []
+        self._tail_text = ""
+        self._tail: ft.Markdown | SegmentedText | None = None
+        self.set_text(text)
+
+    @property
+    def text(self) -> str:
+        """Full Markdown text."""
+        return "".join(self._sealed) + self._tail_text
+
+    @property
+    def sealed_count(self) -> int:
+        """Number of blocks that are rendered and no longer change."""
+        return len(self.control.controls) - (self._tail is not None)
+
+    def append(self, text: str) -> None:
+        """Append text, re-parsing only the tail block.
+
+        Args:
+            text: Text to append.
+        """
+        if not text:
+            return
+        self._tail_text += text
+        self._render(split_blocks(self._tail_text))
+
+    def set_text(self, text: str) -> None:
+        """Replace the whole text.
+
+        Keeps the sealed blocks that are a prefix of the new text.
+
+        Args:
+            text: New Markdown text.
+        """
+        sealed = "".join(self._sealed)
+        if self._sealed and text.startswith(sealed):
+            self._tail_text = text[len(sealed) :]
+            self._render(split_blocks(self._tail_text))
+            return
+        self.control.controls = []
+        self._sealed = []
+        self._tail = None
+        self._tail_text = text
+        self._render(self.cache.parse(text))
+
+    def _render(self, blocks: tuple[MarkdownBlock, ...]) -> None:
+        """Seal the complete blocks of the tail and refresh the tail control.
+
+        Args:
+            blocks: Blocks of the current tail text.
+        """
+        controls = self.control.controls
+        if self._tail is not None:
+            controls.pop()
+        complete = [block for block in blocks if block.complete]
+        for block in complete:
+            controls.append(self._build_block(block))
+        if complete:
+            end = complete[-1].end
+            self._sealed.append(self._tail_text[:end])
+            self._tail_text = self._tail_text[end:]
+            self._tail = None
+
+        last = blocks[-1] if blocks and not blocks[-1].complete else None
+        if last is None:
+            self._tail = None
+            return
+        if last.code:
+            if isinstance(self._tail, SegmentedText) and last.text.startswith(self._tail.text):
+                self._tail.append(last.text[len(self._tail.text) :])
+            else:
+                self._tail = SegmentedText(last.text, font_family="monospace")
+            controls.append(self._tail.control)
+        else:
+            if isinstance(self._tail, ft.Markdown):
+                self._tail.value = last.text
+            else:
+                self._tail = self._build_block(last)
+            controls.append(self._tail)
+
+    def _build_block(self, block: MarkdownBlock) -> ft.Markdown:
+        """Build the control of a block.
+
+        Args:
+            block: Markdown block.
+
+        Returns:
+            Markdown control, with code highlighting for finished code blocks.
+        """
+        return ft.Markdown(
+            block.text,
+            selectable=True,
+            extension_set=ft.MarkdownExtensionSet.GITHUB_WEB,
+            code_theme=CODE_THEME if block.code and block.complete else None,
+        )
@@ -5,8 +5,12 @@ import logging
 import flet as ft
 
 from screens.chat_screen import ChatScreen
+from screens.update_scheduler import UpdateScheduler
+from services.app_context import AppContext
+from services.health_check import ProbeResult, probe_all
 from services.mistral_api import MistralAPI
-from services.provider_manager import ProviderManager, ProviderSettings
+from services.provider_manager import ProviderSettings, ProviderSnapshot
+from services.request_scheduler import Priority
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -15,36 +19,31 @@ logger = logging.getLogger(__name__)
 class ProviderScreen:
     """Provider settings screen UI and logic."""
 
-    def __init__(self, page: ft.Page) -> None:
+    def __init__(
+        self, page: ft.Page, context: AppContext | None = None, session_id: str | None = None
+    ) -> None:
         """Initialize provider screen.
 
         Args:
             page: Flet page instance.
+            context: State shared with the other sessions of the process.
+                Defaults to a context of this screen's own.
+            session_id: Identifier of the browser session.
         """
         self.page = page
-        self.provider_manager = ProviderManager()
-
-        # Load API key from .env for display
-        import os
-
-        from dotenv import load_dotenv
-
-        load_dotenv()
-        self.env_api_key = os.getenv("MISTRAL_API_KEY", "")
-
-        # Initialize MistralAPI with the loaded API key
-        self.mistral_api = MistralAPI(self.env_api_key)
-
-        # Initialize with a default provider
-        self._initialize_default_provider()
-
-    def _initialize_default_provider(self) -> None:
-        """Initialize with a default Mistral provider."""
-        default_settings = ProviderSettings(
-            name="MistralMedium",
-            api_key="",  # Will be loaded from .env
-        )
-        self.provider_manager.add_provider(default_settings)
+        self.context = context or AppContext()
+        self.provider_manager = self.context.provider_manager
+        self.conversation_store = self.context.conversation_store
+        self.search_index = self.context.search_index
+        self.usage_ledger = self.context.usage_ledger
+        self.scheduler = self.context.scheduler
+        self.env_api_key = self.context.env_api_key
+        self.mistral_api = self.context.clients.default
+        self.chat_screen: ChatScreen | None = None
+        self.main_content: ft.Row | None = None
+        # Providers are shared by every session; show changes made elsewhere
+        self._unsubscribe = self.provider_manager.subscribe(self._on_providers_changed)
+        self.session = self.context.open_session(session_id, on_close=self.close)
 
     def build(self) -> ft.Column:
         """Build the provider settings screen.
@@ -106,7 +105,7 @@ class ProviderScreen:
         Returns:
             Flet Row containing sidebar and form.
         """
-        return ft.Row(
+        self.main_content = ft.Row(
             controls=[
                 self._build_sidebar(),
                 ft.VerticalDivider(width=1),
@@ -114,6 +113,19 @@ class ProviderScreen:
             ],
             expand=True,
         )
+        return self.main_content
+
+    def _on_providers_changed(self, snapshot: ProviderSnapshot) -> None:
+        """Rebuild the sidebar when the provider list changes.
+
+        Args:
+            snapshot: New version of the provider list.
+        """
+        if self.main_content is None:
+            return
+        logger.debug(f"Providers changed to version {snapshot.version}")
+        self.main_content.controls[0] = self._build_sidebar()
+        self.page.update()
 
     def _build_sidebar(self) -> ft.Column:
         """Build the left sidebar with provider list.
@@ -156,6 +168,12 @@ class ProviderScreen:
                 ft.Text("Providers", size=18, weight=ft.FontWeight.BOLD),
                 ft.Divider(),
                 *provider_items,
+                ft.OutlinedButton(
+                    "Test all",
+                    icon=ft.Icons.NETWORK_CHECK,
+                    tooltip="Probe every provider concurrently",
+                    on_click=self.test_all_providers,
+                ),
             ],
             width=300,
             expand=False,
@@ -282,7 +300,23 @@ class ProviderScreen:
             e: Control event.
         """
         logger.info("Opening chat window")
-        chat_screen = ChatScreen(self.page)
+        self.context.touch(self.session.session_id)
+        if self.chat_screen is not None:
+            # Only one chat window per session is kept alive
+            self.chat_screen.stop_generation()
+        chat_screen = self.chat_screen = ChatScreen(
+            self.page,
+            provider_manager=self.provider_manager,
+            store=self.conversation_store,
+            search_index=self.search_index,
+            scheduler=self.scheduler,
+            usage_ledger=self.usage_ledger,
+            # The stores are shared by every session, so each one keeps its own chat
+            conversation_id=f"session-{self.session.session_id}",
+            clients=self.context.clients,
+            on_activity=lambda: self.context.touch(self.session.session_id),
+            documents=self.context.documents,
+        )
         dialog = chat_screen.build()
         self.page.dialog = dialog
         dialog.open = True
@@ -336,12 +370,12 @@ class ProviderScreen:
         """
         logger.info("Testing provider settings")
         try:
-            models = self.mistral_api.list_models()
+            models = self.mistral_api.list_models(session="settings", priority=Priority.PROBE)
             model_count = len(models.get("data", []))
 
-            # Log models at INFO level as requested
             logger.info(f"Successfully connected to Mistral API. Found {model_count} models.")
-            logger.info(f"Available models: {models.get('data', [])}")
+            # The full model list is large, so it is only formatted at DEBUG
+            logger.debug("Available models: %s", models.get("data", []))
 
             # Show success banner
             self.page.banner = ft.Banner(
@@ -377,6 +411,100 @@ class ProviderScreen:
             self.page.banner.open = True
             self.page.update()
 
+    def test_all_providers(self, e: ft.ControlEvent) -> None:
+        """Probe every provider concurrently and show a live results table.
+
+        Args:
+            e: Control event.
+        """
+        providers = self.provider_manager.list_providers()
+        logger.info(f"Testing {len(providers)} providers")
+
+        table = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Provider")),
+                ft.DataColumn(ft.Text("Status")),
+                ft.DataColumn(ft.Text("Connect"), numeric=True),
+                ft.DataColumn(ft.Text("/models"), numeric=True),
+                ft.DataColumn(ft.Text("TTFT"), numeric=True),
+            ],
+            rows=[
+                ft.DataRow(
+                    cells=[
+                        ft.DataCell(ft.Text(provider.name)),
+                        ft.DataCell(ft.Text("Testing...")),
+                        ft.DataCell(ft.Text("")),
+                        ft.DataCell(ft.Text("")),
+                        ft.DataCell(ft.Text("")),
+                    ]
+                )
+                for provider in providers
+            ],
+        )
+        dialog = ft.AlertDialog(
+            title=ft.Text("Provider Health"),
+            content=ft.Column(controls=[table], scroll=ft.ScrollMode.AUTO, width=600),
+            actions=[
+                ft.TextButton("Close", on_click=lambda e: self._close_dialog(dialog)),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+
+        updates = UpdateScheduler(self.page)
+
+        def on_result(position: int, result: ProbeResult) -> None:
+            self._fill_probe_row(table.rows[position], result)
+            updates.request_update()
+
+        def run() -> None:
+            probe_all(providers, self._client_for, on_result=on_result)
+            updates.update_now()
+
+        self.page.run_thread(run)
+
+    def _fill_probe_row(self, row: ft.DataRow, result: ProbeResult) -> None:
+        """Show a probe result in its table row.
+
+        Args:
+            row: Table row of the provider.
+            result: Probe result.
+        """
+
+        def ms(seconds: float | None) -> str:
+            return f"{seconds * 1000:.0f} ms" if seconds is not None else "-"
+
+        status = row.cells[1].content
+        if result.ok:
+            status.value = f"✓ {result.model_count} models"
+            status.color = ft.Colors.GREEN_700
+        else:
+            status.value = f"✗ {result.error}"
+            status.color = ft.Colors.RED_700
+        row.cells[2].content.value = ms(result.connect_time)
+        row.cells[3].content.value = ms(result.models_latency)
+        row.cells[4].content.value = ms(result.ttft)
+
+    def _client_for(self, settings: ProviderSettings) -> MistralAPI:
+        """Get the API client for a provider.
+
+        Args:
+            settings: Provider settings.
+
+        Returns:
+            The provider's own client, or the default one without an API key.
+        """
+        return self.context.clients.client_for(settings)
+
+    def close(self) -> None:
+        """Release the session's per-user state, e.g. when it is evicted."""
+        self._unsubscribe()
+        if self.chat_screen is not None:
+            self.chat_screen.stop_generation()
+            self.chat_screen = None
+
     def _close_banner(self) -> None:
         """Close the banner."""
         if self.page.banner:
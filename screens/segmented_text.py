@@ -0,0 +1,88 @@
+"""Append-only segmented text control."""
+
+import flet as ft
+
+
+class SegmentedText:
+    """Text shown as a chain of sealed spans plus one small live tail.
+
+    Appending only changes the tail span; once the tail reaches
+    ``segment_size`` characters it is sealed and a new tail is started.
+    Sealed spans never change again, so each page update only sends the
+    tail instead of the whole accumulated text.
+    """
+
+    def __init__(
+        self,
+        text: str = "",
+        segment_size: int = 256,
+        size: float = 14,
+        color: str | None = None,
+        font_family: str | None = None,
+    ) -> None:
+        """Initialize segmented text.
+
+        Args:
+            text: Initial text.
+            segment_size: Maximum number of characters in one span.
+            size: Font size.
+            color: Text color.
+            font_family: Font family, e.g. ``monospace`` for code.
+        """
+        if segment_size <= 0:
+            raise ValueError("segment_size must be positive")
+        self.segment_size = segment_size
+        self.control = ft.Text(spans=[], size=size, color=color, font_family=font_family)
+        self._tail = ft.TextSpan("")
+        self.control.spans.append(self._tail)
+        self.append(text)
+
+    @property
+    def spans(self) -> list[ft.TextSpan]:
+        """All spans, sealed ones first and the live tail last."""
+        return self.control.spans
+
+    @property
+    def text(self) -> str:
+        """Full text of all spans."""
+        return "".join(span.text for span in self.control.spans)
+
+    def append(self, text: str) -> None:
+        """Append text to the live tail, sealing full segments.
+
+        Args:
+            text: Text to append.
+        """
+        if not text:
+            return
+        tail = self._tail.text + text
+        while len(tail) > self.segment_size:
+            # Seal the current tail with a full segment and start a new one
+            self._tail.text = tail[: self.segment_size]
+            tail = tail[self.segment_size :]
+            self._tail = ft.TextSpan("")
+            self.control.spans.append(self._tail)
+        self._tail.text = tail
+
+    def set_text(self, text: str) -> None:
+        """Replace the whole text.
+
+        Keeps sealed spans that are a prefix of the new text and only
+        rebuilds from the first span that differs.
+
+        Args:
+            text: New text.
+        """
+        spans = self.control.spans
+        offset = 0
+        keep = 0
+        for span in spans[:-1]:
+            if text.startswith(span.text, offset):
+                offset += len(span.text)
+                keep += 1
+            else:
+                break
+        del spans[keep:]
+        self._tail = ft.TextSpan("")
+        spans.append(self._tail)
+        self.append(text[offset:])
@@ -0,0 +1,96 @@
+"""Frame-rate-limited page update scheduler."""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from contextlib import AbstractContextManager, nullcontext
+
+import flet as ft
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class UpdateScheduler:
+    """Coalesce page updates and flush them at most at a fixed frame rate.
+
+    Controls can be changed as often as needed; callers then call
+    ``request_update``. The first request after a quiet period is flushed
+    immediately, later ones within the same frame are merged into a single
+    ``page.update()`` sent when the frame interval has elapsed.
+    """
+
+    def __init__(
+        self,
+        page: ft.Page,
+        max_fps: float = 20.0,
+        clock: Callable[[], float] = time.monotonic,
+        lock: AbstractContextManager | None = None,
+    ) -> None:
+        """Initialize update scheduler.
+
+        Args:
+            page: Flet page instance.
+            max_fps: Maximum number of page updates per second.
+            clock: Monotonic clock returning seconds.
+            lock: Optional lock held while the page is updated, so controls
+                other threads change are not sent halfway through a change.
+        """
+        if max_fps <= 0:
+            raise ValueError("max_fps must be positive")
+        self.page = page
+        self.max_fps = max_fps
+        self._clock = clock
+        self._page_lock = lock or nullcontext()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = float("-inf")
+        self._timer: threading.Timer | None = None
+        self.flush_count = 0
+
+    @property
+    def min_interval(self) -> float:
+        """Minimum number of seconds between two flushes."""
+        return 1.0 / self.max_fps
+
+    def request_update(self) -> None:
+        """Mark the page as changed and flush when the frame budget allows."""
+        with self._lock:
+            self._dirty = True
+            if self._timer is not None:
+                return
+            delay = self._last_flush + self.min_interval - self._clock()
+            if delay > 0:
+                self._timer = threading.Timer(delay, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+                return
+        self._flush()
+
+    def update_now(self) -> None:
+        """Flush pending and current changes immediately, e.g. on completion."""
+        with self._lock:
+            self._dirty = True
+        self._flush()
+
+    def close(self) -> None:
+        """Cancel any scheduled flush and send what is still pending."""
+        self._flush()
+
+    def _flush(self) -> None:
+        """Send a single page update if anything changed."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._last_flush = self._clock()
+            self.flush_count += 1
+        try:
+            with self._page_lock:
+                self.page.update()
+        except Exception as e:
+            logger.error(f"Page update failed: {e!s}")
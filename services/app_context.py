@@ -0,0 +1,394 @@
+"""Process-wide application state shared by every session."""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from dotenv import load_dotenv
+
+from services.conversation_store import ConversationStore
+from services.document_store import DocumentStore, default_document_store
+from services.logging_pipeline import register_secrets
+from services.mistral_api import MistralAPI, sdk_server_url
+from services.provider_manager import ProviderManager, ProviderSettings, ProviderSnapshot
+from services.request_scheduler import RequestScheduler
+from services.search_index import SearchIndex
+from services.semantic_cache import SemanticCache, semantic_cache_from_env
+from services.shared_state import RateLimiter, SharedCache, shared_state_from_env
+from services.usage_ledger import UsageLedger
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_default: "AppContext | None" = None
+_default_lock = threading.Lock()
+
+
+def default_provider_manager() -> ProviderManager:
+    """Create a provider store holding the default Mistral provider.
+
+    Returns:
+        Provider manager with one provider using the API key from .env.
+    """
+    provider_manager = ProviderManager()
+    provider_manager.add_provider(ProviderSettings(name="MistralMedium", api_key=""))
+    return provider_manager
+
+
+def provider_api_keys(snapshot: ProviderSnapshot) -> list[str]:
+    """Get the API keys of the providers of a snapshot.
+
+    Args:
+        snapshot: Provider list.
+
+    Returns:
+        Non-empty API keys.
+    """
+    return [settings.api_key for settings in snapshot if settings.api_key]
+
+
+class ClientPool:
+    """API clients shared per API key and server.
+
+    Providers without their own API key use the environment's key, and
+    those on the default server without one use the default client. Clients
+    keep their HTTP connections open, so sharing them avoids a connection
+    pool per session and provider.
+    """
+
+    def __init__(
+        self,
+        scheduler: RequestScheduler | None = None,
+        api_key: str = "",
+        cache: SharedCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        semantic_cache: SemanticCache | None = None,
+        api_factory: Callable[..., MistralAPI] = MistralAPI,
+    ) -> None:
+        """Initialize client pool.
+
+        Args:
+            scheduler: Scheduler every client's requests go through.
+            api_key: API key of the default client. Defaults to the environment.
+            cache: Optional cache shared with other worker processes.
+            rate_limiter: Optional rate limit shared with other worker processes.
+            semantic_cache: Optional cache answering prompts similar to
+                earlier ones.
+            api_factory: Builds a client with the arguments of ``MistralAPI``,
+                e.g. one talking to a local stand-in.
+        """
+        self.scheduler = scheduler
+        self.api_key = api_key
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.semantic_cache = semantic_cache
+        self.api_factory = api_factory
+        self._clients: dict[tuple[str, str | None], MistralAPI] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    @property
+    def default(self) -> MistralAPI:
+        """Client using the API key from the environment."""
+        return self._get("", None)
+
+    def client_for(self, settings: ProviderSettings) -> MistralAPI:
+        """Get the API client for a provider.
+
+        Args:
+            settings: Provider settings.
+
+        Returns:
+            The shared client for the provider's API key and URL, or the
+            default one without an API key on the default server.
+        """
+        return self._get(settings.api_key, sdk_server_url(settings.url))
+
+    def retain(self, snapshot: ProviderSnapshot) -> None:
+        """Drop the clients of API keys and servers no provider uses any more.
+
+        Args:
+            snapshot: Current provider list.
+        """
+        in_use = {
+            ("", None),
+            *((settings.api_key, sdk_server_url(settings.url)) for settings in snapshot),
+        }
+        with self._lock:
+            for key in self._clients.keys() - in_use:
+                del self._clients[key]
+
+    def _get(self, api_key: str, server_url: str | None) -> MistralAPI:
+        """Get or create the client for an API key and server.
+
+        Args:
+            api_key: API key, or an empty string for the environment's key.
+            server_url: SDK server URL, or None for the default server.
+
+        Returns:
+            Shared client.
+        """
+        key = (api_key, server_url)
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = self.api_factory(
+                    api_key or self.api_key or None,
+                    self.scheduler,
+                    cache=self.cache,
+                    rate_limiter=self.rate_limiter,
+                    semantic_cache=self.semantic_cache,
+                    server_url=server_url,
+                )
+            return self._clients[key]
+
+
+@dataclass
+class SessionState:
+    """Per-user state of one browser session."""
+    session_id: str
+    created_at: float
+    last_active: float
+    on_close: list[Callable[[], None]] = field(default_factory=list)
+
+    def close(self) -> None:
+        """Release the session's resources."""
+        for callback in self.on_close:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Failed to close session {self.session_id}: {e!s}")
+        self.on_close.clear()
+
+
+class AppContext:
+    """State shared by every session of the process.
+
+    Holds the API clients, request scheduler, provider store, conversation
+    store, search index and usage ledger once per process, so memory and
+    connections do not grow with the number of sessions. Sessions register
+    here and only keep per-user state; sessions idle for longer than the
+    timeout, or the least recently used ones beyond ``max_sessions``, are
+    closed.
+    """
+
+    def __init__(
+        self,
+        scheduler: RequestScheduler | None = None,
+        provider_manager: ProviderManager | None = None,
+        conversation_store: ConversationStore | None = None,
+        search_index: SearchIndex | None = None,
+        usage_ledger: UsageLedger | None = None,
+        shared_cache: SharedCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        semantic_cache: SemanticCache | None = None,
+        documents: DocumentStore | None = None,
+        api_factory: Callable[..., MistralAPI] = MistralAPI,
+        idle_timeout: float = 30 * 60,
+        max_sessions: int = 500,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize application context.
+
+        Args:
+            scheduler: Request scheduler. Defaults to a new one.
+            provider_manager: Provider store. Defaults to one with the default
+                provider.
+            conversation_store: Conversation store. Defaults to the data directory.
+            search_index: Search index. Defaults to the data directory.
+            usage_ledger: Usage ledger. Defaults to the data directory.
+            shared_cache: Cache shared with other worker processes. Defaults
+                to the one configured by the environment, if any.
+            rate_limiter: Rate limit shared with other worker processes.
+                Defaults to the one configured by the environment, if any.
+            semantic_cache: Cache answering prompts similar to earlier ones.
+                Defaults to the one configured by the environment, if any.
+            documents: Documents replies are grounded on. Defaults to the
+                data directory when NumPy is installed.
+            api_factory: Builds the API clients with the arguments of
+                ``MistralAPI``. Defaults to ``MistralAPI``.
+            idle_timeout: Seconds without activity after which a session is closed.
+            max_sessions: Maximum number of open sessions.
+            clock: Monotonic clock returning seconds.
+        """
+        load_dotenv()
+        self.env_api_key = os.getenv("MISTRAL_API_KEY", "")
+        # Every API call of the process goes through one scheduler
+        self.scheduler = scheduler or RequestScheduler()
+        self.provider_manager = provider_manager or default_provider_manager()
+        self.conversation_store = conversation_store or ConversationStore()
+        self.search_index = search_index or SearchIndex()
+        self.usage_ledger = usage_ledger or UsageLedger()
+        if shared_cache is None and rate_limiter is None:
+            shared_cache, rate_limiter = shared_state_from_env()
+        self.shared_cache = shared_cache
+        self.rate_limiter = rate_limiter
+        self.clients = ClientPool(
+            self.scheduler, self.env_api_key, shared_cache, rate_limiter, api_factory=api_factory
+        )
+        # Texts are embedded with the default client, whichever provider answers
+        if semantic_cache is None:
+            semantic_cache = semantic_cache_from_env(lambda text: self.clients.default.embed(text))
+        self.clients.semantic_cache = semantic_cache
+        if documents is None:
+            documents = default_document_store(
+                lambda texts: self.clients.default.embedder.embed_many(texts)
+            )
+        self.documents = documents
+        self.provider_manager.subscribe(self.clients.retain)
+        # Provider keys are masked in logs as soon as providers are loaded or added
+        register_secrets([self.env_api_key, *provider_api_keys(self.provider_manager.snapshot)])
+        self.provider_manager.subscribe(
+            lambda snapshot: register_secrets(provider_api_keys(snapshot))
+        )
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._clock = clock
+        self._sessions: OrderedDict[str, SessionState] = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    @property
+    def session_count(self) -> int:
+        """Number of open sessions."""
+        return len(self._sessions)
+
+    def open_session(
+        self, session_id: str | None = None, on_close: Callable[[], None] | None = None
+    ) -> SessionState:
+        """Register a session, evicting idle ones first.
+
+        Args:
+            session_id: Session identifier. Defaults to a random one.
+            on_close: Optional callback releasing the session's resources.
+
+        Returns:
+            Session state.
+        """
+        self.evict_idle()
+        now = self._clock()
+        session = SessionState(session_id or uuid.uuid4().hex, now, now)
+        if on_close is not None:
+            session.on_close.append(on_close)
+        with self._lock:
+            previous = self._sessions.pop(session.session_id, None)
+            self._sessions[session.session_id] = session
+            evicted = []
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1])
+        for stale in [previous, *evicted]:
+            if stale is not None:
+                logger.info(f"Closing session {stale.session_id} to make room")
+                stale.close()
+        logger.debug(f"Opened session {session.session_id} ({self.session_count} open)")
+        return session
+
+    def touch(self, session_id: str) -> None:
+        """Mark a session as active.
+
+        Args:
+            session_id: Session identifier.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_active = self._clock()
+                self._sessions.move_to_end(session_id)
+
+    def close_session(self, session_id: str) -> bool:
+        """Close a session and release its resources.
+
+        Args:
+            session_id: Session identifier.
+
+        Returns:
+            True if the session was open.
+        """
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.close()
+        logger.debug(f"Closed session {session_id} ({self.session_count} open)")
+        return True
+
+    def evict_idle(self) -> list[str]:
+        """Close sessions idle for longer than the timeout.
+
+        Returns:
+            Identifiers of the closed sessions.
+        """
+        cutoff = self._clock() - self.idle_timeout
+        with self._lock:
+            # Sessions are kept in order of last activity
+            idle = []
+            for session in self._sessions.values():
+                if session.last_active > cutoff:
+                    break
+                idle.append(session)
+            for session in idle:
+                del self._sessions[session.session_id]
+        for session in idle:
+            logger.info(f"Evicting idle session {session.session_id}")
+            session.close()
+        return [session.session_id for session in idle]
+
+    def start_reaper(self, interval: float = 60.0) -> None:
+        """Evict idle sessions periodically on a background thread.
+
+        Args:
+            interval: Seconds between checks.
+        """
+        if self._reaper is not None:
+            return
+
+        def run() -> None:
+            while not self._stopped.wait(interval):
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=run, name="session-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self) -> dict[str, int]:
+        """Get process-wide metrics.
+
+        Returns:
+            Open sessions, API clients and scheduled requests.
+        """
+        return {
+            "sessions": self.session_count,
+            "clients": len(self.clients),
+            "active_requests": self.scheduler.active,
+            "waiting_requests": self.scheduler.waiting,
+        }
+
+    def close(self) -> None:
+        """Close every session and the shared stores."""
+        self._stopped.set()
+        for session_id in list(self._sessions):
+            self.close_session(session_id)
+        self.search_index.close()
+        self.usage_ledger.close()
+        for shared in (self.shared_cache, self.rate_limiter):
+            if shared is not None:
+                shared.close()
+
+
+def app_context() -> AppContext:
+    """Get the context shared by every session of the process.
+
+    Returns:
+        Process-wide application context, created on first use.
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = AppContext()
+        return _default
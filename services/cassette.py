@@ -0,0 +1,413 @@
+"""Record and replay API traffic for offline tests and benchmarks."""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+from services.stream_watchdog import interrupt_stream
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Request parameters that identify an interaction; transport options are ignored
+REQUEST_KEYS = (
+    "model",
+    "messages",
+    "inputs",
+    "max_tokens",
+    "temperature",
+    "top_p",
+    "response_format",
+)
+
+_from_env: dict[tuple[str, str, float], "Cassette"] = {}
+_from_env_lock = threading.Lock()
+
+
+class CassetteMissError(RuntimeError):
+    """Raised when a replayed request was never recorded."""
+
+
+@dataclass
+class Interaction:
+    """One recorded request with its response, timings in seconds.
+
+    Streams keep every chunk with the delay since the previous one (or
+    since the request for the first chunk).
+    """
+    method: str
+    request: dict[str, Any]
+    response: Any = None
+    chunks: list[tuple[float, dict[str, Any]]] = field(default_factory=list)
+    latency: float = 0.0
+    error: str | None = None
+
+
+def request_key(method: str, request: dict[str, Any]) -> str:
+    """Build the lookup key of a request.
+
+    Args:
+        method: API method, e.g. ``chat.stream``.
+        request: Request parameters.
+
+    Returns:
+        Canonical JSON of the method and identifying parameters.
+    """
+    params = {key: request[key] for key in REQUEST_KEYS if key in request}
+    return json.dumps([method, params], sort_keys=True, ensure_ascii=False)
+
+
+class Cassette:
+    """A JSON lines file of recorded API interactions.
+
+    In ``record`` mode interactions are appended as they finish. In
+    ``replay`` mode identical requests are answered in the order they were
+    recorded; with ``loop`` they start over once exhausted, so a short
+    recording can drive a long load test.
+    """
+
+    def __init__(
+        self, path: str | Path, mode: str = "replay", speed: float = 1.0, loop: bool = True
+    ) -> None:
+        """Initialize cassette.
+
+        Args:
+            path: Cassette file.
+            mode: ``record`` or ``replay``.
+            speed: Replay speed factor; 2.0 replays twice as fast and 0 skips
+                all delays.
+            loop: Start over when a request's recordings are exhausted.
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.speed = speed
+        self.loop = loop
+        self._lock = threading.Lock()
+        self._interactions: dict[str, list[Interaction]] = {}
+        self._positions: dict[str, int] = {}
+        if mode == "replay":
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        """Whether interactions are being recorded."""
+        return self.mode == "record"
+
+    def __len__(self) -> int:
+        return sum(len(interactions) for interactions in self._interactions.values())
+
+    def _load(self) -> None:
+        """Read every interaction from the cassette file."""
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                data["chunks"] = [tuple(chunk) for chunk in data.get("chunks", [])]
+                interaction = Interaction(**data)
+                key = request_key(interaction.method, interaction.request)
+                self._interactions.setdefault(key, []).append(interaction)
+        logger.info(f"Loaded {len(self)} interactions from {self.path}")
+
+    def record(self, interaction: Interaction) -> None:
+        """Append an interaction to the cassette file.
+
+        Args:
+            interaction: Finished interaction.
+        """
+        line = json.dumps(asdict(interaction), ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+            key = request_key(interaction.method, interaction.request)
+            self._interactions.setdefault(key, []).append(interaction)
+        logger.debug(f"Recorded {interaction.method} interaction to {self.path}")
+
+    def next(self, method: str, request: dict[str, Any]) -> Interaction:
+        """Get the recorded answer to a request.
+
+        Args:
+            method: API method.
+            request: Request parameters.
+
+        Returns:
+            The next recorded interaction for this request.
+
+        Raises:
+            CassetteMissError: If the request was not recorded, or all its
+                recordings were used and ``loop`` is off.
+        """
+        key = request_key(method, request)
+        with self._lock:
+            interactions = self._interactions.get(key)
+            position = self._positions.get(key, 0)
+            if not interactions or (position >= len(interactions) and not self.loop):
+                raise CassetteMissError(f"No recorded {method} interaction for this request")
+            self._positions[key] = position + 1
+            return interactions[position % len(interactions)]
+
+    def delay(self, seconds: float) -> float:
+        """Scale a recorded delay by the replay speed.
+
+        Args:
+            seconds: Recorded delay.
+
+        Returns:
+            Delay to wait, or 0 when delays are skipped.
+        """
+        return seconds / self.speed if self.speed > 0 else 0.0
+
+
+def cassette_from_env() -> Cassette | None:
+    """Get the cassette configured by environment variables.
+
+    ``FLET_CHAT_CASSETTE`` names the file, ``FLET_CHAT_CASSETTE_MODE`` is
+    ``record`` or ``replay`` (default) and ``FLET_CHAT_CASSETTE_SPEED`` scales
+    replay timing. Every client shares one cassette per configuration.
+
+    Returns:
+        Shared cassette, or None when no cassette is configured.
+    """
+    path = os.getenv("FLET_CHAT_CASSETTE")
+    if not path:
+        return None
+    mode = os.getenv("FLET_CHAT_CASSETTE_MODE", "replay")
+    speed = float(os.getenv("FLET_CHAT_CASSETTE_SPEED", "1"))
+    with _from_env_lock:
+        key = (path, mode, speed)
+        if key not in _from_env:
+            _from_env[key] = Cassette(path, mode=mode, speed=speed)
+        return _from_env[key]
+
+
+class _Payload(dict):
+    """Replayed response body with the SDK model interface."""
+
+    def model_dump(self) -> dict[str, Any]:
+        return dict(self)
+
+
+def _dump(model: Any) -> Any:
+    """Convert an SDK response model to plain data.
+
+    Args:
+        model: SDK model or plain value.
+
+    Returns:
+        JSON serializable data.
+    """
+    if hasattr(model, "model_dump"):
+        return model.model_dump()
+    if hasattr(model, "dict"):
+        return model.dict()
+    return model
+
+
+class ReplayStream:
+    """Replayed chat stream with the SDK event stream interface."""
+
+    def __init__(self, interaction: Interaction, cassette: Cassette, sleep: Callable) -> None:
+        """Initialize replay stream.
+
+        Args:
+            interaction: Recorded stream.
+            cassette: Cassette providing the replay speed.
+            sleep: Function waiting for a number of seconds.
+        """
+        self.interaction = interaction
+        self.cassette = cassette
+        self.sleep = sleep
+
+    def __enter__(self) -> "ReplayStream":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        return None
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        for delay, chunk in self.interaction.chunks:
+            wait = self.cassette.delay(delay)
+            if wait:
+                self.sleep(wait)
+            yield SimpleNamespace(data=_Payload(chunk))
+        if self.interaction.error is not None:
+            raise RuntimeError(self.interaction.error)
+
+
+class ReplayClient:
+    """Stand-in for the Mistral SDK client that serves a cassette."""
+
+    def __init__(self, cassette: Cassette, sleep: Callable[[float], None] = time.sleep) -> None:
+        """Initialize replay client.
+
+        Args:
+            cassette: Cassette in replay mode.
+            sleep: Function waiting for a number of seconds.
+        """
+        self.cassette = cassette
+        self.sleep = sleep
+        self.chat = SimpleNamespace(stream=self._stream, complete=self._complete)
+        self.models = SimpleNamespace(list=self._list_models)
+        self.embeddings = SimpleNamespace(create=self._create_embeddings)
+
+    def _respond(self, method: str, request: dict[str, Any]) -> _Payload:
+        """Replay a request answered in one response.
+
+        Args:
+            method: API method.
+            request: Request parameters.
+
+        Returns:
+            Recorded response.
+        """
+        interaction = self.cassette.next(method, request)
+        wait = self.cassette.delay(interaction.latency)
+        if wait:
+            self.sleep(wait)
+        if interaction.error is not None:
+            raise RuntimeError(interaction.error)
+        return _Payload(interaction.response)
+
+    def _stream(self, **request: Any) -> ReplayStream:
+        return ReplayStream(self.cassette.next("chat.stream", request), self.cassette, self.sleep)
+
+    def _complete(self, **request: Any) -> _Payload:
+        return self._respond("chat.complete", request)
+
+    def _list_models(self, **request: Any) -> _Payload:
+        return self._respond("models.list", request)
+
+    def _create_embeddings(self, **request: Any) -> _Payload:
+        return self._respond("embeddings.create", request)
+
+
+class RecordingStream:
+    """Chat stream that records its chunks and their timing as they pass."""
+
+    def __init__(
+        self,
+        stream: Any,
+        interaction: Interaction,
+        cassette: Cassette,
+        start: float,
+        clock: Callable[[], float],
+    ) -> None:
+        """Initialize recording stream.
+
+        Args:
+            stream: SDK event stream.
+            interaction: Interaction being recorded.
+            cassette: Cassette in record mode.
+            start: Clock time the request was sent.
+            clock: Monotonic clock returning seconds.
+        """
+        self.stream = stream
+        self.interaction = interaction
+        self.cassette = cassette
+        self.clock = clock
+        self._start = start
+        self._last = start
+        self._recorded = False
+
+    def __enter__(self) -> "RecordingStream":
+        self.stream.__enter__()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        try:
+            self.stream.__exit__(*args)
+        finally:
+            self._save()
+
+    def close(self) -> None:
+        """Interrupt the recorded stream, e.g. from a watchdog thread."""
+        interrupt_stream(self.stream)
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            for event in self.stream:
+                now = self.clock()
+                self.interaction.chunks.append((now - self._last, _dump(event.data)))
+                self._last = now
+                yield event
+        except Exception as e:
+            self.interaction.error = str(e)
+            raise
+
+    def _save(self) -> None:
+        """Record the interaction once."""
+        if not self._recorded:
+            self._recorded = True
+            self.interaction.latency = self._last - self._start
+            self.cassette.record(self.interaction)
+
+
+class RecordingClient:
+    """Wrapper around the Mistral SDK client that records every call."""
+
+    def __init__(
+        self, client: Any, cassette: Cassette, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """Initialize recording client.
+
+        Args:
+            client: Mistral SDK client.
+            cassette: Cassette in record mode.
+            clock: Monotonic clock returning seconds.
+        """
+        self.client = client
+        self.cassette = cassette
+        self.clock = clock
+        self.chat = SimpleNamespace(stream=self._stream, complete=self._complete)
+        self.models = SimpleNamespace(list=self._list_models)
+        self.embeddings = SimpleNamespace(create=self._create_embeddings)
+
+    def _call(self, method: str, call: Callable[..., Any], request: dict[str, Any]) -> Any:
+        """Call the SDK and record the response.
+
+        Args:
+            method: API method.
+            call: SDK function.
+            request: Request parameters.
+
+        Returns:
+            SDK response.
+        """
+        interaction = Interaction(method=method, request=dict(request))
+        start = self.clock()
+        try:
+            response = call(**request)
+        except Exception as e:
+            interaction.error = str(e)
+            raise
+        else:
+            interaction.response = _dump(response)
+            return response
+        finally:
+            interaction.latency = self.clock() - start
+            self.cassette.record(interaction)
+
+    def _stream(self, **request: Any) -> RecordingStream:
+        interaction = Interaction(method="chat.stream", request=dict(request))
+        start = self.clock()
+        stream = self.client.chat.stream(**request)
+        return RecordingStream(stream, interaction, self.cassette, start, self.clock)
+
+    def _complete(self, **request: Any) -> Any:
+        return self._call("chat.complete", self.client.chat.complete, request)
+
+    def _list_models(self, **request: Any) -> Any:
+        return self._call("models.list", self.client.models.list, request)
+
+    def _create_embeddings(self, **request: Any) -> Any:
+        return self._call("embeddings.create", self.client.embeddings.create, request)
@@ -0,0 +1,183 @@
+"""Concurrent multi-provider comparison."""
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from services.message import Message
+from services.mistral_api import MistralAPI, delta_text
+from services.provider_manager import ProviderSettings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderRunStats:
+    """Result and timings of one provider's answer in a comparison."""
+    provider: str
+    model: str
+    text: str = ""
+    ttft: float | None = None
+    total_latency: float | None = None
+    completion_tokens: int = 0
+    prompt_tokens: int = 0
+    cache_hit: bool = False
+    error: str | None = None
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        """Generation speed after the first token, if it can be computed."""
+        if self.ttft is None or self.total_latency is None or self.completion_tokens == 0:
+            return None
+        generation_time = self.total_latency - self.ttft
+        if generation_time <= 0:
+            return None
+        return self.completion_tokens / generation_time
+
+    def summary(self) -> str:
+        """Short human readable summary of the timings.
+
+        Returns:
+            Summary such as ``TTFT 0.31s · 42.0 tok/s · 2.10s``.
+        """
+        if self.error is not None:
+            return f"failed after {self.total_latency or 0:.2f}s"
+        if self.cache_hit:
+            return "cached"
+        parts = []
+        if self.ttft is not None:
+            parts.append(f"TTFT {self.ttft:.2f}s")
+        if self.tokens_per_second is not None:
+            parts.append(f"{self.tokens_per_second:.1f} tok/s")
+        if self.total_latency is not None:
+            parts.append(f"{self.total_latency:.2f}s")
+        return " · ".join(parts)
+
+
+def stream_with_stats(
+    client: MistralAPI,
+    settings: ProviderSettings,
+    messages: list[Message],
+    on_delta: Callable[[str], None] | None = None,
+    cancel_event: threading.Event | None = None,
+    clock: Callable[[], float] = time.monotonic,
+    session: str = "default",
+) -> ProviderRunStats:
+    """Stream one provider's answer while measuring its timings.
+
+    Args:
+        client: API client for the provider.
+        settings: Provider settings.
+        messages: Chat messages to send.
+        on_delta: Called with each text delta as it arrives.
+        cancel_event: Optional event to stop streaming.
+        clock: Monotonic clock returning seconds.
+        session: Session the request is scheduled under.
+
+    Returns:
+        Answer text and timings. Errors are recorded rather than raised.
+    """
+    stats = ProviderRunStats(provider=settings.name, model=settings.model)
+    parts: list[str] = []
+    deltas = 0
+    usage_tokens = None
+    start = clock()
+    try:
+        for chunk in client.chat_completion_stream(
+            messages,
+            model=settings.model,
+            max_tokens=settings.max_tokens,
+            temperature=settings.temperature,
+            top_p=settings.top_p,
+            timeout=settings.request_timeout,
+            cancel_event=cancel_event,
+            session=session,
+            # Compared answers and timings must come from the provider itself
+            cached=False,
+        ):
+            stats.cache_hit = stats.cache_hit or bool(chunk.get("cache_hit"))
+            usage = chunk.get("usage") or {}
+            if usage.get("completion_tokens"):
+                usage_tokens = usage["completion_tokens"]
+            if usage.get("prompt_tokens"):
+                stats.prompt_tokens = usage["prompt_tokens"]
+            delta = delta_text(chunk)
+            if not delta:
+                continue
+            if stats.ttft is None:
+                stats.ttft = clock() - start
+            deltas += 1
+            parts.append(delta)
+            if on_delta is not None:
+                on_delta(delta)
+    except Exception as e:
+        stats.error = str(e)
+    stats.total_latency = clock() - start
+    if stats.cache_hit:
+        # Not a measurement of the provider
+        stats.ttft = None
+    stats.text = "".join(parts)
+    # Mistral streams roughly one token per chunk when usage is missing
+    stats.completion_tokens = usage_tokens or deltas
+    return stats
+
+
+def run_comparison(
+    messages: list[Message],
+    providers: Sequence[ProviderSettings],
+    client_for: Callable[[ProviderSettings], MistralAPI],
+    on_delta: Callable[[int, str], None] | None = None,
+    on_done: Callable[[int, ProviderRunStats], None] | None = None,
+    cancel_event: threading.Event | None = None,
+    max_workers: int | None = None,
+    session: str = "default",
+) -> list[ProviderRunStats]:
+    """Send the same messages to several providers concurrently.
+
+    Args:
+        messages: Chat messages to send to every provider.
+        providers: Providers to compare.
+        client_for: Returns the API client for a provider.
+        on_delta: Called with the provider position and each text delta.
+        on_done: Called with the provider position and its stats when it finishes.
+        cancel_event: Optional event to stop all streams.
+        max_workers: Maximum concurrent requests. Defaults to one per provider.
+        session: Session the requests are scheduled under.
+
+    Returns:
+        Stats for each provider, in the order given.
+    """
+    if not providers:
+        return []
+
+    def run(position: int, settings: ProviderSettings) -> ProviderRunStats:
+        try:
+            client = client_for(settings)
+        except Exception as e:
+            stats = ProviderRunStats(
+                provider=settings.name, model=settings.model, total_latency=0.0, error=str(e)
+            )
+        else:
+            stats = stream_with_stats(
+                client,
+                settings,
+                messages,
+                on_delta=(lambda delta: on_delta(position, delta)) if on_delta else None,
+                cancel_event=cancel_event,
+                session=session,
+            )
+        logger.info(f"Compare {settings.name}: {stats.summary()}")
+        if on_done is not None:
+            on_done(position, stats)
+        return stats
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(providers)) as executor:
+        futures = [
+            executor.submit(run, position, settings)
+            for position, settings in enumerate(providers)
+        ]
+        return [future.result() for future in futures]
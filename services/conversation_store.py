@@ -0,0 +1,191 @@
+"""Append-only conversation persistence."""
+
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_DIR = Path.home() / ".flet-mistral-chat"
+
+# One little-endian unsigned 64-bit log offset per message
+INDEX_ENTRY = struct.Struct("<Q")
+
+
+def data_dir() -> Path:
+    """Get the application data directory, honouring ``FLET_CHAT_DATA_DIR``.
+
+    Returns:
+        Directory holding local application data.
+    """
+    return Path(os.getenv("FLET_CHAT_DATA_DIR") or DEFAULT_DATA_DIR)
+
+
+def default_store_dir() -> Path:
+    """Get the conversation directory.
+
+    Returns:
+        Directory holding conversation logs.
+    """
+    return data_dir() / "conversations"
+
+
+class ConversationStore:
+    """Persist conversations as append-only logs with an offset index.
+
+    Each conversation has a ``.log`` file with one JSON record per line and
+    an ``.idx`` file holding the byte offset of every record. Counting
+    messages is a file size lookup and reading the last N messages only
+    touches N index entries and N log lines through a memory map, so long
+    histories can be resumed without parsing the whole log.
+    """
+
+    def __init__(self, root: str | Path | None = None) -> None:
+        """Initialize conversation store.
+
+        Args:
+            root: Directory for the log files. Created on first write.
+        """
+        self.root = Path(root) if root is not None else default_store_dir()
+        self._lock = threading.Lock()
+
+    def _paths(self, conversation_id: str) -> tuple[Path, Path]:
+        """Get the log and index paths of a conversation.
+
+        Args:
+            conversation_id: Conversation identifier.
+
+        Returns:
+            Tuple of log path and index path.
+        """
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", conversation_id)
+        return self.root / f"{name}.log", self.root / f"{name}.idx"
+
+    def append(
+        self,
+        conversation_id: str,
+        record: dict[str, Any] | Callable[[int], dict[str, Any]],
+    ) -> int:
+        """Append a message record to a conversation.
+
+        Args:
+            conversation_id: Conversation identifier.
+            record: JSON serializable message record, or a function building
+                it from the sequence number it is stored at. The function is
+                called under the store lock, so records that refer to other
+                sequence numbers stay correct when several writers append.
+
+        Returns:
+            Sequence number of the new record.
+        """
+        log_path, index_path = self._paths(conversation_id)
+        with self._lock:
+            if callable(record):
+                record = record(self.count(conversation_id))
+            line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+            self.root.mkdir(parents=True, exist_ok=True)
+            # The log is written first; a record only counts once indexed
+            with open(log_path, "a+b") as log:
+                offset = log.seek(0, os.SEEK_END)
+                if offset:
+                    # Start on a fresh line after a torn, unindexed write
+                    log.seek(offset - 1)
+                    if log.read(1) != b"\n":
+                        log.write(b"\n")
+                        offset += 1
+                log.write(line)
+            with open(index_path, "ab") as index:
+                seq = index.seek(0, os.SEEK_END) // INDEX_ENTRY.size
+                index.write(INDEX_ENTRY.pack(offset))
+        return seq
+
+    def count(self, conversation_id: str) -> int:
+        """Count the messages of a conversation.
+
+        Args:
+            conversation_id: Conversation identifier.
+
+        Returns:
+            Number of stored messages.
+        """
+        _, index_path = self._paths(conversation_id)
+        try:
+            return index_path.stat().st_size // INDEX_ENTRY.size
+        except FileNotFoundError:
+            return 0
+
+    def read_range(self, conversation_id: str, start: int, stop: int) -> list[dict[str, Any]]:
+        """Read the records ``[start, stop)`` of a conversation.
+
+        Args:
+            conversation_id: Conversation identifier.
+            start: First sequence number.
+            stop: One past the last sequence number.
+
+        Returns:
+            List of message records.
+        """
+        total = self.count(conversation_id)
+        start, stop = max(0, start), min(stop, total)
+        if start >= stop:
+            return []
+        log_path, index_path = self._paths(conversation_id)
+
+        with open(index_path, "rb") as index:
+            index.seek(start * INDEX_ENTRY.size)
+            data = index.read((stop - start) * INDEX_ENTRY.size)
+
+        records = []
+        with open(log_path, "rb") as log, mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for (offset,) in INDEX_ENTRY.iter_unpack(data):
+                records.append(json.loads(mm[offset : mm.find(b"\n", offset)]))
+        return records
+
+    def tail(self, conversation_id: str, n: int) -> list[dict[str, Any]]:
+        """Read the last ``n`` records of a conversation.
+
+        Args:
+            conversation_id: Conversation identifier.
+            n: Number of records.
+
+        Returns:
+            List of message records, oldest first.
+        """
+        total = self.count(conversation_id)
+        return self.read_range(conversation_id, total - n, total)
+
+    def read_all(self, conversation_id: str) -> list[dict[str, Any]]:
+        """Read every record of a conversation.
+
+        Args:
+            conversation_id: Conversation identifier.
+
+        Returns:
+            List of message records, oldest first.
+        """
+        return self.read_range(conversation_id, 0, self.count(conversation_id))
+
+    def delete(self, conversation_id: str) -> bool:
+        """Delete a conversation.
+
+        Args:
+            conversation_id: Conversation identifier.
+
+        Returns:
+            True if deleted, False if not found.
+        """
+        with self._lock:
+            found = False
+            for path in self._paths(conversation_id):
+                if path.exists():
+                    path.unlink()
+                    found = True
+        return found
@@ -0,0 +1,304 @@
+"""Branching conversation history."""
+
+import logging
+from typing import Any
+
+from services.conversation_store import ConversationStore
+from services.message import Message
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def record_parent(seq: int, record: dict[str, Any]) -> int | None:
+    """Get the parent sequence number of a stored record.
+
+    Records only store their parent when it is not the previous record.
+
+    Args:
+        seq: Sequence number of the record.
+        record: Stored record.
+
+    Returns:
+        Sequence number of the parent, or None for a first message.
+    """
+    if "parent" in record:
+        return record["parent"]
+    return seq - 1 if seq > 0 else None
+
+
+def record_depth(seq: int, record: dict[str, Any]) -> int:
+    """Get the position of a stored record in its branch.
+
+    Records only store their depth when it differs from their sequence number.
+
+    Args:
+        seq: Sequence number of the record.
+        record: Stored record.
+
+    Returns:
+        Number of messages before the record in its branch.
+    """
+    return record.get("depth", seq)
+
+
+class ConversationNode:
+    """A message in a conversation tree.
+
+    Nodes are never changed once created: editing or regenerating a message
+    adds a sibling, so every branch shares its common prefix with the others.
+    Only the list of children grows.
+    """
+
+    __slots__ = ("children", "depth", "message", "parent", "seq")
+
+    def __init__(self, message: Message, parent: "ConversationNode | None", seq: int) -> None:
+        """Initialize conversation node.
+
+        Args:
+            message: Message of the node.
+            parent: Previous message in the branch, or None for a first message.
+            seq: Position of the node in creation order.
+        """
+        self.message = message
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.seq = seq
+        self.children: list[ConversationNode] = []
+
+    def __repr__(self) -> str:
+        return f"ConversationNode(seq={self.seq}, depth={self.depth}, message={self.message!r})"
+
+
+class ConversationTree:
+    """Conversation history with alternative branches.
+
+    The current branch is the path from a first message to ``head``. New
+    messages are added below the head; moving the head to an earlier node
+    and adding a message there starts a new branch without copying the
+    shared messages.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty conversation tree."""
+        self.nodes: list[ConversationNode] = []
+        self.roots: list[ConversationNode] = []
+        self.head: ConversationNode | None = None
+
+    @classmethod
+    def from_records(cls, records: list[dict[str, Any]]) -> "ConversationTree":
+        """Rebuild a tree from stored records.
+
+        Args:
+            records: Records in sequence order, as written by ``to_record``.
+
+        Returns:
+            Tree whose head is the last record.
+        """
+        tree = cls()
+        for seq, record in enumerate(records):
+            parent = record_parent(seq, record)
+            tree.head = tree.nodes[parent] if parent is not None else None
+            tree.add(Message.from_record(record))
+        return tree
+
+    def add(self, message: Message) -> ConversationNode:
+        """Add a message below the head and make it the new head.
+
+        Args:
+            message: Message to add.
+
+        Returns:
+            New node.
+        """
+        node = ConversationNode(message, self.head, len(self.nodes))
+        self.nodes.append(node)
+        self.siblings(node).append(node)
+        self.head = node
+        return node
+
+    def path(self, node: ConversationNode | None = None) -> list[ConversationNode]:
+        """Get the branch ending at a node.
+
+        Args:
+            node: Last node of the branch. Defaults to the head.
+
+        Returns:
+            Nodes from the first message to ``node``.
+        """
+        node = node if node is not None else self.head
+        path = []
+        while node is not None:
+            path.append(node)
+            node = node.parent
+        path.reverse()
+        return path
+
+    def messages(self, node: ConversationNode | None = None) -> list[Message]:
+        """Get the messages of the branch ending at a node.
+
+        Args:
+            node: Last node of the branch. Defaults to the head.
+
+        Returns:
+            Messages from the first one to ``node``; shared, not copied.
+        """
+        return [node.message for node in self.path(node)]
+
+    def siblings(self, node: ConversationNode) -> list[ConversationNode]:
+        """Get the alternatives of a node, including itself.
+
+        Args:
+            node: Conversation node.
+
+        Returns:
+            Children of the node's parent, oldest first.
+        """
+        return node.parent.children if node.parent is not None else self.roots
+
+    def leaf(self, node: ConversationNode) -> ConversationNode:
+        """Get the end of the most recent branch through a node.
+
+        Args:
+            node: Conversation node.
+
+        Returns:
+            Last node reached by following the newest children.
+        """
+        while node.children:
+            node = node.children[-1]
+        return node
+
+    def branch_point(self) -> ConversationNode | None:
+        """Get the deepest node of the current branch that has alternatives.
+
+        Returns:
+            Node with siblings, or None if the branch has no alternatives.
+        """
+        for node in reversed(self.path()):
+            if len(self.siblings(node)) > 1:
+                return node
+        return None
+
+    @staticmethod
+    def common_prefix(a: ConversationNode | None, b: ConversationNode | None) -> int:
+        """Count the messages shared by the branches ending at two nodes.
+
+        Args:
+            a: Last node of the first branch.
+            b: Last node of the second branch.
+
+        Returns:
+            Number of leading nodes both branches have in common.
+        """
+        if a is None or b is None:
+            return 0
+        while a.depth > b.depth:
+            a = a.parent
+        while b.depth > a.depth:
+            b = b.parent
+        while a is not b:
+            a, b = a.parent, b.parent
+        return a.depth + 1 if a is not None else 0
+
+    @staticmethod
+    def to_record(node: ConversationNode, seq: int | None = None) -> dict[str, Any]:
+        """Convert a node to a persistence record.
+
+        The parent and depth are only stored when they differ from the
+        previous record, so linear conversations are stored as before.
+
+        Args:
+            node: Conversation node.
+            seq: Sequence number the record is stored at. Defaults to the
+                node's own.
+
+        Returns:
+            JSON serializable dictionary.
+        """
+        seq = node.seq if seq is None else seq
+        record = node.message.to_record()
+        parent = node.parent.seq if node.parent is not None else None
+        if parent != (seq - 1 if seq > 0 else None):
+            record["parent"] = parent
+        if node.depth != seq:
+            record["depth"] = node.depth
+        return record
+
+
+class StoredPath:
+    """Current branch of a stored conversation, read lazily from its end.
+
+    The head is the last stored record. Earlier messages of its branch are
+    found by following parent links backwards only as far as they are read,
+    so resuming a long conversation does not parse the whole log.
+    """
+
+    def __init__(self, store: ConversationStore, conversation_id: str) -> None:
+        """Initialize stored path.
+
+        Args:
+            store: Conversation store.
+            conversation_id: Conversation identifier.
+        """
+        self.store = store
+        self.conversation_id = conversation_id
+        self.length = 0
+        # Sequence number of every position resolved so far
+        self._seqs: dict[int, int] = {}
+        self._records: dict[int, dict[str, Any]] = {}
+        total = store.count(conversation_id)
+        if total:
+            head = store.read_range(conversation_id, total - 1, total)[0]
+            depth = record_depth(total - 1, head)
+            self.length = depth + 1
+            self._seqs[depth] = total - 1
+            self._records[depth] = head
+            self._lowest = depth
+
+    def read(self, start: int, stop: int) -> list[dict[str, Any]]:
+        """Read the records at positions ``[start, stop)`` of the branch.
+
+        Args:
+            start: First position.
+            stop: One past the last position.
+
+        Returns:
+            List of message records.
+        """
+        start, stop = max(0, start), min(stop, self.length)
+        if start >= stop:
+            return []
+        self._resolve(start)
+        records = []
+        for depth in range(start, stop):
+            record = self._records.pop(depth, None)
+            if record is None:
+                seq = self._seqs[depth]
+                record = self.store.read_range(self.conversation_id, seq, seq + 1)[0]
+            records.append(record)
+        return records
+
+    def _resolve(self, start: int) -> None:
+        """Follow parent links back to a position.
+
+        Args:
+            start: Position to resolve.
+        """
+        depth = self._lowest
+        seq = self._seqs[depth]
+        record = self._records.get(depth)
+        if record is None and depth > start:
+            record = self.store.read_range(self.conversation_id, seq, seq + 1)[0]
+        page: dict[int, dict[str, Any]] = {}
+        while depth > start:
+            parent = record_parent(seq, record)
+            if parent not in page:
+                # Linear history: the remaining positions are the records just before
+                first = max(0, parent - (depth - start) + 1)
+                records = self.store.read_range(self.conversation_id, first, parent + 1)
+                page = dict(enumerate(records, first))
+            depth, seq, record = depth - 1, parent, page[parent]
+            self._seqs[depth] = seq
+            self._records[depth] = record
+        self._lowest = min(self._lowest, depth)
@@ -0,0 +1,436 @@
+"""Local document store for retrieving relevant passages."""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+try:
+    import numpy as np
+except ImportError:  # Optional: install numpy to enable documents
+    np = None
+
+from services.conversation_store import data_dir
+from services.shared_state import cache_key
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rows scored at a time, bounding memory on large corpora
+SEARCH_BLOCK = 65536
+
+
+@dataclass
+class DocumentChunk:
+    """Passage of a document returned by a search."""
+    source: str
+    index: int
+    text: str
+    score: float
+
+
+def chunk_text(text: str, size: int = 1000, overlap: int = 150) -> list[str]:
+    """Split text into overlapping chunks.
+
+    Chunks end at a paragraph, sentence or word break when there is one in
+    their second half.
+
+    Args:
+        text: Text to split.
+        size: Maximum characters per chunk.
+        overlap: Characters repeated at the start of the next chunk.
+
+    Returns:
+        Chunks in order.
+    """
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            for separator in ("\n\n", ". ", "\n", " "):
+                cut = text.rfind(separator, start + size // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+class DocumentStore:
+    """Chunked documents with a memory-mapped vector index on disk.
+
+    Chunk vectors are normalized and appended to a raw float32 file that
+    searches map into memory, so the corpus does not have to fit in RAM
+    and opening the store reads nothing but a small index file. Chunk texts
+    are kept in a JSON lines file with their end offsets in a second
+    mapped file, so a hit is read with one seek.
+
+    Documents are added one at a time while searches keep reading the
+    committed chunks. Appends beyond the committed chunk count are cut off
+    on the next write, so a crash while adding a document leaves the store
+    as it was.
+    """
+
+    def __init__(
+        self,
+        embed_many: Callable[[list[str]], list[list[float]]],
+        path: str | Path | None = None,
+        chunk_size: int = 1000,
+        overlap: int = 150,
+        batch_size: int = 64,
+    ) -> None:
+        """Initialize document store.
+
+        Args:
+            embed_many: Function embedding a list of texts.
+            path: Directory of the store. Defaults to ``documents`` in the
+                data directory.
+            chunk_size: Maximum characters per chunk.
+            overlap: Characters shared by consecutive chunks.
+            batch_size: Chunks embedded per call.
+
+        Raises:
+            ImportError: If NumPy is not installed.
+        """
+        if np is None:
+            raise ImportError("Documents need NumPy; install numpy to enable them")
+        self.embed_many = embed_many
+        self.path = Path(path) if path is not None else data_dir() / "documents"
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._index: dict[str, Any] | None = None
+        self._vectors: Any = None
+        self._offsets: Any = None
+
+    @property
+    def index(self) -> dict[str, Any]:
+        """Committed chunk count, vector size and documents, read on first use."""
+        if self._index is None:
+            path = self.path / "index.json"
+            if path.exists():
+                self._index = json.loads(path.read_text(encoding="utf-8"))
+            else:
+                self._index = {"dimension": 0, "count": 0, "documents": {}}
+        return self._index
+
+    def __len__(self) -> int:
+        return self.index["count"]
+
+    def documents(self, owner: str | None = None) -> list[str]:
+        """List the stored documents.
+
+        Args:
+            owner: Only list the documents added for this owner, e.g. a
+                session. None lists every document.
+
+        Returns:
+            Source names in the order they were added.
+        """
+        with self._lock:
+            return [
+                document["source"]
+                for document in self.index["documents"].values()
+                if owner is None or document.get("owner") == owner
+            ]
+
+    def add_file(self, path: str | Path, owner: str | None = None) -> int:
+        """Add a text file.
+
+        Args:
+            path: File to add.
+            owner: Optional owner only whose searches see the document.
+
+        Returns:
+            Number of chunks added; 0 if the content is already stored.
+        """
+        path = Path(path)
+        text = path.read_text(encoding="utf-8", errors="replace")
+        return self.add_text(text, path.name, owner)
+
+    def add_text(self, text: str, source: str, owner: str | None = None) -> int:
+        """Chunk, embed and store a document.
+
+        Args:
+            text: Document text.
+            source: Name shown with its passages.
+            owner: Optional owner only whose searches see the document.
+
+        Returns:
+            Number of chunks added; 0 if the owner already has the content.
+        """
+        digest = cache_key(text) if owner is None else cache_key(owner, text)
+        chunks = chunk_text(text, self.chunk_size, self.overlap)
+        if not chunks:
+            return 0
+
+        with self._write_lock:
+            if digest in self.index["documents"]:
+                return 0
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._truncate()
+            index = self.index
+            count = index["count"]
+            dimension = index["dimension"]
+            try:
+                for start in range(0, len(chunks), self.batch_size):
+                    batch = chunks[start : start + self.batch_size]
+                    vectors = self.embed_many(batch)
+                    dimension = self._append(source, start, batch, vectors, dimension)
+            except Exception:
+                # Drop the partial document
+                self._truncate()
+                raise
+            document = {"source": source, "chunks": len(chunks), "added_at": time.time()}
+            if owner is not None:
+                document["owner"] = owner
+            self._commit(
+                {
+                    **index,
+                    "dimension": dimension,
+                    "count": count + len(chunks),
+                    "documents": {**index["documents"], digest: document},
+                }
+            )
+        logger.info(f"Added {source} to documents ({len(chunks)} chunks)")
+        return len(chunks)
+
+    def search(self, query: str, k: int = 4, owner: str | None = None) -> list[DocumentChunk]:
+        """Find the chunks most similar to a query.
+
+        Args:
+            query: Text to match.
+            k: Maximum number of chunks.
+            owner: Only search the documents added for this owner. None
+                searches every document.
+
+        Returns:
+            Best matching chunks, most similar first.
+        """
+        with self._lock:
+            ranges = self._ranges(owner)
+        if not ranges:
+            return []
+        query_vector = self._normalize(self.embed_many([query]))[0]
+        with self._lock:
+            vectors = self._mapped_vectors()
+            offsets = self._mapped_offsets()
+        if query_vector.shape[0] != vectors.shape[1]:
+            raise ValueError("Query embedding size does not match the documents")
+        best = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for first, end in ranges:
+            for start in range(first, end, SEARCH_BLOCK):
+                scores = vectors[start : min(start + SEARCH_BLOCK, end)] @ query_vector
+                top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+                best = np.concatenate([best, top + start])
+                best_scores = np.concatenate([best_scores, scores[top]])
+        order = np.argsort(-best_scores)[:k]
+        return [
+            self._read_chunk(offsets, int(best[position]), float(best_scores[position]))
+            for position in order
+        ]
+
+    def _ranges(self, owner: str | None) -> list[tuple[int, int]]:
+        """Get the chunk rows of an owner's documents.
+
+        Documents are appended one after the other, so each one covers the
+        rows following the previous one.
+
+        Args:
+            owner: Owner, or None for every document.
+
+        Returns:
+            Start and end rows, adjacent ranges merged.
+        """
+        ranges: list[tuple[int, int]] = []
+        start = 0
+        for document in self.index["documents"].values():
+            end = start + document["chunks"]
+            if owner is None or document.get("owner") == owner:
+                if ranges and ranges[-1][1] == start:
+                    ranges[-1] = (ranges[-1][0], end)
+                else:
+                    ranges.append((start, end))
+            start = end
+        return ranges
+
+    def _normalize(self, vectors: list[list[float]]) -> Any:
+        """Convert vectors to a unit length float32 matrix.
+
+        Args:
+            vectors: Embedding vectors.
+
+        Returns:
+            Normalized matrix, one row per vector.
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def _append(
+        self,
+        source: str,
+        first: int,
+        chunks: list[str],
+        vectors: list[list[float]],
+        dimension: int,
+    ) -> int:
+        """Write chunks and their vectors after the existing ones.
+
+        Args:
+            source: Document name.
+            first: Position of the first chunk in its document.
+            chunks: Chunk texts.
+            vectors: One embedding per chunk.
+            dimension: Vector size of the store, or 0 while it is empty.
+
+        Returns:
+            Vector size of the written chunks.
+
+        Raises:
+            ValueError: If the vectors do not match the chunks or the store.
+        """
+        matrix = self._normalize(vectors)
+        if matrix.ndim != 2 or len(matrix) != len(chunks):
+            raise ValueError(f"Expected {len(chunks)} embeddings, got {len(matrix)}")
+        if dimension and matrix.shape[1] != dimension:
+            raise ValueError(f"Expected embeddings of size {dimension}, got {matrix.shape[1]}")
+        with open(self.path / "chunks.jsonl", "ab") as chunk_file:
+            ends = []
+            for number, chunk in enumerate(chunks, first):
+                record = {"source": source, "index": number, "text": chunk}
+                chunk_file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                ends.append(chunk_file.tell())
+        with open(self.path / "offsets.i64", "ab") as offsets_file:
+            offsets_file.write(np.asarray(ends, dtype=np.int64).tobytes())
+        with open(self.path / "vectors.f32", "ab") as vectors_file:
+            vectors_file.write(matrix.tobytes())
+        return matrix.shape[1]
+
+    def _truncate(self) -> None:
+        """Cut the data files back to the committed chunks."""
+        count = self.index["count"]
+        end = 0
+        if count:
+            offsets_path = self.path / "offsets.i64"
+            end = int(np.fromfile(offsets_path, np.int64, count=1, offset=(count - 1) * 8)[0])
+        sizes = {
+            "chunks.jsonl": end,
+            "offsets.i64": count * 8,
+            "vectors.f32": count * self.index["dimension"] * 4,
+        }
+        for name, size in sizes.items():
+            path = self.path / name
+            if path.exists() and path.stat().st_size > size:
+                with open(path, "r+b") as file:
+                    file.truncate(size)
+
+    def _commit(self, index: dict[str, Any]) -> None:
+        """Atomically replace the index file.
+
+        Args:
+            index: New index.
+        """
+        temp = self.path / "index.json.tmp"
+        temp.write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp, self.path / "index.json")
+        with self._lock:
+            self._index = index
+            # Mapped files only cover the chunks committed before
+            self._vectors = self._offsets = None
+
+    def _mapped_vectors(self) -> Any:
+        """Map the committed vectors into memory."""
+        if self._vectors is None:
+            self._vectors = np.memmap(
+                self.path / "vectors.f32",
+                dtype=np.float32,
+                mode="r",
+                shape=(self.index["count"], self.index["dimension"]),
+            )
+        return self._vectors
+
+    def _mapped_offsets(self) -> Any:
+        """Map the chunk end offsets into memory."""
+        if self._offsets is None:
+            self._offsets = np.memmap(
+                self.path / "offsets.i64", dtype=np.int64, mode="r", shape=(self.index["count"],)
+            )
+        return self._offsets
+
+    def _read_chunk(self, offsets: Any, position: int, score: float) -> DocumentChunk:
+        """Read a chunk.
+
+        Args:
+            offsets: Mapped chunk end offsets.
+            position: Chunk position in the store.
+            score: Similarity to report.
+
+        Returns:
+            The chunk.
+        """
+        start = int(offsets[position - 1]) if position else 0
+        with open(self.path / "chunks.jsonl", "rb") as chunk_file:
+            chunk_file.seek(start)
+            record = json.loads(chunk_file.read(int(offsets[position]) - start))
+        return DocumentChunk(record["source"], record["index"], record["text"], score)
+
+
+def upload_dir() -> Path:
+    """Get the directory browsers upload documents to before they are added.
+
+    Returns:
+        Upload storage of the web app.
+    """
+    return data_dir() / "uploads"
+
+
+def default_document_store(
+    embed_many: Callable[[list[str]], list[list[float]]],
+) -> DocumentStore | None:
+    """Create the document store in the data directory.
+
+    Args:
+        embed_many: Function embedding a list of texts.
+
+    Returns:
+        The store, or None when NumPy is missing.
+    """
+    if np is None:
+        logger.info("Documents disabled: NumPy is not installed")
+        return None
+    return DocumentStore(embed_many)
+
+
+def grounding_message(chunks: list[DocumentChunk]) -> str:
+    """Format retrieved chunks as instructions for the model.
+
+    Args:
+        chunks: Retrieved chunks.
+
+    Returns:
+        System message text quoting the chunks with their sources.
+    """
+    excerpts = "\n\n".join(
+        f"[{number}] {chunk.source} (part {chunk.index + 1})\n{chunk.text}"
+        for number, chunk in enumerate(chunks, 1)
+    )
+    return (
+        "Use the following excerpts from the user's documents when they are relevant "
+        "to the question, and cite them by number.\n\n" + excerpts
+    )
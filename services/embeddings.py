@@ -0,0 +1,217 @@
+"""Text embeddings with request coalescing and caching."""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future
+
+from services.shared_state import SharedCache, cache_key
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = "mistral-embed"
+
+
+class EmbeddingBatcher:
+    """Embed texts one at a time while sending them upstream in batches.
+
+    Calls from any thread are queued; a background thread sends the queue
+    as one request once it holds ``max_batch`` texts or the oldest text has
+    waited ``max_wait`` seconds. Identical texts queued or in flight share
+    one result, and vectors are cached by a hash of the model and text in
+    an LRU cache, and in the shared cache when there is one.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[list[str]], list[list[float]]],
+        model: str = DEFAULT_EMBEDDING_MODEL,
+        max_batch: int = 32,
+        max_wait: float = 0.01,
+        cache_size: int = 4096,
+        shared_cache: SharedCache | None = None,
+    ) -> None:
+        """Initialize embedding batcher.
+
+        Args:
+            embed_batch: Function embedding a list of texts in one request,
+                returning one vector per text in order.
+            model: Embedding model, part of the cache key.
+            max_batch: Maximum texts per request.
+            max_wait: Seconds the first queued text waits for others.
+            cache_size: Vectors kept in memory; least recently used go first.
+            shared_cache: Optional cache shared with other worker processes.
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.embed_batch = embed_batch
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.cache_size = cache_size
+        self.shared_cache = shared_cache
+        self._cache: OrderedDict[str, list[float]] = OrderedDict()
+        self._queued: OrderedDict[str, tuple[str, Future]] = OrderedDict()
+        self._in_flight: dict[str, Future] = {}
+        self._condition = threading.Condition()
+        self._worker: threading.Thread | None = None
+        self._closed = False
+        self._stats = {"texts": 0, "cache_hits": 0, "deduplicated": 0, "batches": 0, "sent": 0}
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for embedding.
+
+        Args:
+            text: Text to embed.
+
+        Returns:
+            Future resolving to the text's vector.
+        """
+        key = cache_key(self.model, text)
+        shared = self.shared_cache.get("embeddings", key) if self.shared_cache else None
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Embedding batcher is closed")
+            self._stats["texts"] += 1
+            if shared is not None:
+                self._remember(key, shared)
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self._stats["cache_hits"] += 1
+                future: Future = Future()
+                future.set_result(vector)
+                return future
+            existing = self._in_flight.get(key) or self._queued.get(key, (None, None))[1]
+            if existing is not None:
+                self._stats["deduplicated"] += 1
+                return existing
+            future = Future()
+            self._queued[key] = (text, future)
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+            self._condition.notify()
+        return future
+
+    def embed(self, text: str, timeout: float | None = None) -> list[float]:
+        """Embed one text.
+
+        Args:
+            text: Text to embed.
+            timeout: Maximum seconds to wait for the vector.
+
+        Returns:
+            Embedding vector.
+
+        Raises:
+            TimeoutError: If the vector is not ready in time.
+            RuntimeError: If the embeddings request failed.
+        """
+        return self.submit(text).result(timeout)
+
+    def embed_many(self, texts: list[str], timeout: float | None = None) -> list[list[float]]:
+        """Embed several texts, batched with any other queued texts.
+
+        Args:
+            texts: Texts to embed.
+            timeout: Maximum seconds to wait for each vector.
+
+        Returns:
+            One vector per text, in order.
+        """
+        futures = [self.submit(text) for text in texts]
+        return [future.result(timeout) for future in futures]
+
+    def stats(self) -> dict[str, int]:
+        """Get counters.
+
+        Returns:
+            Texts requested, cache hits, texts sharing a queued request,
+            batches sent and texts sent upstream.
+        """
+        with self._condition:
+            return dict(self._stats)
+
+    def close(self) -> None:
+        """Send the queued texts and stop the background thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            worker = self._worker
+        if worker is not None:
+            worker.join()
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        """Cache a vector in memory, evicting the least recently used.
+
+        Args:
+            key: Content hash.
+            vector: Embedding vector.
+        """
+        self._cache[key] = vector
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _run(self) -> None:
+        """Collect queued texts into batches and send them."""
+        while True:
+            with self._condition:
+                while not self._queued and not self._closed:
+                    self._condition.wait()
+                if not self._queued:
+                    return
+                # Give concurrent callers a moment to join the batch
+                deadline = time.monotonic() + self.max_wait
+                while len(self._queued) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = []
+                while self._queued and len(batch) < self.max_batch:
+                    key, (text, future) = self._queued.popitem(last=False)
+                    self._in_flight[key] = future
+                    batch.append((key, text, future))
+                self._stats["batches"] += 1
+                self._stats["sent"] += len(batch)
+            self._send(batch)
+
+    def _send(self, batch: list[tuple[str, str, Future]]) -> None:
+        """Embed a batch and resolve its futures.
+
+        Args:
+            batch: Content hash, text and future of each text.
+        """
+        logger.debug("Embedding batch of %d texts", len(batch))
+        try:
+            vectors = self.embed_batch([text for _, text, _ in batch])
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(batch)} texts failed: {e!s}")
+            with self._condition:
+                for key, _, _ in batch:
+                    self._in_flight.pop(key, None)
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._condition:
+            for (key, _, _), vector in zip(batch, vectors, strict=True):
+                self._remember(key, vector)
+                self._in_flight.pop(key, None)
+        for (_, _, future), vector in zip(batch, vectors, strict=True):
+            future.set_result(vector)
+        if self.shared_cache is not None:
+            try:
+                for (key, _, _), vector in zip(batch, vectors, strict=True):
+                    self.shared_cache.set("embeddings", key, vector)
+            except Exception as e:
+                logger.warning(f"Failed to share embeddings: {e!s}")
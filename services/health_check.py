@@ -0,0 +1,159 @@
+"""Concurrent provider health checks."""
+
+import logging
+import socket
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+from services.mistral_api import MistralAPI, delta_text
+from services.provider_manager import ProviderSettings
+from services.request_scheduler import Priority
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PROBE_MESSAGES = [{"role": "user", "content": "ping"}]
+
+# Probes are scheduled in sessions of their own so they cannot crowd out a
+# chat; one per provider, so the per-session limit does not serialize them
+PROBE_SESSION = "health-check"
+
+
+@dataclass
+class ProbeResult:
+    """Timings of one provider health check, in seconds."""
+    provider: str
+    connect_time: float | None = None
+    models_latency: float | None = None
+    ttft: float | None = None
+    model_count: int = 0
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether every probe stage succeeded."""
+        return self.error is None
+
+
+def measure_connect(url: str, timeout: float) -> float:
+    """Measure the time to open a TCP connection to the provider.
+
+    Args:
+        url: Provider base URL.
+        timeout: Connection timeout in seconds.
+
+    Returns:
+        Connect time in seconds.
+    """
+    parsed = urlparse(url)
+    if not parsed.hostname:
+        raise ValueError(f"Invalid provider URL: {url}")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    start = time.monotonic()
+    with socket.create_connection((parsed.hostname, port), timeout=timeout):
+        return time.monotonic() - start
+
+
+def probe_provider(
+    settings: ProviderSettings,
+    client: MistralAPI,
+    connect: Callable[[str, float], float] | None = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> ProbeResult:
+    """Probe one provider: TCP connect, ``/models`` and a one-token completion.
+
+    Stops at the first failing stage; the error is recorded, not raised.
+
+    Args:
+        settings: Provider settings.
+        client: API client for the provider, sending to ``settings.url`` as
+            the clients of ``ClientPool`` do.
+        connect: Function measuring the connect time to a URL. Defaults to
+            ``measure_connect``.
+        clock: Monotonic clock returning seconds.
+
+    Returns:
+        Probe result with the timings measured so far.
+    """
+    connect = connect or measure_connect
+    result = ProbeResult(provider=settings.name)
+    session = f"{PROBE_SESSION}:{settings.name}"
+    try:
+        result.connect_time = connect(settings.url, settings.request_timeout)
+
+        start = clock()
+        models = client.list_models(
+            session=session, priority=Priority.PROBE, cached=False
+        )
+        result.models_latency = clock() - start
+        result.model_count = len(models.get("data", []))
+
+        start = clock()
+        stream = client.chat_completion_stream(
+            PROBE_MESSAGES,
+            model=settings.model,
+            max_tokens=1,
+            timeout=settings.request_timeout,
+            session=session,
+            priority=Priority.PROBE,
+            # A cached answer would report the cache's speed, not the provider's
+            cached=False,
+        )
+        # Role-only and empty chunks can precede the first token
+        for chunk in stream:
+            if delta_text(chunk):
+                result.ttft = clock() - start
+                break
+        stream.close()
+    except Exception as e:
+        result.error = str(e)
+    logger.debug(f"Probed {settings.name}: {result}")
+    return result
+
+
+def probe_all(
+    providers: Sequence[ProviderSettings],
+    client_for: Callable[[ProviderSettings], MistralAPI],
+    max_workers: int = 8,
+    on_result: Callable[[int, ProbeResult], None] | None = None,
+    connect: Callable[[str, float], float] | None = None,
+) -> list[ProbeResult]:
+    """Probe every provider concurrently with a bounded pool.
+
+    Args:
+        providers: Providers to probe.
+        client_for: Returns the API client for a provider.
+        max_workers: Maximum number of providers probed at the same time.
+        on_result: Called with the provider position and result as each finishes.
+        connect: Function measuring the connect time to a URL. Defaults to
+            ``measure_connect``.
+
+    Returns:
+        Results in the order of ``providers``.
+    """
+
+    def run(settings: ProviderSettings) -> ProbeResult:
+        try:
+            client = client_for(settings)
+        except Exception as e:
+            return ProbeResult(provider=settings.name, error=str(e))
+        return probe_provider(settings, client, connect=connect)
+
+    if not providers:
+        return []
+    results: list[ProbeResult | None] = [None] * len(providers)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(providers))) as executor:
+        futures = {
+            executor.submit(run, settings): position for position, settings in enumerate(providers)
+        }
+        for future in as_completed(futures):
+            position = futures[future]
+            results[position] = future.result()
+            if on_result is not None:
+                on_result(position, results[position])
+    healthy = sum(1 for result in results if result.ok)
+    logger.info(f"Probed {len(providers)} providers, {healthy} healthy")
+    return results
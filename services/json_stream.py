@@ -0,0 +1,435 @@
+"""Incremental parsing of JSON streamed by a model."""
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Any
+
+NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+# Characters that can continue a JSON number
+NUMBER_CHARS = frozenset("+-.0123456789eE")
+LITERALS = {"true": True, "false": False, "null": None}
+WHITESPACE = " \t\n\r"
+
+# JSON Schema type names and the Python types they accept
+SCHEMA_TYPES: dict[str, tuple[type, ...]] = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+    "null": (type(None),),
+}
+
+
+class JsonStreamError(ValueError):
+    """Raised when streamed JSON is malformed or does not match the schema."""
+
+
+@dataclass
+class JsonField:
+    """Value completed while parsing.
+
+    ``path`` holds the keys and indexes leading to the value; the whole
+    document has the empty path.
+    """
+    path: tuple[str | int, ...]
+    value: Any
+
+
+@dataclass
+class _Frame:
+    """Object or array being parsed."""
+    value: dict | list
+    path: tuple[str | int, ...]
+    schema: dict[str, Any] | None
+    # key, colon, value or comma; "key" also accepts the closing brace
+    expect: str
+    key: str | None = None
+
+
+def _schema_for(schema: dict[str, Any] | None, key: str | int) -> dict[str, Any] | None:
+    """Get the schema of a member of an object or array.
+
+    Args:
+        schema: Schema of the container, if any.
+        key: Object key or array index.
+
+    Returns:
+        Schema of the member, or None if it is unconstrained.
+    """
+    if schema is None:
+        return None
+    if isinstance(key, int):
+        items = schema.get("items")
+        return items if isinstance(items, dict) else None
+    properties = schema.get("properties") or {}
+    if key in properties:
+        return properties[key]
+    additional = schema.get("additionalProperties")
+    return additional if isinstance(additional, dict) else None
+
+
+def _check_type(schema: dict[str, Any] | None, value: Any, path: tuple) -> None:
+    """Check a value, possibly still being filled, against its schema type.
+
+    Args:
+        schema: Schema of the value, if any.
+        value: Value to check.
+        path: Path of the value, for error messages.
+
+    Raises:
+        JsonStreamError: If the value has the wrong type.
+    """
+    if schema is None or "type" not in schema:
+        return
+    names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+    for name in names:
+        # bool is an int in Python but not a number in JSON
+        if isinstance(value, bool) and name in ("number", "integer"):
+            continue
+        if isinstance(value, SCHEMA_TYPES.get(name, ())):
+            return
+    raise JsonStreamError(f"{_format_path(path)} should be {' or '.join(names)}")
+
+
+def _check_complete(schema: dict[str, Any] | None, value: Any, path: tuple) -> None:
+    """Check the constraints that need a complete value.
+
+    Args:
+        schema: Schema of the value, if any.
+        value: Completed value.
+        path: Path of the value, for error messages.
+
+    Raises:
+        JsonStreamError: If the value does not match the schema.
+    """
+    if schema is None:
+        return
+    _check_type(schema, value, path)
+    if "enum" in schema and value not in schema["enum"]:
+        raise JsonStreamError(f"{_format_path(path)} should be one of {schema['enum']}")
+    if "const" in schema and value != schema["const"]:
+        raise JsonStreamError(f"{_format_path(path)} should be {schema['const']!r}")
+    if isinstance(value, dict):
+        missing = [key for key in schema.get("required", ()) if key not in value]
+        if missing:
+            raise JsonStreamError(f"{_format_path(path)} is missing {', '.join(missing)}")
+    if isinstance(value, list) and len(value) < schema.get("minItems", 0):
+        raise JsonStreamError(f"{_format_path(path)} needs {schema['minItems']}+ items")
+
+
+def _format_path(path: tuple) -> str:
+    """Format a path like ``$.items[2].name``.
+
+    Args:
+        path: Keys and indexes.
+
+    Returns:
+        Readable path.
+    """
+    return "$" + "".join(f"[{key}]" if isinstance(key, int) else f".{key}" for key in path)
+
+
+class JsonStreamParser:
+    """Parse a JSON document from text that arrives in pieces.
+
+    Text is consumed as it is fed, so each piece is only scanned once, and
+    every value is reported as soon as its last character arrives. The
+    document is built in place, so ``value`` shows the fields completed so
+    far. With a JSON Schema, types, enums and unknown keys are checked as
+    values arrive and required keys when their object closes, so a
+    response that goes wrong stops early. Only the keywords used for
+    structured outputs are supported: type, properties, required,
+    additionalProperties, items, enum, const and minItems.
+    """
+
+    def __init__(self, schema: dict[str, Any] | None = None) -> None:
+        """Initialize parser.
+
+        Args:
+            schema: Optional JSON Schema the document must match.
+        """
+        self.schema = schema
+        self._buffer = ""
+        self._stack: list[_Frame] = []
+        self._root: Any = None
+        self._done = False
+        # Where to resume looking for the end of an unfinished string
+        self._resume = 0
+
+    @property
+    def done(self) -> bool:
+        """Whether the document is complete."""
+        return self._done
+
+    @property
+    def value(self) -> Any:
+        """Document parsed so far; containers hold their completed members."""
+        return self._root
+
+    def feed(self, text: str) -> list[JsonField]:
+        """Parse the next piece of text.
+
+        Args:
+            text: Text following what was fed before.
+
+        Returns:
+            Values completed by this piece, innermost first.
+
+        Raises:
+            JsonStreamError: If the text is not valid JSON or does not match
+                the schema.
+        """
+        self._buffer += text
+        fields: list[JsonField] = []
+        buffer = self._buffer
+        position = 0
+        length = len(buffer)
+        while position < length:
+            char = buffer[position]
+            if char in WHITESPACE:
+                position += 1
+                continue
+            if self._done:
+                raise JsonStreamError(f"Unexpected {char!r} after the document")
+            frame = self._stack[-1] if self._stack else None
+            expect = frame.expect if frame is not None else "value"
+
+            if expect == "colon":
+                if char != ":":
+                    raise JsonStreamError(f"Expected ':' at {_format_path(frame.path)}")
+                frame.expect = "value"
+                position += 1
+            elif expect == "comma":
+                position += 1
+                if char == ",":
+                    frame.expect = "key" if isinstance(frame.value, dict) else "value"
+                    frame.key = None
+                elif char == ("}" if isinstance(frame.value, dict) else "]"):
+                    self._close(fields)
+                else:
+                    raise JsonStreamError(f"Expected ',' at {_format_path(frame.path)}")
+            elif expect == "key":
+                if char == "}" and not frame.value and frame.key is None:
+                    position += 1
+                    self._close(fields)
+                    continue
+                if char != '"':
+                    raise JsonStreamError(f"Expected a key at {_format_path(frame.path)}")
+                end = self._string_end(buffer, position)
+                if end is None:
+                    break
+                key = self._string(buffer, position, end, frame.path)
+                schema = frame.schema
+                if (
+                    schema is not None
+                    and schema.get("additionalProperties") is False
+                    and key not in (schema.get("properties") or {})
+                ):
+                    raise JsonStreamError(f"Unexpected key {key!r} at {_format_path(frame.path)}")
+                frame.key = key
+                frame.expect = "colon"
+                position = end
+            elif char == "]" and frame is not None and frame.value == []:
+                # Empty array
+                position += 1
+                self._close(fields)
+            else:
+                consumed = self._value(buffer, position, fields)
+                if consumed is None:
+                    break
+                position = consumed
+        self._buffer = buffer[position:]
+        self._resume = max(self._resume - position, 0)
+        return fields
+
+    def close(self) -> Any:
+        """Finish parsing.
+
+        Returns:
+            The complete document.
+
+        Raises:
+            JsonStreamError: If the document is incomplete.
+        """
+        # A number at the very end has nothing after it to end it
+        if not self._done and self._buffer.strip() and not self._stack:
+            self._number(self._buffer.strip(), 0, [], final=True)
+        if not self._done:
+            raise JsonStreamError("Incomplete JSON document")
+        return self._root
+
+    def _string_end(self, buffer: str, start: int) -> int | None:
+        """Find the end of a string.
+
+        Args:
+            buffer: Text being parsed.
+            start: Position of the opening quote.
+
+        Returns:
+            Position after the closing quote, or None if it has not arrived.
+        """
+        position = max(start + 1, self._resume)
+        while True:
+            quote = buffer.find('"', position)
+            if quote == -1:
+                self._resume = len(buffer)
+                return None
+            # The quote is escaped if preceded by an odd number of backslashes
+            backslashes = 0
+            while buffer[quote - 1 - backslashes] == "\\":
+                backslashes += 1
+            if backslashes % 2 == 0:
+                self._resume = 0
+                return quote + 1
+            position = quote + 1
+
+    def _string(self, buffer: str, start: int, end: int, path: tuple) -> str:
+        """Decode a complete string.
+
+        Args:
+            buffer: Text being parsed.
+            start: Position of the opening quote.
+            end: Position after the closing quote.
+            path: Path of the string, for error messages.
+
+        Returns:
+            Decoded string.
+
+        Raises:
+            JsonStreamError: If the string has invalid escapes or characters.
+        """
+        try:
+            return json.loads(buffer[start:end])
+        except ValueError:
+            raise JsonStreamError(f"Invalid string at {_format_path(path)}") from None
+
+    def _member(self) -> tuple[tuple[str | int, ...], dict[str, Any] | None]:
+        """Get the path and schema of the next value.
+
+        Returns:
+            Path and schema, if any, of the value about to be parsed.
+        """
+        if not self._stack:
+            return (), self.schema
+        frame = self._stack[-1]
+        key = frame.key if isinstance(frame.value, dict) else len(frame.value)
+        return (*frame.path, key), _schema_for(frame.schema, key)
+
+    def _value(self, buffer: str, position: int, fields: list[JsonField]) -> int | None:
+        """Parse a value or open a container.
+
+        Args:
+            buffer: Text being parsed.
+            position: Position of the first character of the value.
+            fields: Completed values, appended to.
+
+        Returns:
+            Position after what was consumed, or None if more text is needed.
+        """
+        char = buffer[position]
+        path, schema = self._member()
+        if char in "{[":
+            container: dict | list = {} if char == "{" else []
+            _check_type(schema, container, path)
+            self._attach(container)
+            self._stack.append(_Frame(container, path, schema, "key" if char == "{" else "value"))
+            return position + 1
+        if char == '"':
+            end = self._string_end(buffer, position)
+            if end is None:
+                return None
+            value = self._string(buffer, position, end, path)
+        elif char in NUMBER_CHARS:
+            return self._number(buffer, position, fields)
+        else:
+            for literal, literal_value in LITERALS.items():
+                if buffer.startswith(literal, position):
+                    value = literal_value
+                    end = position + len(literal)
+                    break
+                if literal.startswith(buffer[position:]):
+                    return None
+            else:
+                raise JsonStreamError(f"Unexpected {char!r} at {_format_path(path)}")
+        self._complete(value, path, schema, fields)
+        return end
+
+    def _number(
+        self, buffer: str, position: int, fields: list[JsonField], final: bool = False
+    ) -> int | None:
+        """Parse a number once a character after it has arrived.
+
+        Args:
+            buffer: Text being parsed.
+            position: Position of the first character of the number.
+            fields: Completed values, appended to.
+            final: Whether no more text will follow.
+
+        Returns:
+            Position after the number, or None if more text is needed.
+        """
+        end = position
+        while end < len(buffer) and buffer[end] in NUMBER_CHARS:
+            end += 1
+        if end == len(buffer) and not final:
+            return None
+        match = NUMBER.fullmatch(buffer, position, end)
+        path, schema = self._member()
+        if match is None:
+            raise JsonStreamError(f"Invalid number at {_format_path(path)}")
+        self._complete(json.loads(match.group()), path, schema, fields)
+        return end
+
+    def _attach(self, value: Any) -> None:
+        """Add a value to the innermost container.
+
+        Args:
+            value: Value to add.
+        """
+        if not self._stack:
+            self._root = value
+            return
+        frame = self._stack[-1]
+        if isinstance(frame.value, dict):
+            frame.value[frame.key] = value
+        else:
+            frame.value.append(value)
+        frame.expect = "comma"
+
+    def _complete(
+        self,
+        value: Any,
+        path: tuple[str | int, ...],
+        schema: dict[str, Any] | None,
+        fields: list[JsonField],
+    ) -> None:
+        """Record a completed scalar.
+
+        Args:
+            value: Parsed value.
+            path: Path of the value.
+            schema: Schema of the value, if any.
+            fields: Completed values, appended to.
+        """
+        _check_complete(schema, value, path)
+        self._attach(value)
+        fields.append(JsonField(path, value))
+        if not self._stack:
+            self._done = True
+
+    def _close(self, fields: list[JsonField]) -> None:
+        """Close the innermost container.
+
+        Args:
+            fields: Completed values, appended to.
+        """
+        frame = self._stack.pop()
+        _check_complete(frame.schema, frame.value, frame.path)
+        if self._stack:
+            self._stack[-1].expect = "comma"
+        else:
+            self._done = True
+        fields.append(JsonField(frame.path, frame.value))
@@ -0,0 +1,301 @@
+"""Non-blocking structured logging pipeline."""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from pathlib import Path
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+    "taskName",
+}
+
+# Credentials following a credential name, e.g. ``api_key=...`` or ``Bearer ...``.
+# Names must stand alone, so ``max_tokens=...`` and the like are kept
+SECRET_PATTERN = re.compile(
+    r"(?i)(?<![A-Za-z0-9])(api[_-]?key|authorization|bearer|access[_-]?token|password)\b"
+    r"(['\"]?\s*[:=]?\s*['\"]?)([A-Za-z0-9_\-.]{8,})"
+)
+
+_listener: logging.handlers.QueueListener | None = None
+_redactor: "RedactingFilter | None" = None
+_secrets: set[str] = set()
+_lock = threading.Lock()
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves message formatting to the listener thread.
+
+    The standard ``QueueHandler`` formats every record on the calling
+    thread. Here the record is queued as is, so ``%``-style arguments are
+    only formatted if a handler actually writes the record. Arguments must
+    therefore not be mutated after they are logged.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Queue the record without formatting it.
+
+        Args:
+            record: Log record.
+
+        Returns:
+            The same record.
+        """
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a share of the low-severity records of noisy loggers.
+
+    Records at WARNING and above are always kept. Sampling is deterministic:
+    a rate of 0.1 keeps every tenth record of that logger.
+    """
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        """Initialize sampling filter.
+
+        Args:
+            rates: Share of records to keep per logger name; child loggers
+                inherit the rate of their closest configured parent.
+        """
+        super().__init__()
+        self.rates = rates
+        self._counters: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _rate(self, name: str) -> float:
+        """Get the sampling rate of a logger.
+
+        Args:
+            name: Logger name.
+
+        Returns:
+            Share of records to keep.
+        """
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Decide whether to keep a record.
+
+        Args:
+            record: Log record.
+
+        Returns:
+            True to keep the record.
+        """
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        with self._lock:
+            # The first record of each logger is kept
+            credit = self._counters.get(record.name, 1.0 - rate) + rate
+            keep = credit >= 1.0
+            self._counters[record.name] = credit - 1.0 if keep else credit
+        return keep
+
+
+class RedactingFilter(logging.Filter):
+    """Redact credentials and truncate long messages before they are written."""
+
+    def __init__(self, secrets: Iterable[str] = (), max_length: int = 2000) -> None:
+        """Initialize redacting filter.
+
+        Args:
+            secrets: Literal values to mask wherever they appear, e.g. API keys.
+            max_length: Maximum message length; longer messages are cut.
+        """
+        super().__init__()
+        self.secrets: list[str] = []
+        self.max_length = max_length
+        self.add_secrets(secrets)
+
+    def add_secrets(self, secrets: Iterable[str]) -> None:
+        """Mask more literal values from now on.
+
+        Args:
+            secrets: Values to mask; empty and known ones are ignored.
+        """
+        new = [secret for secret in dict.fromkeys(secrets) if secret and secret not in self.secrets]
+        if new:
+            # Replaced in one assignment, the listener thread may be redacting
+            self.secrets = [*self.secrets, *new]
+
+    def redact(self, text: str) -> str:
+        """Mask credentials in a text and truncate it.
+
+        Args:
+            text: Text to clean.
+
+        Returns:
+            Text safe to write.
+        """
+        for secret in self.secrets:
+            text = text.replace(secret, "***")
+        text = SECRET_PATTERN.sub(lambda match: match.group(1) + match.group(2) + "***", text)
+        if len(text) > self.max_length:
+            text = f"{text[: self.max_length]}… [{len(text) - self.max_length} chars truncated]"
+        return text
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Replace the record's message with its redacted form.
+
+        Args:
+            record: Log record.
+
+        Returns:
+            Always True.
+        """
+        # Records are shared by every handler of the listener; clean them once
+        if not getattr(record, "_redacted", False):
+            record.msg = self.redact(record.getMessage())
+            record.args = None
+            record._redacted = True
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format a record.
+
+        Args:
+            record: Log record.
+
+        Returns:
+            JSON line with time, level, logger, message and any extra fields.
+        """
+        data = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = "text",
+    log_file: str | Path | None = None,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    sample_rates: dict[str, float] | None = None,
+    secrets: Iterable[str] = (),
+    max_message_length: int = 2000,
+) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to a background writer thread.
+
+    Callers only pay for sampling and putting the record on the queue.
+    Formatting, redaction and writing to stdout and the rotating log file
+    happen on the listener thread. Calling this again replaces the previous
+    pipeline; secrets passed to ``register_secrets`` are kept.
+
+    Args:
+        level: Root logging level.
+        log_format: ``text`` or ``json`` for the console.
+        log_file: Optional file receiving JSON lines, rotated by size.
+        max_bytes: Size at which the log file is rotated.
+        backup_count: Number of rotated log files kept.
+        sample_rates: Share of below-WARNING records to keep per logger.
+        secrets: Literal values to mask, e.g. API keys.
+        max_message_length: Maximum length of a logged message.
+
+    Returns:
+        The started queue listener.
+    """
+    global _listener, _redactor
+    if log_format not in ("text", "json"):
+        raise ValueError(f"Unknown log format: {log_format}")
+
+    with _lock:
+        redactor = RedactingFilter([*secrets, *_secrets], max_message_length)
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(
+        JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+    handlers: list[logging.Handler] = [console]
+    if log_file is not None:
+        Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    for handler in handlers:
+        handler.addFilter(redactor)
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+
+    with _lock:
+        shutdown_logging()
+        root = logging.getLogger()
+        root.handlers = [queue_handler]
+        root.setLevel(level)
+        listener.start()
+        _listener = listener
+        _redactor = redactor
+    return listener
+
+
+def register_secrets(secrets: Iterable[str]) -> None:
+    """Mask more literal values in every log written from now on.
+
+    Used for credentials only known after logging is configured, such as
+    the API keys of providers added at runtime.
+
+    Args:
+        secrets: Values to mask, e.g. API keys.
+    """
+    secrets = [secret for secret in secrets if secret]
+    with _lock:
+        _secrets.update(secrets)
+        if _redactor is not None:
+            _redactor.add_secrets(secrets)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread, if running."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,315 @@
+"""Map-reduce processing of inputs longer than the model context."""
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from services.document_store import chunk_text
+from services.message import Message
+from services.mistral_api import MistralAPI, delta_text
+from services.request_scheduler import Priority
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rough size of a Mistral token in characters of English text
+CHARS_PER_TOKEN = 4
+
+MAP_PROMPT = (
+    "The following is part {part} of {parts} of a text too long to read at once.\n"
+    "Task: {instruction}\n"
+    "Write notes on this part with everything needed for the task; the notes of "
+    "all parts will be combined later.\n\n{text}"
+)
+REDUCE_PROMPT = (
+    "The following are notes on consecutive parts of a long text.\n"
+    "Task: {instruction}\n"
+    "{goal}\n\n{notes}"
+)
+COMBINE_GOAL = "Merge them into one set of notes, keeping everything needed for the task."
+FINAL_GOAL = "Complete the task using the notes as if you had read the whole text."
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text.
+
+    Args:
+        text: Text to measure.
+
+    Returns:
+        Approximate token count.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@dataclass
+class MapReduceProgress:
+    """Progress of a map-reduce run."""
+    stage: str
+    level: int
+    done: int
+    total: int
+
+    def describe(self) -> str:
+        """Short human readable description.
+
+        Returns:
+            Description such as ``Reading part 3 of 12``.
+        """
+        if self.stage == "map":
+            return f"Reading part {self.done + 1} of {self.total}..."
+        if self.stage == "combine":
+            return f"Combining notes, round {self.level} ({self.done} of {self.total})..."
+        return "Writing the answer..."
+
+
+@dataclass
+class MapReduceResult:
+    """Outcome of a map-reduce run."""
+    text: str
+    parts: int
+    levels: int
+    requests: int
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float = 0.0
+
+
+class _Calls:
+    """Counts requests and tokens of a run across threads."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, usage: dict) -> None:
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += usage.get("prompt_tokens") or 0
+            self.completion_tokens += usage.get("completion_tokens") or 0
+
+
+def group_notes(notes: list[str], max_tokens: int) -> list[list[str]]:
+    """Pack consecutive notes into groups that fit one request.
+
+    Every group holds at least two notes, so each round shrinks the list.
+
+    Args:
+        notes: Notes in text order.
+        max_tokens: Token budget of a group.
+
+    Returns:
+        Groups of notes, in order.
+    """
+    groups: list[list[str]] = []
+    group: list[str] = []
+    size = 0
+    for note in notes:
+        tokens = estimate_tokens(note)
+        if len(group) >= 2 and size + tokens > max_tokens:
+            groups.append(group)
+            group, size = [], 0
+        group.append(note)
+        size += tokens
+    if len(group) == 1 and groups:
+        groups[-1].append(group[0])
+    elif group:
+        groups.append(group)
+    return groups
+
+
+def map_reduce_stream(
+    client: MistralAPI,
+    instruction: str,
+    text: str,
+    model: str = "mistral-medium-latest",
+    max_chunk_tokens: int = 6000,
+    max_tokens: int = 1024,
+    temperature: float = 0.3,
+    max_workers: int = 4,
+    on_progress: Callable[[MapReduceProgress], None] | None = None,
+    cancel_event: threading.Event | None = None,
+    session: str = "default",
+    priority: Priority = Priority.BACKGROUND,
+    timeout: float | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Apply an instruction to a text longer than the model context.
+
+    The text is split into chunks of at most ``max_chunk_tokens``, which are
+    processed concurrently into notes. Notes are merged in concurrent rounds
+    until they fit one request, and the final answer is streamed. Requests
+    go through the client's scheduler and rate limiter, and ``max_workers``
+    bounds how many are outstanding at once. Every request is streamed, so
+    stopping the run or running out of time also ends the requests in
+    flight.
+
+    Args:
+        client: API client.
+        instruction: What to do with the text.
+        text: Long input text.
+        model: Model name.
+        max_chunk_tokens: Token budget of each chunk and of each merge.
+        max_tokens: Maximum tokens generated per request.
+        temperature: Sampling temperature.
+        max_workers: Maximum concurrent requests.
+        on_progress: Called as parts and merges finish.
+        cancel_event: Optional event stopping the run.
+        session: Session the requests are scheduled under.
+        priority: Priority of the map and merge requests.
+        timeout: Optional budget in seconds of each request, as in
+            ``chat_completion_stream``.
+
+    Yields:
+        Chunks of the final answer as yielded by ``chat_completion_stream``,
+        then a chunk with the ``usage`` of all requests and a ``map_reduce``
+        summary of parts, levels and requests.
+
+    Raises:
+        RuntimeError: If a request fails.
+        TimeoutError: If a request exceeds the timeout budget.
+    """
+    calls = _Calls()
+    chunks = chunk_text(text, size=max_chunk_tokens * CHARS_PER_TOKEN, overlap=0)
+    logger.info(f"Map-reduce over {len(chunks)} parts ({estimate_tokens(text)} tokens)")
+
+    def stream(prompt: str, request_priority: Priority) -> Iterator[dict[str, Any]]:
+        return client.chat_completion_stream(
+            [Message("user", prompt)],
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout,
+            cancel_event=cancel_event,
+            session=session,
+            priority=request_priority,
+        )
+
+    def complete(prompt: str) -> str:
+        if cancel_event is not None and cancel_event.is_set():
+            return ""
+        parts = []
+        usage: dict = {}
+        for chunk in stream(prompt, priority):
+            usage = chunk.get("usage") or usage
+            parts.append(delta_text(chunk))
+        calls.add(usage)
+        return "".join(parts)
+
+    def run_round(stage: str, level: int, prompts: list[str]) -> list[str]:
+        done = 0
+        lock = threading.Lock()
+
+        def run(prompt: str) -> str:
+            nonlocal done
+            result = complete(prompt)
+            with lock:
+                done += 1
+                progress = MapReduceProgress(stage, level, done, len(prompts))
+            if on_progress is not None:
+                on_progress(progress)
+            return result
+
+        if on_progress is not None:
+            on_progress(MapReduceProgress(stage, level, 0, len(prompts)))
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as executor:
+            futures = [executor.submit(run, prompt) for prompt in prompts]
+            try:
+                return [future.result() for future in futures]
+            except BaseException:
+                # Requests not started yet are dropped; running ones end by
+                # themselves at their timeout or when the run is stopped
+                for future in futures:
+                    future.cancel()
+                raise
+
+    notes = run_round(
+        "map",
+        0,
+        [
+            MAP_PROMPT.format(part=part, parts=len(chunks), instruction=instruction, text=chunk)
+            for part, chunk in enumerate(chunks, 1)
+        ],
+    )
+    level = 0
+    while sum(estimate_tokens(note) for note in notes) > max_chunk_tokens and len(notes) > 1:
+        level += 1
+        notes = run_round(
+            "combine",
+            level,
+            [
+                REDUCE_PROMPT.format(
+                    instruction=instruction, goal=COMBINE_GOAL, notes="\n\n---\n\n".join(group)
+                )
+                for group in group_notes(notes, max_chunk_tokens)
+            ],
+        )
+
+    if cancel_event is None or not cancel_event.is_set():
+        if on_progress is not None:
+            on_progress(MapReduceProgress("reduce", level + 1, 0, 1))
+        prompt = REDUCE_PROMPT.format(
+            instruction=instruction, goal=FINAL_GOAL, notes="\n\n---\n\n".join(notes)
+        )
+        usage: dict = {}
+        # The answer is what the user waits for, so it is not a background request
+        for chunk in stream(prompt, Priority.INTERACTIVE):
+            usage = chunk.get("usage") or usage
+            yield chunk
+        calls.add(usage)
+
+    yield {
+        "usage": {
+            "prompt_tokens": calls.prompt_tokens,
+            "completion_tokens": calls.completion_tokens,
+            "total_tokens": calls.prompt_tokens + calls.completion_tokens,
+        },
+        "map_reduce": {"parts": len(chunks), "levels": level + 1, "requests": calls.requests},
+    }
+
+
+def map_reduce(
+    client: MistralAPI,
+    instruction: str,
+    text: str,
+    on_delta: Callable[[str], None] | None = None,
+    **kwargs: Any,
+) -> MapReduceResult:
+    """Apply an instruction to a long text and collect the answer.
+
+    Args:
+        client: API client.
+        instruction: What to do with the text.
+        text: Long input text.
+        on_delta: Called with each text delta of the final answer.
+        **kwargs: Options of ``map_reduce_stream``.
+
+    Returns:
+        The final answer with request and token counts.
+    """
+    start = time.monotonic()
+    parts = []
+    summary: dict = {}
+    usage: dict = {}
+    for chunk in map_reduce_stream(client, instruction, text, **kwargs):
+        summary = chunk.get("map_reduce") or summary
+        usage = chunk.get("usage") or usage
+        delta = delta_text(chunk)
+        if delta:
+            parts.append(delta)
+            if on_delta is not None:
+                on_delta(delta)
+    return MapReduceResult(
+        text="".join(parts),
+        parts=summary.get("parts", 0),
+        levels=summary.get("levels", 0),
+        requests=summary.get("requests", 0),
+        prompt_tokens=usage.get("prompt_tokens") or 0,
+        completion_tokens=usage.get("completion_tokens") or 0,
+        latency=time.monotonic() - start,
+    )
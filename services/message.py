@@ -0,0 +1,109 @@
+"""Compact chat message representation."""
+
+import sys
+from collections.abc import Iterable
+from typing import Any
+
+
+class Message:
+    """A chat message stored with slots instead of a per-message dict.
+
+    Roles are interned so every message shares the same few role strings.
+    Token count, creation time and the error that cut a reply short are
+    optional metadata that is kept in history and persistence but never
+    sent to the API.
+    """
+
+    __slots__ = ("content", "created_at", "error", "role", "tokens")
+
+    def __init__(
+        self,
+        role: str,
+        content: str,
+        tokens: int | None = None,
+        created_at: float | None = None,
+        error: str | None = None,
+    ) -> None:
+        """Initialize message.
+
+        Args:
+            role: Message role (system, user or assistant).
+            content: Message text.
+            tokens: Optional token count.
+            created_at: Optional creation time as a Unix timestamp.
+            error: Optional error that ended a partial reply.
+        """
+        self.role = sys.intern(role)
+        self.content = content
+        self.tokens = tokens
+        self.created_at = created_at
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"Message(role={self.role!r}, content={self.content!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Message):
+            return NotImplemented
+        return (
+            self.role == other.role
+            and self.content == other.content
+            and self.tokens == other.tokens
+            and self.created_at == other.created_at
+            and self.error == other.error
+        )
+
+    def to_wire(self) -> dict[str, str]:
+        """Convert to the API wire format.
+
+        Returns:
+            Dictionary with role and content only.
+        """
+        return {"role": self.role, "content": self.content}
+
+    def to_record(self) -> dict[str, Any]:
+        """Convert to a persistence record, including set metadata.
+
+        Returns:
+            JSON serializable dictionary.
+        """
+        record: dict[str, Any] = {"role": self.role, "content": self.content}
+        if self.tokens is not None:
+            record["tokens"] = self.tokens
+        if self.created_at is not None:
+            record["created_at"] = self.created_at
+        if self.error is not None:
+            record["error"] = self.error
+        return record
+
+    @classmethod
+    def from_record(cls, record: dict[str, Any]) -> "Message":
+        """Create a message from a persistence record or wire dictionary.
+
+        Args:
+            record: Dictionary with role, content and optional metadata.
+
+        Returns:
+            New message.
+        """
+        return cls(
+            record["role"],
+            record["content"],
+            tokens=record.get("tokens"),
+            created_at=record.get("created_at"),
+            error=record.get("error"),
+        )
+
+
+def to_wire(messages: Iterable["Message | dict[str, str]"]) -> list[dict[str, str]]:
+    """Convert messages to the API wire format at send time.
+
+    Args:
+        messages: Messages, or dictionaries already in wire format.
+
+    Returns:
+        List of role/content dictionaries.
+    """
+    return [
+        message.to_wire() if isinstance(message, Message) else message for message in messages
+    ]
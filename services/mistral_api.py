@@ -1,27 +1,220 @@
 """Mistral AI API client wrapper."""
 
+import logging
+import math
 import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
 from typing import Any
 
 from dotenv import load_dotenv
 from mistralai import Mistral
 
+from services.cassette import Cassette, RecordingClient, ReplayClient, cassette_from_env
+from services.embeddings import DEFAULT_EMBEDDING_MODEL, EmbeddingBatcher
+from services.json_stream import JsonField, JsonStreamParser
+from services.message import Message, to_wire
+from services.request_scheduler import Priority, RequestScheduler
+from services.semantic_cache import SemanticCache, SemanticHit, completion_from_hit
+from services.shared_state import RateLimiter, SharedCache, cache_key
+from services.stream_watchdog import StreamWatchdog
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVER_URL = "https://api.mistral.ai"
+
+
+def _timeout_ms(timeout: float | None) -> int | None:
+    """Convert an optional timeout in seconds to milliseconds, rounding up."""
+    return math.ceil(timeout * 1000) if timeout else None
+
+
+def sdk_server_url(url: str | None) -> str | None:
+    """Convert a provider base URL to the server URL of the SDK.
+
+    Provider URLs include the ``/v1`` API version, which the SDK adds to
+    every path itself.
+
+    Args:
+        url: Provider base URL, e.g. ``https://api.mistral.ai/v1/``.
+
+    Returns:
+        Server URL, or None for the SDK's default server.
+    """
+    if not url:
+        return None
+    server_url = url.rstrip("/").removesuffix("/v1")
+    return None if server_url == DEFAULT_SERVER_URL else server_url
+
+
+def delta_text(chunk: dict[str, Any]) -> str:
+    """Extract the text delta from a streamed chat completion chunk.
+
+    Args:
+        chunk: Chunk dictionary as yielded by ``chat_completion_stream``.
+
+    Returns:
+        Text added by this chunk, or an empty string.
+    """
+    choices = chunk.get("choices") or [{}]
+    content = (choices[0].get("delta") or {}).get("content")
+    if isinstance(content, list):
+        return "".join(part.get("text") or "" for part in content if isinstance(part, dict))
+    return content or ""
+
 
 class MistralAPI:
     """Wrapper for Mistral AI API."""
 
-    def __init__(self, api_key: str | None = None) -> None:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        scheduler: RequestScheduler | None = None,
+        cassette: Cassette | None = None,
+        cache: SharedCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        semantic_cache: SemanticCache | None = None,
+        server_url: str | None = None,
+    ) -> None:
         """Initialize Mistral API client.
 
         Args:
             api_key: Optional API key. If not provided, loads from .env.
+            scheduler: Optional scheduler every request must get a slot from.
+            cassette: Optional cassette to record traffic to or replay it
+                from. Defaults to the one configured by ``FLET_CHAT_CASSETTE``.
+                Replaying needs no API key and no network.
+            cache: Optional cache of model lists and completions, shared
+                with other worker processes.
+            rate_limiter: Optional request rate limit shared with other
+                worker processes.
+            semantic_cache: Optional cache answering prompts similar to
+                earlier ones without generating.
+            server_url: Optional server to send requests to, as returned by
+                ``sdk_server_url``. Defaults to the SDK's server.
         """
         load_dotenv()
+        self.cassette = cassette if cassette is not None else cassette_from_env()
+        replaying = self.cassette is not None and not self.cassette.recording
         self.api_key = self._clean_api_key(api_key or os.getenv("MISTRAL_API_KEY"))
-        if not self.api_key:
+        if not self.api_key and not replaying:
             raise ValueError("MISTRAL_API_KEY not found in environment or .env file")
 
-        self.client = Mistral(api_key=self.api_key)
+        if replaying:
+            self.client = ReplayClient(self.cassette)
+        elif self.cassette is not None:
+            self.client = RecordingClient(
+                Mistral(api_key=self.api_key, server_url=server_url), self.cassette
+            )
+        else:
+            self.client = Mistral(api_key=self.api_key, server_url=server_url)
+        self.server_url = server_url
+        self.scheduler = scheduler
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.semantic_cache = semantic_cache
+        # Cached responses depend on the account and server, so keys include
+        # a digest of both
+        self._account = (
+            cache_key(self.api_key) if server_url is None else cache_key(self.api_key, server_url)
+        )
+        self._embedder: EmbeddingBatcher | None = None
+        self._embedder_lock = threading.Lock()
+        self.watchdog = StreamWatchdog()
+
+    @contextmanager
+    def _slot(
+        self, session: str, priority: Priority, timeout: float | None = None
+    ) -> Iterator[None]:
+        """Get a request slot from the scheduler and the rate limiter, if any.
+
+        Args:
+            session: Session the request belongs to.
+            priority: Request priority.
+            timeout: Maximum time in seconds to wait for both together.
+
+        Yields:
+            Nothing; the slot is held until the block exits.
+
+        Raises:
+            TimeoutError: If no slot was granted within the timeout.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        slot = nullcontext() if self.scheduler is None else self.scheduler.slot(
+            session, priority, timeout
+        )
+        with slot:
+            if self.rate_limiter is not None:
+                # The rate limiter only gets what the scheduler wait left over
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No request slot free within {timeout:g}s")
+                self.rate_limiter.acquire(timeout=remaining)
+            yield
+
+    def _semantic_prompt(
+        self,
+        wire: list[dict[str, str]],
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+    ) -> tuple[str, str] | None:
+        """Get the prompt and scope a reply is cached under semantically.
+
+        Args:
+            wire: Request messages.
+            model: Model name.
+            max_tokens: Maximum tokens to generate.
+            temperature: Sampling temperature.
+            top_p: Nucleus sampling probability.
+
+        Returns:
+            Tuple of the final user turn and a key of everything else the
+            answer depends on, or None if the request is not cacheable.
+        """
+        if self.semantic_cache is None or not wire or wire[-1].get("role") != "user":
+            return None
+        prompt = wire[-1].get("content")
+        if not isinstance(prompt, str) or not prompt.strip():
+            return None
+        # Only conversations with the same earlier turns share answers
+        scope = cache_key(self._account, model, wire[:-1], max_tokens, temperature, top_p)
+        return prompt, scope
+
+    def _semantic_lookup(self, prompt: str, scope: str) -> SemanticHit | None:
+        """Look up a similar prompt, treating failures as misses.
+
+        Args:
+            prompt: Final user turn.
+            scope: Cache scope.
+
+        Returns:
+            Cache hit, or None.
+        """
+        try:
+            return self.semantic_cache.lookup(prompt, scope)
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e!s}")
+            return None
+
+    def _semantic_store(self, prompt: str, answer: str, scope: str) -> None:
+        """Cache an answer, ignoring failures.
+
+        Args:
+            prompt: Final user turn.
+            answer: Generated answer.
+            scope: Cache scope.
+        """
+        if not answer:
+            return
+        try:
+            self.semantic_cache.store(prompt, answer, scope)
+        except Exception as e:
+            logger.warning(f"Failed to cache answer: {e!s}")
 
     def _clean_api_key(self, api_key: str | None) -> str:
         """Clean API key by removing surrounding quotes if present.
@@ -44,46 +237,324 @@ class MistralAPI:
 
         return api_key
 
-    def list_models(self) -> dict[str, Any]:
+    def list_models(
+        self,
+        session: str = "default",
+        priority: Priority = Priority.PROBE,
+        cached: bool = True,
+    ) -> dict[str, Any]:
         """List available models from Mistral API.
 
+        Args:
+            session: Session the request belongs to.
+            priority: Request priority.
+            cached: Use the shared cache, if there is one. Disable to measure
+                the real request.
+
         Returns:
             Dictionary containing model information.
         """
-        try:
-            models = self.client.models.list()
-            return models.model_dump() if hasattr(models, "model_dump") else models.dict()
-        except Exception as e:
-            raise RuntimeError(f"Failed to list models: {e!s}") from None
+        if cached and self.cache is not None:
+            models = self.cache.get("models", self._account)
+            if models is not None:
+                return models
+        with self._slot(session, priority):
+            try:
+                models = self.client.models.list()
+                models = models.model_dump() if hasattr(models, "model_dump") else models.dict()
+            except Exception as e:
+                raise RuntimeError(f"Failed to list models: {e!s}") from None
+        if self.cache is not None:
+            self.cache.set("models", self._account, models)
+        return models
 
     def chat_completion(
         self,
-        messages: list[dict[str, str]],
+        messages: list[Message | dict[str, str]],
         model: str = "mistral-medium-latest",
         max_tokens: int = 4096,
         temperature: float = 0.7,
         top_p: float = 1.0,
+        timeout: float | None = None,
+        session: str = "default",
+        priority: Priority = Priority.INTERACTIVE,
+        cached: bool = True,
     ) -> dict[str, Any]:
         """Get chat completion from Mistral API.
 
         Args:
-            messages: List of chat messages (dict with role and content).
+            messages: List of chat messages (Message or dict with role and content).
             model: Model name.
             max_tokens: Maximum tokens to generate.
             temperature: Sampling temperature.
             top_p: Nucleus sampling probability.
+            timeout: Optional request timeout in seconds.
+            session: Session the request belongs to.
+            priority: Request priority.
+            cached: Answer from the caches, if there are any. Disable to get
+                a freshly generated answer.
 
         Returns:
-            Dictionary containing chat completion response.
+            Dictionary containing chat completion response. Answers from the
+            semantic cache have ``cache_hit`` set.
+
+        Raises:
+            QueueFullError: If the scheduler sheds the request.
         """
-        try:
-            response = self.client.chat.complete(
-                model=model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                top_p=top_p,
-            )
-            return response.model_dump() if hasattr(response, "model_dump") else response.dict()
-        except Exception as e:
-            raise RuntimeError(f"Chat completion failed: {e!s}") from None
+        wire = to_wire(messages)
+        key = None
+        if self.cache is not None:
+            key = cache_key(self._account, model, wire, max_tokens, temperature, top_p)
+            response = self.cache.get("chat", key) if cached else None
+            if response is not None:
+                return response
+        semantic = self._semantic_prompt(wire, model, max_tokens, temperature, top_p)
+        if semantic is not None and cached:
+            hit = self._semantic_lookup(*semantic)
+            if hit is not None:
+                return completion_from_hit(hit, model)
+        with self._slot(session, priority, timeout):
+            try:
+                response = self.client.chat.complete(
+                    model=model,
+                    messages=wire,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    top_p=top_p,
+                    timeout_ms=_timeout_ms(timeout),
+                )
+                if hasattr(response, "model_dump"):
+                    response = response.model_dump()
+                else:
+                    response = response.dict()
+            except Exception as e:
+                raise RuntimeError(f"Chat completion failed: {e!s}") from None
+        if key is not None:
+            self.cache.set("chat", key, response)
+        if semantic is not None:
+            choices = response.get("choices") or [{}]
+            answer = (choices[0].get("message") or {}).get("content")
+            if isinstance(answer, str):
+                self._semantic_store(semantic[0], answer, semantic[1])
+        return response
+
+    def embeddings(
+        self,
+        inputs: list[str],
+        model: str = DEFAULT_EMBEDDING_MODEL,
+        timeout: float | None = None,
+        session: str = "embeddings",
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> list[list[float]]:
+        """Embed texts in one request.
+
+        Most callers should use ``embed``, which batches concurrent calls.
+
+        Args:
+            inputs: Texts to embed.
+            model: Embedding model name.
+            timeout: Optional request timeout in seconds.
+            session: Session the request belongs to.
+            priority: Request priority.
+
+        Returns:
+            One embedding vector per input, in order.
+
+        Raises:
+            QueueFullError: If the scheduler sheds the request.
+        """
+        with self._slot(session, priority, timeout):
+            try:
+                response = self.client.embeddings.create(
+                    model=model, inputs=inputs, timeout_ms=_timeout_ms(timeout)
+                )
+                if hasattr(response, "model_dump"):
+                    response = response.model_dump()
+                else:
+                    response = response.dict()
+            except Exception as e:
+                raise RuntimeError(f"Embeddings request failed: {e!s}") from None
+        data = sorted(response["data"], key=lambda item: item.get("index") or 0)
+        return [item["embedding"] for item in data]
+
+    @property
+    def embedder(self) -> EmbeddingBatcher:
+        """Batcher coalescing ``embed`` calls, created on first use."""
+        with self._embedder_lock:
+            if self._embedder is None:
+                self._embedder = EmbeddingBatcher(self.embeddings, shared_cache=self.cache)
+            return self._embedder
+
+    def embed(self, text: str, timeout: float | None = None) -> list[float]:
+        """Embed one text.
+
+        Concurrent calls are sent as one batched request, identical texts
+        share a result and vectors are cached by content.
+
+        Args:
+            text: Text to embed.
+            timeout: Maximum seconds to wait for the vector.
+
+        Returns:
+            Embedding vector.
+        """
+        return self.embedder.embed(text, timeout)
+
+    def chat_completion_stream(
+        self,
+        messages: list[Message | dict[str, str]],
+        model: str = "mistral-medium-latest",
+        max_tokens: int = 4096,
+        temperature: float = 0.7,
+        top_p: float = 1.0,
+        timeout: float | None = None,
+        cancel_event: threading.Event | None = None,
+        session: str = "default",
+        priority: Priority = Priority.INTERACTIVE,
+        cached: bool = True,
+        response_format: dict[str, Any] | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Stream chat completion chunks from Mistral API.
+
+        Args:
+            messages: List of chat messages (Message or dict with role and content).
+            model: Model name.
+            max_tokens: Maximum tokens to generate.
+            temperature: Sampling temperature.
+            top_p: Nucleus sampling probability.
+            timeout: Optional budget in seconds for the whole generation.
+                What is left of it once a slot is free is also the HTTP
+                timeout for connecting and waiting for data.
+            cancel_event: Optional event; once set the stream is closed and
+                iteration stops.
+            session: Session the request belongs to.
+            priority: Request priority.
+            cached: Answer from the semantic cache, if there is one. Disable
+                to get a freshly generated answer.
+            response_format: Optional output format, e.g. JSON. Answers in a
+                requested format bypass the semantic cache.
+
+        Yields:
+            Dictionary for each completion chunk. Use ``delta_text`` to get
+            the text it adds; the last chunk usually carries ``usage``. An
+            answer from the semantic cache comes as one chunk with
+            ``cache_hit`` set.
+
+        Raises:
+            TimeoutError: If the generation exceeds the timeout budget.
+            QueueFullError: If the scheduler sheds the request.
+        """
+        wire = to_wire(messages)
+        semantic = None
+        if response_format is None:
+            semantic = self._semantic_prompt(wire, model, max_tokens, temperature, top_p)
+        if semantic is not None and cached:
+            hit = self._semantic_lookup(*semantic)
+            if hit is not None:
+                response = completion_from_hit(hit, model)
+                choice = response["choices"][0]
+                yield {
+                    **response,
+                    "object": "chat.completion.chunk",
+                    "choices": [{**choice, "delta": choice.pop("message")}],
+                }
+                return
+        parts: list[str] = []
+        deadline = time.monotonic() + timeout if timeout else None
+        # Only sent when set, so recorded cassettes keep matching
+        options = {"response_format": response_format} if response_format is not None else {}
+        # The slot is held until the stream is exhausted or closed
+        with self._slot(session, priority, timeout):
+            # Waiting for the slot used part of the budget
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"Chat completion exceeded {timeout:g}s budget")
+            try:
+                stream = self.client.chat.stream(
+                    model=model,
+                    messages=wire,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    top_p=top_p,
+                    timeout_ms=_timeout_ms(remaining),
+                    **options,
+                )
+            except Exception as e:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"Chat completion exceeded {timeout:g}s budget") from None
+                raise RuntimeError(f"Chat completion failed: {e!s}") from None
+
+            # Leaving the with block closes the upstream response. A stalled
+            # stream sends nothing to check the event and deadline on, so the
+            # watchdog interrupts it.
+            with stream, self.watchdog.watch(stream, cancel_event, deadline):
+                try:
+                    for event in stream:
+                        if cancel_event is not None and cancel_event.is_set():
+                            return
+                        if deadline is not None and time.monotonic() > deadline:
+                            raise TimeoutError(f"Chat completion exceeded {timeout:g}s budget")
+                        chunk = event.data
+                        chunk = chunk.model_dump() if hasattr(chunk, "model_dump") else chunk.dict()
+                        if semantic is not None:
+                            parts.append(delta_text(chunk))
+                        yield chunk
+                except TimeoutError:
+                    raise
+                except Exception as e:
+                    # Errors of an interrupted stream are handled below
+                    stopped = cancel_event is not None and cancel_event.is_set()
+                    if not stopped and (deadline is None or time.monotonic() <= deadline):
+                        raise RuntimeError(f"Chat completion failed: {e!s}") from None
+            # An interrupted stream may also just end early
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Chat completion exceeded {timeout:g}s budget")
+        # Only complete answers are cached
+        if semantic is not None:
+            self._semantic_store(semantic[0], "".join(parts), semantic[1])
+
+    def chat_completion_json_stream(
+        self,
+        messages: list[Message | dict[str, str]],
+        schema: dict[str, Any] | None = None,
+        schema_name: str = "response",
+        **kwargs: Any,
+    ) -> Iterator[JsonField]:
+        """Stream a JSON answer value by value.
+
+        The model is asked for JSON, matching ``schema`` if given, and the
+        streamed text is parsed incrementally, so each field can be used as
+        soon as it is complete rather than after the whole answer.
+
+        Args:
+            messages: List of chat messages (Message or dict with role and content).
+            schema: Optional JSON Schema the answer must match.
+            schema_name: Name of the schema sent to the API.
+            **kwargs: Options of ``chat_completion_stream``.
+
+        Yields:
+            Each completed value with its path, innermost first; the last one
+            has the empty path and holds the whole answer.
+
+        Raises:
+            JsonStreamError: If the answer is not valid JSON, does not match
+                the schema or ends early.
+        """
+        if schema is None:
+            response_format: dict[str, Any] = {"type": "json_object"}
+        else:
+            response_format = {
+                "type": "json_schema",
+                "json_schema": {"name": schema_name, "schema": schema, "strict": True},
+            }
+        cancel_event = kwargs.get("cancel_event")
+        parser = JsonStreamParser(schema)
+        for chunk in self.chat_completion_stream(
+            messages, response_format=response_format, **kwargs
+        ):
+            yield from parser.feed(delta_text(chunk))
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        parser.close()
@@ -1,11 +1,22 @@
 """Provider management service."""
 
-from dataclasses import dataclass
+import logging
+import threading
+from collections.abc import Callable, Iterator, Mapping
+from dataclasses import dataclass, field
+from types import MappingProxyType
 
+# Configure logging
+logger = logging.getLogger(__name__)
 
-@dataclass
+
+@dataclass(frozen=True)
 class ProviderSettings:
-    """Provider configuration settings."""
+    """Provider configuration settings.
+
+    Settings are immutable so snapshots can be shared between threads; use
+    ``dataclasses.replace`` to derive changed settings.
+    """
     name: str
     api_key: str
     authorization: bool = True
@@ -18,67 +29,176 @@ class ProviderSettings:
     top_p: float = 1.0
     reasoning_effort: str = "med"
     enable_thinking: bool = True
+    request_timeout: float = 60.0
+
+
+@dataclass(frozen=True)
+class ProviderSnapshot:
+    """Immutable version of the provider list."""
+    version: int = 0
+    by_name: Mapping[str, ProviderSettings] = field(
+        default_factory=lambda: MappingProxyType({})
+    )
+    providers: tuple[ProviderSettings, ...] = ()
+
+    def __len__(self) -> int:
+        return len(self.providers)
+
+    def __iter__(self) -> Iterator[ProviderSettings]:
+        return iter(self.providers)
+
+    def get(self, name: str) -> ProviderSettings | None:
+        """Get provider by name.
+
+        Args:
+            name: Name of provider to retrieve.
+
+        Returns:
+            ProviderSettings if found, None otherwise.
+        """
+        return self.by_name.get(name)
 
 
 class ProviderManager:
-    """Manage provider CRUD operations."""
+    """Manage provider CRUD operations.
+
+    Readers get the current immutable snapshot without locking. Writers copy
+    it under a lock, apply their change and publish the new version with a
+    single assignment, so a reader sees either the old or the new list and
+    never a partial update. Subscribers are called with every new snapshot.
+    """
 
     def __init__(self) -> None:
         """Initialize provider manager."""
-        self.providers: dict[str, ProviderSettings] = {}
+        self._snapshot = ProviderSnapshot()
+        self._lock = threading.Lock()
+        self._subscribers: tuple[Callable[[ProviderSnapshot], None], ...] = ()
+
+    @property
+    def snapshot(self) -> ProviderSnapshot:
+        """Current version of the provider list."""
+        return self._snapshot
+
+    @property
+    def providers(self) -> Mapping[str, ProviderSettings]:
+        """Read-only view of the current providers by name."""
+        return self._snapshot.by_name
+
+    def subscribe(
+        self, callback: Callable[[ProviderSnapshot], None]
+    ) -> Callable[[], None]:
+        """Call a function with every new version of the provider list.
+
+        Callbacks run on the writing thread after the version is published.
+        Versions increase, so a callback can ignore snapshots older than one
+        it has already seen.
+
+        Args:
+            callback: Function receiving the new snapshot.
+
+        Returns:
+            Function removing the subscription.
+        """
+        with self._lock:
+            self._subscribers = (*self._subscribers, callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                self._subscribers = tuple(
+                    subscriber for subscriber in self._subscribers if subscriber is not callback
+                )
+
+        return unsubscribe
+
+    def _publish(
+        self, change: Callable[[dict[str, ProviderSettings]], bool]
+    ) -> bool:
+        """Apply a change to a copy of the providers and publish it.
+
+        Args:
+            change: Function editing the providers in place, returning
+                whether anything changed.
+
+        Returns:
+            Result of the change.
+        """
+        with self._lock:
+            providers = dict(self._snapshot.by_name)
+            if not change(providers):
+                return False
+            snapshot = self._snapshot = ProviderSnapshot(
+                self._snapshot.version + 1,
+                MappingProxyType(providers),
+                tuple(providers.values()),
+            )
+            subscribers = self._subscribers
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"Provider change subscriber failed: {e!s}")
+        return True
 
     def add_provider(self, settings: ProviderSettings) -> None:
         """Add a new provider.
-        
+
         Args:
             settings: Provider settings to add.
         """
-        self.providers[settings.name] = settings
+
+        def change(providers: dict[str, ProviderSettings]) -> bool:
+            providers[settings.name] = settings
+            return True
+
+        self._publish(change)
 
     def delete_provider(self, name: str) -> bool:
         """Delete a provider.
-        
+
         Args:
             name: Name of provider to delete.
-            
+
         Returns:
             True if deleted, False if not found.
         """
-        if name in self.providers:
-            del self.providers[name]
-            return True
-        return False
+        return self._publish(lambda providers: providers.pop(name, None) is not None)
 
     def get_provider(self, name: str) -> ProviderSettings | None:
         """Get provider by name.
-        
+
         Args:
             name: Name of provider to retrieve.
-            
+
         Returns:
             ProviderSettings if found, None otherwise.
         """
-        return self.providers.get(name)
+        return self._snapshot.get(name)
 
-    def list_providers(self) -> list[ProviderSettings]:
+    def list_providers(self) -> tuple[ProviderSettings, ...]:
         """List all providers.
-        
+
+        The result is the snapshot's own tuple, so listing does not copy.
+
         Returns:
-            List of all provider settings.
+            All provider settings, in the order they were added.
         """
-        return list(self.providers.values())
+        return self._snapshot.providers
 
     def update_provider(self, name: str, settings: ProviderSettings) -> bool:
         """Update provider settings.
-        
+
         Args:
             name: Name of provider to update.
             settings: New settings.
-            
+
         Returns:
             True if updated, False if not found.
         """
-        if name in self.providers:
-            self.providers[name] = settings
+
+        def change(providers: dict[str, ProviderSettings]) -> bool:
+            if name not in providers:
+                return False
+            providers[name] = settings
             return True
-        return False
+
+        return self._publish(change)
@@ -0,0 +1,231 @@
+"""Priority scheduling and admission control for API requests."""
+
+import logging
+import threading
+from collections import OrderedDict, deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Request priority classes, most urgent first."""
+    INTERACTIVE = 0
+    PROBE = 1
+    BACKGROUND = 2
+    BATCH = 3
+
+
+# Share of the queue each priority may fill before its requests are shed
+SHED_FRACTIONS: dict[Priority, float] = {
+    Priority.INTERACTIVE: 1.0,
+    Priority.PROBE: 0.75,
+    Priority.BACKGROUND: 0.5,
+    Priority.BATCH: 0.25,
+}
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a request is shed because too many requests are waiting."""
+
+
+@dataclass
+class _Ticket:
+    """A request waiting for, or holding, a slot."""
+    session: str
+    priority: Priority
+    granted: threading.Event = field(default_factory=threading.Event)
+
+
+class RequestScheduler:
+    """Admit API requests by priority within global and per-session limits.
+
+    Waiting requests are queued per priority and per session. When a slot
+    frees up the most urgent priority is served first, and sessions of the
+    same priority take turns so one busy session cannot starve the others.
+    Lower priorities are shed earlier as the queue grows, and a few slots
+    are reserved for interactive requests so they never wait behind bulk
+    work.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        per_session: int = 2,
+        max_queue: int = 32,
+        reserved_interactive: int = 1,
+    ) -> None:
+        """Initialize request scheduler.
+
+        Args:
+            max_concurrent: Maximum requests running at the same time.
+            per_session: Maximum requests running at the same time per session.
+            max_queue: Maximum waiting requests before interactive ones are shed.
+            reserved_interactive: Slots only interactive requests may use.
+        """
+        if max_concurrent <= reserved_interactive:
+            raise ValueError("max_concurrent must be greater than reserved_interactive")
+        self.max_concurrent = max_concurrent
+        self.per_session = per_session
+        self.max_queue = max_queue
+        self.reserved_interactive = reserved_interactive
+        self._lock = threading.Lock()
+        self._active = 0
+        self._active_by_session: dict[str, int] = {}
+        self._queues: dict[Priority, OrderedDict[str, deque[_Ticket]]] = {
+            priority: OrderedDict() for priority in Priority
+        }
+        self._waiting = 0
+
+    @property
+    def active(self) -> int:
+        """Number of requests currently running."""
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        """Number of requests waiting for a slot."""
+        return self._waiting
+
+    def queue_limit(self, priority: Priority) -> int:
+        """Get the queue depth at which requests of a priority are shed.
+
+        Args:
+            priority: Request priority.
+
+        Returns:
+            Maximum number of waiting requests when one of this priority arrives.
+        """
+        return max(1, int(self.max_queue * SHED_FRACTIONS[priority]))
+
+    @contextmanager
+    def slot(
+        self,
+        session: str = "default",
+        priority: Priority = Priority.INTERACTIVE,
+        timeout: float | None = None,
+    ) -> Iterator[None]:
+        """Hold a request slot for the duration of the block.
+
+        Args:
+            session: Session the request belongs to, e.g. a conversation.
+            priority: Request priority.
+            timeout: Maximum time in seconds to wait for a slot.
+
+        Raises:
+            QueueFullError: If the request is shed because the queue is too deep.
+            TimeoutError: If no slot became free within the timeout.
+        """
+        ticket = self._enqueue(session, priority)
+        if not ticket.granted.wait(timeout):
+            with self._lock:
+                if not ticket.granted.is_set():
+                    self._remove(ticket)
+                    raise TimeoutError(f"No request slot free within {timeout:g}s")
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def _enqueue(self, session: str, priority: Priority) -> _Ticket:
+        """Queue a request and start it if a slot is free.
+
+        Args:
+            session: Session the request belongs to.
+            priority: Request priority.
+
+        Returns:
+            Ticket that is granted once the request may start.
+        """
+        ticket = _Ticket(session=session, priority=priority)
+        with self._lock:
+            if self._waiting >= self.queue_limit(priority):
+                logger.warning(
+                    f"Shedding {priority.name.lower()} request for {session}: "
+                    f"{self._waiting} requests waiting"
+                )
+                raise QueueFullError(f"Too many requests waiting ({self._waiting}), try again")
+            self._queues[priority].setdefault(session, deque()).append(ticket)
+            self._waiting += 1
+            self._dispatch()
+        return ticket
+
+    def _release(self, ticket: _Ticket) -> None:
+        """Free the slot of a finished request.
+
+        Args:
+            ticket: Granted ticket.
+        """
+        with self._lock:
+            self._active -= 1
+            self._active_by_session[ticket.session] -= 1
+            if not self._active_by_session[ticket.session]:
+                del self._active_by_session[ticket.session]
+            self._dispatch()
+
+    def _remove(self, ticket: _Ticket) -> None:
+        """Drop a waiting ticket from its queue. Call with the lock held.
+
+        Args:
+            ticket: Waiting ticket.
+        """
+        sessions = self._queues[ticket.priority]
+        sessions[ticket.session].remove(ticket)
+        if not sessions[ticket.session]:
+            del sessions[ticket.session]
+        self._waiting -= 1
+
+    def _can_start(self, session: str, priority: Priority) -> bool:
+        """Check whether a request may start now. Call with the lock held.
+
+        Args:
+            session: Session the request belongs to.
+            priority: Request priority.
+
+        Returns:
+            True if a slot is free for the request.
+        """
+        limit = self.max_concurrent
+        if priority != Priority.INTERACTIVE:
+            limit -= self.reserved_interactive
+        return (
+            self._active < limit
+            and self._active_by_session.get(session, 0) < self.per_session
+        )
+
+    def _dispatch(self) -> None:
+        """Grant free slots to waiting requests. Call with the lock held."""
+        while self._active < self.max_concurrent:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+            self._waiting -= 1
+            self._active += 1
+            self._active_by_session[ticket.session] = (
+                self._active_by_session.get(ticket.session, 0) + 1
+            )
+            ticket.granted.set()
+
+    def _next_ticket(self) -> _Ticket | None:
+        """Take the next request to start. Call with the lock held.
+
+        Returns:
+            The oldest ticket of the first eligible session at the most
+            urgent priority, or None if no waiting request may start.
+        """
+        for priority, sessions in self._queues.items():
+            for session, tickets in sessions.items():
+                if not self._can_start(session, priority):
+                    continue
+                ticket = tickets.popleft()
+                if tickets:
+                    # Round robin: the session goes behind the others
+                    sessions.move_to_end(session)
+                else:
+                    del sessions[session]
+                return ticket
+        return None
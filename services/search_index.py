@@ -0,0 +1,177 @@
+"""Full-text search over chat history."""
+
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from services.conversation_store import data_dir
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages USING fts5(
+    content,
+    conversation_id UNINDEXED,
+    seq UNINDEXED,
+    role UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+
+@dataclass
+class SearchHit:
+    """A message matching a search."""
+    conversation_id: str
+    seq: int
+    role: str
+    snippet: str
+    rank: float
+
+
+def build_match_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query.
+
+    Every word must match; the last word also matches as a prefix so results
+    show up while typing. FTS5 operators in the input are treated as text.
+
+    Args:
+        query: Free text typed by the user.
+
+    Returns:
+        FTS5 MATCH expression, or an empty string if there are no words.
+    """
+    words = query.split()
+    if not words:
+        return ""
+    terms = ['"' + word.replace('"', '""') + '"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """Incremental SQLite FTS5 index of chat messages.
+
+    Messages are indexed one by one as they are added to a conversation and
+    searched with BM25 ranking, snippet extraction and pagination.
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        """Initialize search index.
+
+        Args:
+            path: Database file, or ``":memory:"``. Defaults to ``search.db``
+                in the data directory. Opened on first use.
+        """
+        self.path = str(path) if path is not None else str(data_dir() / "search.db")
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Database connection, created with the schema on first use."""
+        if self._connection is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            if self.path != ":memory:":
+                connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def add(self, conversation_id: str, seq: int, role: str, content: str) -> None:
+        """Index a message.
+
+        Args:
+            conversation_id: Conversation the message belongs to.
+            seq: Position of the message in the conversation.
+            role: Message role.
+            content: Message text.
+        """
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO messages (content, conversation_id, seq, role) VALUES (?, ?, ?, ?)",
+                (content, conversation_id, seq, role),
+            )
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        conversation_id: str | None = None,
+    ) -> list[SearchHit]:
+        """Search messages, best matches first.
+
+        Args:
+            query: Free text to search for.
+            limit: Maximum number of hits.
+            offset: Number of hits to skip, for pagination.
+            conversation_id: Only search this conversation. Defaults to all.
+
+        Returns:
+            List of search hits with highlighted snippets.
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self.connection.execute(
+                """
+                SELECT conversation_id, seq, role,
+                       snippet(messages, 0, '[', ']', '…', 12), bm25(messages)
+                FROM messages
+                WHERE messages MATCH ? AND (? IS NULL OR conversation_id = ?)
+                ORDER BY bm25(messages)
+                LIMIT ? OFFSET ?
+                """,
+                (match, conversation_id, conversation_id, limit, offset),
+            ).fetchall()
+        return [
+            SearchHit(
+                conversation_id=row[0], seq=int(row[1]), role=row[2], snippet=row[3], rank=row[4]
+            )
+            for row in rows
+        ]
+
+    def count(self, query: str, conversation_id: str | None = None) -> int:
+        """Count the messages matching a search.
+
+        Args:
+            query: Free text to search for.
+            conversation_id: Only count this conversation. Defaults to all.
+
+        Returns:
+            Number of matching messages.
+        """
+        match = build_match_query(query)
+        if not match:
+            return 0
+        with self._lock:
+            return self.connection.execute(
+                "SELECT count(*) FROM messages "
+                "WHERE messages MATCH ? AND (? IS NULL OR conversation_id = ?)",
+                (match, conversation_id, conversation_id),
+            ).fetchone()[0]
+
+    def delete_conversation(self, conversation_id: str) -> None:
+        """Remove every message of a conversation from the index.
+
+        Args:
+            conversation_id: Conversation identifier.
+        """
+        with self._lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM messages WHERE conversation_id = ?", (conversation_id,)
+            )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,238 @@
+"""Answers to earlier prompts found by embedding similarity."""
+
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+try:
+    import numpy as np
+except ImportError:  # Optional: install numpy to enable the semantic cache
+    np = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SemanticHit:
+    """Cached answer to a similar prompt."""
+    prompt: str
+    answer: str
+    similarity: float
+
+
+def completion_from_hit(hit: SemanticHit, model: str) -> dict[str, Any]:
+    """Build a chat completion response from a cached answer.
+
+    Args:
+        hit: Cache hit.
+        model: Model the answer is served for.
+
+    Returns:
+        Response shaped like ``chat_completion`` results, with ``cache_hit``
+        and ``similarity`` added.
+    """
+    return {
+        "id": "semantic-cache",
+        "object": "chat.completion",
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": hit.answer},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        "cache_hit": True,
+        "similarity": hit.similarity,
+    }
+
+
+class SemanticCache:
+    """Vector index of prompts and their answers.
+
+    Prompt embeddings are normalized and kept in one preallocated NumPy
+    matrix, so a lookup is a single matrix-vector product over all entries.
+    Entries only match within their scope, e.g. the same model, sampling
+    parameters and earlier conversation. When the index is full, expired
+    entries are replaced first, then the least recently used one.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], list[float]],
+        threshold: float = 0.95,
+        capacity: int = 1000,
+        ttl: float = 24 * 60 * 60,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize semantic cache.
+
+        Args:
+            embed: Function returning the embedding of a text.
+            threshold: Minimum cosine similarity for a hit.
+            capacity: Maximum number of entries.
+            ttl: Seconds an entry stays valid.
+            clock: Monotonic clock returning seconds.
+
+        Raises:
+            ImportError: If NumPy is not installed.
+        """
+        if np is None:
+            raise ImportError("The semantic cache needs NumPy; install numpy to enable it")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.embed = embed
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl = ttl
+        self._clock = clock
+        # Allocated on the first store, when the embedding size is known
+        self._vectors: Any = None
+        self._scopes = np.zeros(capacity, dtype=np.int64)
+        self._stored_at = np.zeros(capacity, dtype=np.float64)
+        self._used_at = np.zeros(capacity, dtype=np.float64)
+        self._entries: list[tuple[str, str, str]] = []
+        # Ids of the scopes of current entries, dropped with their last entry
+        self._scope_ids: dict[str, int] = {}
+        self._scope_entries: Counter[int] = Counter()
+        self._next_scope_id = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "stores": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _vector(self, text: str) -> Any:
+        """Embed and normalize a text.
+
+        Args:
+            text: Text to embed.
+
+        Returns:
+            Unit length float32 vector.
+        """
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, prompt: str, scope: str = "") -> SemanticHit | None:
+        """Find the answer to the most similar earlier prompt.
+
+        Args:
+            prompt: Prompt to answer.
+            scope: Scope the answer must have been stored in.
+
+        Returns:
+            The best match if its similarity reaches the threshold, else None.
+        """
+        if not self._entries:
+            return None
+        vector = self._vector(prompt)
+        with self._lock:
+            self._stats["lookups"] += 1
+            size = len(self._entries)
+            scope_id = self._scope_ids.get(scope)
+            if scope_id is None or vector.shape[0] != self._vectors.shape[1]:
+                return None
+            now = self._clock()
+            similarities = self._vectors[:size] @ vector
+            valid = (self._scopes[:size] == scope_id) & (self._stored_at[:size] > now - self.ttl)
+            similarities = np.where(valid, similarities, -np.inf)
+            index = int(np.argmax(similarities))
+            similarity = float(similarities[index])
+            if similarity < self.threshold:
+                return None
+            self._used_at[index] = now
+            self._stats["hits"] += 1
+            cached_prompt, answer, _ = self._entries[index]
+        logger.debug("Semantic cache hit with similarity %.3f", similarity)
+        return SemanticHit(cached_prompt, answer, similarity)
+
+    def store(self, prompt: str, answer: str, scope: str = "") -> None:
+        """Add a prompt and its answer.
+
+        Args:
+            prompt: Prompt that was answered.
+            answer: Answer text.
+            scope: Scope the answer is valid in.
+        """
+        vector = self._vector(prompt)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+            elif vector.shape[0] != self._vectors.shape[1]:
+                logger.warning("Embedding size changed; not caching the answer")
+                return
+            now = self._clock()
+            size = len(self._entries)
+            if size < self.capacity:
+                index = size
+                self._entries.append((prompt, answer, scope))
+            else:
+                # Expired entries go first, then the least recently used
+                expired = self._stored_at <= now - self.ttl
+                index = int(np.argmin(np.where(expired, -np.inf, self._used_at)))
+                self._release_scope(self._entries[index][2])
+                self._entries[index] = (prompt, answer, scope)
+                self._stats["evictions"] += 1
+            scope_id = self._scope_ids.get(scope)
+            if scope_id is None:
+                scope_id = self._scope_ids[scope] = next(self._next_scope_id)
+            self._scope_entries[scope_id] += 1
+            self._vectors[index] = vector
+            self._scopes[index] = scope_id
+            self._stored_at[index] = now
+            self._used_at[index] = now
+            self._stats["stores"] += 1
+
+    def _release_scope(self, scope: str) -> None:
+        """Forget a scope once its last entry is replaced.
+
+        Args:
+            scope: Scope of the replaced entry.
+        """
+        scope_id = self._scope_ids[scope]
+        self._scope_entries[scope_id] -= 1
+        if not self._scope_entries[scope_id]:
+            del self._scope_entries[scope_id]
+            del self._scope_ids[scope]
+
+    def stats(self) -> dict[str, int]:
+        """Get counters.
+
+        Returns:
+            Lookups, hits, stored answers, evictions, current entries and
+            scopes.
+        """
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "scopes": len(self._scope_ids)}
+
+
+def semantic_cache_from_env(embed: Callable[[str], list[float]]) -> SemanticCache | None:
+    """Create the semantic cache configured by the environment.
+
+    ``FLET_CHAT_SEMANTIC_CACHE`` sets the similarity threshold and enables
+    the cache; ``FLET_CHAT_SEMANTIC_CACHE_SIZE`` sets its capacity.
+
+    Args:
+        embed: Function returning the embedding of a text.
+
+    Returns:
+        The cache, or None when not configured or NumPy is missing.
+    """
+    threshold = os.getenv("FLET_CHAT_SEMANTIC_CACHE")
+    if not threshold:
+        return None
+    if np is None:
+        logger.warning("Semantic cache disabled: NumPy is not installed")
+        return None
+    capacity = int(os.getenv("FLET_CHAT_SEMANTIC_CACHE_SIZE", "1000"))
+    return SemanticCache(embed, threshold=float(threshold), capacity=capacity)
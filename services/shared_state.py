@@ -0,0 +1,299 @@
+"""Cache and rate limit state shared by worker processes through SQLite."""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from services.conversation_store import data_dir
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at);
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def default_path() -> Path:
+    """Get the shared state database.
+
+    Returns:
+        ``shared.db`` in the data directory.
+    """
+    return data_dir() / "shared.db"
+
+
+def cache_key(*parts: Any) -> str:
+    """Hash request parameters into a cache key.
+
+    Args:
+        *parts: JSON serializable values identifying the request.
+
+    Returns:
+        Hex digest of the canonical JSON of the parts.
+    """
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=20).hexdigest()
+
+
+class _SharedDatabase:
+    """Lazily opened SQLite connection usable across threads and processes."""
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        """Initialize shared database.
+
+        Args:
+            path: Database file, or ``":memory:"``. Defaults to ``shared.db``
+                in the data directory. Opened on first use.
+        """
+        self.path = str(path) if path is not None else str(default_path())
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Database connection, created with the schema on first use."""
+        if self._connection is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            # Transactions are explicit so writers can take the lock up front
+            connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False, isolation_level=None
+            )
+            if self.path != ":memory:":
+                connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class SharedCache(_SharedDatabase):
+    """Key-value cache with expiry, shared by every process using the file.
+
+    Values are stored as JSON. Every worker reads and writes the same
+    entries, so a response fetched by one worker saves the upstream call in
+    all others.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        default_ttl: float = 300.0,
+        max_entries: int = 10_000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Initialize shared cache.
+
+        Args:
+            path: Database file, or ``":memory:"``. Defaults to the data directory.
+            default_ttl: Seconds entries stay valid unless set otherwise.
+            max_entries: Entries kept when purging; the ones expiring first go.
+            clock: Wall clock returning seconds, shared between processes.
+        """
+        super().__init__(path)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._writes = 0
+
+    def get(self, namespace: str, key: str) -> Any | None:
+        """Get a cached value.
+
+        Args:
+            namespace: Kind of value, e.g. ``models``.
+            key: Cache key within the namespace.
+
+        Returns:
+            The value, or None if missing or expired.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, self._clock()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float | None = None) -> None:
+        """Store a value.
+
+        Args:
+            namespace: Kind of value.
+            key: Cache key within the namespace.
+            value: JSON serializable value.
+            ttl: Seconds the value stays valid. Defaults to ``default_ttl``.
+        """
+        expires_at = self._clock() + (ttl if ttl is not None else self.default_ttl)
+        data = json.dumps(value, ensure_ascii=False, default=str)
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (namespace, key, data, expires_at),
+            )
+            self._writes += 1
+            purge = self._writes % 100 == 0
+        if purge:
+            self.purge()
+
+    def purge(self) -> int:
+        """Remove expired entries and trim the cache to ``max_entries``.
+
+        Returns:
+            Number of entries removed.
+        """
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                removed = connection.execute(
+                    "DELETE FROM cache WHERE expires_at <= ?", (self._clock(),)
+                ).rowcount
+                removed += connection.execute(
+                    """
+                    DELETE FROM cache WHERE rowid IN (
+                        SELECT rowid FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_entries,),
+                ).rowcount
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        if removed:
+            logger.debug(f"Purged {removed} shared cache entries")
+        return removed
+
+
+class RateLimiter(_SharedDatabase):
+    """Token bucket rate limit shared by every process using the file.
+
+    Each request takes tokens from one bucket stored in SQLite; the bucket
+    refills at ``rate`` tokens per second up to ``burst``. The update runs
+    in an immediate transaction, so workers together never exceed the limit.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        rate: float = 5.0,
+        burst: float | None = None,
+        name: str = "upstream",
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize rate limiter.
+
+        Args:
+            path: Database file. Defaults to the data directory.
+            rate: Requests per second across all processes.
+            burst: Bucket size. Defaults to one second of requests.
+            name: Bucket name, so several limits can share a file.
+            clock: Wall clock returning seconds, shared between processes.
+            sleep: Function waiting for a number of seconds.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        super().__init__(path)
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.name = name
+        self._clock = clock
+        self._sleep = sleep
+
+    def try_acquire(self, cost: float = 1.0) -> float:
+        """Take tokens if the bucket has enough.
+
+        Args:
+            cost: Tokens to take.
+
+        Returns:
+            0 if the tokens were taken, otherwise the seconds until they
+            will be available.
+        """
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = self._clock()
+                row = connection.execute(
+                    "SELECT tokens, updated_at FROM buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+                tokens = self.burst if row is None else row[0]
+                if row is not None:
+                    tokens = min(self.burst, tokens + max(0.0, now - row[1]) * self.rate)
+                wait = 0.0 if tokens >= cost else (cost - tokens) / self.rate
+                if not wait:
+                    tokens -= cost
+                connection.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.name, tokens, now),
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return wait
+
+    def acquire(self, cost: float = 1.0, timeout: float | None = None) -> None:
+        """Wait until tokens are available and take them.
+
+        Args:
+            cost: Tokens to take.
+            timeout: Maximum seconds to wait.
+
+        Raises:
+            TimeoutError: If the tokens are not available in time.
+        """
+        deadline = self._clock() + timeout if timeout else None
+        while wait := self.try_acquire(cost):
+            if deadline is not None and self._clock() + wait > deadline:
+                raise TimeoutError(f"Rate limit of {self.rate:g} requests/s exceeded")
+            self._sleep(wait)
+
+
+def shared_state_from_env() -> tuple[SharedCache | None, RateLimiter | None]:
+    """Create the shared cache and rate limiter configured by the environment.
+
+    ``FLET_CHAT_SHARED_STATE`` names the database. Cache entries are kept
+    for ``FLET_CHAT_CACHE_TTL`` seconds (default 300; 0 disables the cache)
+    and ``FLET_CHAT_RATE_LIMIT`` sets a requests per second limit across all
+    processes.
+
+    Returns:
+        Tuple of cache and rate limiter, each None when not configured.
+    """
+    path = os.getenv("FLET_CHAT_SHARED_STATE")
+    if not path:
+        return None, None
+    ttl = float(os.getenv("FLET_CHAT_CACHE_TTL", "300"))
+    cache = SharedCache(path, default_ttl=ttl) if ttl > 0 else None
+    rate = os.getenv("FLET_CHAT_RATE_LIMIT")
+    limiter = RateLimiter(path, rate=float(rate)) if rate else None
+    return cache, limiter
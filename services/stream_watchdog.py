@@ -0,0 +1,145 @@
+"""Interrupt streamed responses that are cancelled or run out of time."""
+
+import itertools
+import logging
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
+from typing import Any
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def interrupt_stream(stream: Any) -> None:
+    """Make a read blocked on a stream in another thread return.
+
+    Closing an HTTP response does not wake a thread blocked reading its
+    socket, so the socket is shut down and the reader sees the stream end.
+    The reader still closes the response itself.
+
+    Args:
+        stream: Stream with a ``close`` method, or SDK event stream holding
+            an httpx ``response``.
+    """
+    close = getattr(stream, "close", None)
+    if callable(close):
+        close()
+        return
+    response = getattr(stream, "response", None)
+    if response is None:
+        return
+    network_stream = response.extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is None:
+        response.close()
+        return
+    with suppress(OSError):
+        sock.shutdown(socket.SHUT_RDWR)
+
+
+@dataclass
+class _Watch:
+    """A stream closed once cancelled or past its deadline."""
+    stream: Any
+    cancel_event: threading.Event | None
+    deadline: float | None
+
+
+class StreamWatchdog:
+    """Close streams whose generation was stopped or overran its budget.
+
+    Cancellation and deadlines are otherwise only noticed when the next
+    chunk arrives, which never happens on a stalled stream. One thread
+    checks every watched stream each ``interval`` seconds and runs only
+    while there is something to watch.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.05,
+        clock: Callable[[], float] = time.monotonic,
+        interrupt: Callable[[Any], None] = interrupt_stream,
+    ) -> None:
+        """Initialize stream watchdog.
+
+        Args:
+            interval: Seconds between checks.
+            clock: Monotonic clock the deadlines refer to.
+            interrupt: Function closing a stream from the watchdog thread.
+        """
+        self.interval = interval
+        self.clock = clock
+        self.interrupt = interrupt
+        self._watches: dict[int, _Watch] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @contextmanager
+    def watch(
+        self,
+        stream: Any,
+        cancel_event: threading.Event | None = None,
+        deadline: float | None = None,
+    ) -> Iterator[None]:
+        """Watch a stream while the block runs.
+
+        Args:
+            stream: Stream to interrupt.
+            cancel_event: Optional event stopping the generation.
+            deadline: Optional clock time the generation must end by.
+
+        Yields:
+            Nothing; the stream is watched until the block exits.
+        """
+        if cancel_event is None and deadline is None:
+            yield
+            return
+        with self._lock:
+            key = next(self._ids)
+            self._watches[key] = _Watch(stream, cancel_event, deadline)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="stream-watchdog", daemon=True
+                )
+                self._thread.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._watches.pop(key, None)
+
+    def _due(self) -> list[_Watch]:
+        """Remove and return the watches to interrupt now.
+
+        Returns:
+            Watches that were cancelled or are past their deadline.
+        """
+        now = self.clock()
+        due = [
+            key
+            for key, watch in self._watches.items()
+            if (watch.cancel_event is not None and watch.cancel_event.is_set())
+            or (watch.deadline is not None and now >= watch.deadline)
+        ]
+        return [self._watches.pop(key) for key in due]
+
+    def _run(self) -> None:
+        """Interrupt due streams until nothing is watched."""
+        while True:
+            with self._lock:
+                if not self._watches:
+                    self._thread = None
+                    return
+                due = self._due()
+            # Interrupt outside the lock, closing may block briefly
+            for watch in due:
+                try:
+                    self.interrupt(watch.stream)
+                except Exception as e:
+                    logger.debug(f"Failed to interrupt stream: {e!s}")
+            time.sleep(self.interval)
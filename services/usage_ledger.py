@@ -0,0 +1,365 @@
+"""Persistent ledger of API token usage and latency.
+
+Usage:
+    uv run python -m services.usage_ledger --by hour,model --since 24
+"""
+
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from services.conversation_store import data_dir
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    session TEXT NOT NULL DEFAULT '',
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    latency REAL NOT NULL DEFAULT 0,
+    ttft REAL,
+    cache_hit INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS usage_created_at ON usage (created_at);
+"""
+
+# Rollup dimensions and the SQL expression grouping by each
+DIMENSIONS: dict[str, str] = {
+    "hour": "strftime('%Y-%m-%d %H:00', created_at, 'unixepoch')",
+    "day": "strftime('%Y-%m-%d', created_at, 'unixepoch')",
+    "model": "model",
+    "provider": "provider",
+    "session": "session",
+}
+
+# Answers served from a cache are counted but left out of latency averages
+UPSTREAM_LATENCY = "CASE WHEN cache_hit = 0 THEN latency END"
+
+# Only streamed upstream answers have a first token to time generation from
+GENERATED = "cache_hit = 0 AND ttft IS NOT NULL"
+
+
+@dataclass
+class UsageRecord:
+    """Usage and timings of one API request, latencies in seconds."""
+    provider: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float = 0.0
+    ttft: float | None = None
+    cache_hit: bool = False
+    session: str = ""
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class UsageRollup:
+    """Aggregated usage of a group of requests."""
+    key: dict[str, str]
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    avg_latency: float
+    max_latency: float
+    avg_ttft: float | None
+    cache_hits: int
+    errors: int
+    generation_time: float
+    generated_tokens: int
+
+    @property
+    def total_tokens(self) -> int:
+        """Prompt and completion tokens together."""
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        """Completion tokens per second of generation after the first token.
+
+        Only streamed answers that were not cache hits are counted, as the
+        others have no generation time.
+        """
+        if self.generation_time <= 0:
+            return None
+        return self.generated_tokens / self.generation_time
+
+
+class UsageLedger:
+    """SQLite ledger of per-request usage with rollups.
+
+    Every chat request is recorded with its token counts and timings so
+    throughput and cost trends can be tracked and rate limits sized from
+    real traffic.
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        """Initialize usage ledger.
+
+        Args:
+            path: Database file, or ``":memory:"``. Defaults to ``usage.db``
+                in the data directory. Opened on first use.
+        """
+        self.path = str(path) if path is not None else str(data_dir() / "usage.db")
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Database connection, created with the schema on first use."""
+        if self._connection is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            if self.path != ":memory:":
+                connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def record(self, entry: UsageRecord) -> None:
+        """Record the usage of one request.
+
+        Args:
+            entry: Usage record.
+        """
+        with self._lock, self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO usage (created_at, provider, model, session, prompt_tokens,
+                                   completion_tokens, latency, ttft, cache_hit, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    entry.created_at,
+                    entry.provider,
+                    entry.model,
+                    entry.session,
+                    entry.prompt_tokens,
+                    entry.completion_tokens,
+                    entry.latency,
+                    entry.ttft,
+                    int(entry.cache_hit),
+                    entry.error,
+                ),
+            )
+        logger.debug(f"Recorded usage: {entry}")
+
+    def records(
+        self, since: float | None = None, until: float | None = None, limit: int = 100
+    ) -> list[UsageRecord]:
+        """Get recorded requests, newest first.
+
+        Args:
+            since: Only requests at or after this Unix timestamp.
+            until: Only requests before this Unix timestamp.
+            limit: Maximum number of records.
+
+        Returns:
+            List of usage records.
+        """
+        where, params = self._time_filter(since, until)
+        with self._lock:
+            rows = self.connection.execute(
+                f"""
+                SELECT provider, model, prompt_tokens, completion_tokens, latency, ttft,
+                       cache_hit, session, error, created_at
+                FROM usage {where}
+                ORDER BY created_at DESC
+                LIMIT ?
+                """,
+                (*params, limit),
+            ).fetchall()
+        return [
+            UsageRecord(
+                provider=row[0],
+                model=row[1],
+                prompt_tokens=row[2],
+                completion_tokens=row[3],
+                latency=row[4],
+                ttft=row[5],
+                cache_hit=bool(row[6]),
+                session=row[7],
+                error=row[8],
+                created_at=row[9],
+            )
+            for row in rows
+        ]
+
+    def rollup(
+        self,
+        by: tuple[str, ...] = ("hour",),
+        since: float | None = None,
+        until: float | None = None,
+    ) -> list[UsageRollup]:
+        """Aggregate usage by time bucket, model, provider or session.
+
+        Args:
+            by: Dimensions to group by, from ``DIMENSIONS``.
+            since: Only requests at or after this Unix timestamp.
+            until: Only requests before this Unix timestamp.
+
+        Returns:
+            One rollup per group, ordered by the grouping keys.
+        """
+        unknown = [dimension for dimension in by if dimension not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown rollup dimension: {', '.join(unknown)}")
+        keys = "".join(f"{DIMENSIONS[dimension]} AS {dimension}, " for dimension in by)
+        group = f"GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}" if by else ""
+        where, params = self._time_filter(since, until)
+        with self._lock:
+            rows = self.connection.execute(
+                f"""
+                SELECT {keys}
+                       count(*), sum(prompt_tokens), sum(completion_tokens),
+                       avg({UPSTREAM_LATENCY}), max({UPSTREAM_LATENCY}),
+                       avg(CASE WHEN cache_hit = 0 THEN ttft END), sum(cache_hit),
+                       count(error), sum(CASE WHEN {GENERATED} THEN latency - ttft END),
+                       sum(CASE WHEN {GENERATED} THEN completion_tokens END)
+                FROM usage {where}
+                {group}
+                """,
+                params,
+            ).fetchall()
+        rollups = []
+        for row in rows:
+            key = dict(zip(by, row[: len(by)], strict=True))
+            values = row[len(by) :]
+            if not values[0]:
+                continue
+            rollups.append(
+                UsageRollup(
+                    key=key,
+                    requests=values[0],
+                    prompt_tokens=values[1] or 0,
+                    completion_tokens=values[2] or 0,
+                    avg_latency=values[3] or 0.0,
+                    max_latency=values[4] or 0.0,
+                    avg_ttft=values[5],
+                    cache_hits=values[6] or 0,
+                    errors=values[7],
+                    generation_time=values[8] or 0.0,
+                    generated_tokens=values[9] or 0,
+                )
+            )
+        return rollups
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    @staticmethod
+    def _time_filter(since: float | None, until: float | None) -> tuple[str, tuple[float, ...]]:
+        """Build the WHERE clause for a time range.
+
+        Args:
+            since: Start of the range, inclusive.
+            until: End of the range, exclusive.
+
+        Returns:
+            Tuple of SQL clause and its parameters.
+        """
+        conditions = []
+        params: list[float] = []
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, tuple(params)
+
+
+def format_rollups(rollups: list[UsageRollup], by: tuple[str, ...]) -> str:
+    """Format rollups as a text table.
+
+    Args:
+        rollups: Rollups to show.
+        by: Grouping dimensions, shown as the first columns.
+
+    Returns:
+        Table with one line per rollup.
+    """
+    header = [
+        *by,
+        "requests",
+        "prompt",
+        "completion",
+        "avg s",
+        "max s",
+        "ttft s",
+        "tok/s",
+        "cached",
+        "errors",
+    ]
+    lines = [header]
+    for rollup in rollups:
+        tokens_per_second = rollup.tokens_per_second
+        lines.append(
+            [
+                *(rollup.key[dimension] for dimension in by),
+                str(rollup.requests),
+                str(rollup.prompt_tokens),
+                str(rollup.completion_tokens),
+                f"{rollup.avg_latency:.2f}",
+                f"{rollup.max_latency:.2f}",
+                f"{rollup.avg_ttft:.2f}" if rollup.avg_ttft is not None else "-",
+                f"{tokens_per_second:.1f}" if tokens_per_second is not None else "-",
+                str(rollup.cache_hits),
+                str(rollup.errors),
+            ]
+        )
+    widths = [max(len(line[column]) for line in lines) for column in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(line, widths, strict=True)).rstrip()
+        for line in lines
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Print usage rollups from the ledger.
+
+    Args:
+        argv: Command line arguments. Defaults to ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(description="Show token usage and latency rollups")
+    parser.add_argument("--db", help="Ledger database, defaults to the data directory")
+    parser.add_argument(
+        "--by",
+        default="hour",
+        help=f"Comma separated dimensions: {', '.join(DIMENSIONS)} (default: hour)",
+    )
+    parser.add_argument("--since", type=float, help="Only the last N hours")
+    args = parser.parse_args(argv)
+
+    by = tuple(dimension.strip() for dimension in args.by.split(",") if dimension.strip())
+    since = time.time() - args.since * 3600 if args.since is not None else None
+    ledger = UsageLedger(args.db)
+    try:
+        rollups = ledger.rollup(by=by, since=since)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        ledger.close()
+    print(format_rollups(rollups, by))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Fakes and fixtures shared by the tests."""
+
+import logging
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from services.logging_pipeline import shutdown_logging
+
+
+class Clock:
+    """Monotonic clock advanced by hand or by a fixed step per reading."""
+
+    def __init__(self, now: float = 0.0, step: float = 0.0) -> None:
+        self.now = now
+        self.step = step
+
+    def __call__(self) -> float:
+        self.now += self.step
+        return self.now
+
+
+class FakeChunk:
+    """SDK chunk model stand-in."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def model_dump(self) -> dict:
+        return {"choices": [{"delta": {"content": self.text}}]}
+
+
+class FakeStream:
+    """SDK event stream stand-in streaming one chunk per text."""
+
+    def __init__(self, texts: list[str]) -> None:
+        self.events = [SimpleNamespace(data=FakeChunk(text)) for text in texts]
+        self.closed = False
+
+    def __enter__(self) -> "FakeStream":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.closed = True
+
+    def __iter__(self):
+        return iter(self.events)
+
+
+class StalledStream(FakeStream):
+    """Event stream that stops sending after its first chunk until closed."""
+
+    def __init__(self, texts: list[str], delay: float = 60.0) -> None:
+        super().__init__(texts)
+        self.delay = delay
+        self.interrupted = threading.Event()
+
+    def __iter__(self):
+        yield from self.events[:1]
+        self.interrupted.wait(self.delay)
+        yield from self.events[1:]
+
+    def close(self) -> None:
+        self.interrupted.set()
+
+
+@pytest.fixture
+def numpy() -> None:
+    """Skip tests of vector indexes when NumPy is not installed."""
+    pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def restore_root_logger():
+    """Restore the root logger after a test replaced its handlers."""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    shutdown_logging()
+    root.handlers = handlers
+    root.setLevel(level)
@@ -0,0 +1,226 @@
+"""Tests for the process-wide application context."""
+
+import json
+import logging
+from unittest.mock import Mock
+
+import flet as ft
+from conftest import Clock
+
+from screens.chat_screen import ChatScreen
+from screens.provider_screen import ProviderScreen
+from services.app_context import AppContext, ClientPool
+from services.conversation_store import ConversationStore
+from services.conversation_tree import ConversationTree
+from services.logging_pipeline import configure_logging, shutdown_logging
+from services.provider_manager import ProviderSettings
+from services.search_index import SearchIndex
+from services.usage_ledger import UsageLedger
+
+
+def _context(clock: Clock | None = None, **kwargs) -> AppContext:
+    """Create a context with in-memory stores."""
+    return AppContext(
+        search_index=SearchIndex(":memory:"),
+        usage_ledger=UsageLedger(":memory:"),
+        clock=clock or Clock(),
+        **kwargs,
+    )
+
+
+def test_client_pool_shares_clients_per_key() -> None:
+    """Test that providers with the same key share one client."""
+    pool = ClientPool()
+    first = pool.client_for(ProviderSettings(name="a", api_key="key-1"))
+    second = pool.client_for(ProviderSettings(name="b", api_key="key-1"))
+    other = pool.client_for(ProviderSettings(name="c", api_key="key-2"))
+
+    assert first is second
+    assert other is not first
+    assert pool.client_for(ProviderSettings(name="d", api_key="")) is pool.default
+    assert len(pool) == 3
+
+
+def test_client_pool_clients_send_to_provider_url() -> None:
+    """Test that providers on other servers get clients of their own."""
+    pool = ClientPool(api_key="env-key")
+    local = pool.client_for(ProviderSettings(name="a", api_key="", url="http://localhost:8080/v1/"))
+
+    assert local is not pool.default
+    assert local.server_url == "http://localhost:8080"
+    assert pool.default.server_url is None
+    assert pool.client_for(ProviderSettings(name="b", api_key="")) is pool.default
+
+
+def test_client_pool_builds_clients_with_factory() -> None:
+    """Test that the context builds its clients with the given factory."""
+    built = []
+
+    def factory(*args, **kwargs) -> Mock:
+        built.append(args)
+        return Mock()
+
+    context = _context(api_factory=factory)
+    client = context.clients.client_for(ProviderSettings(name="a", api_key="key-1"))
+
+    assert client is context.clients.client_for(ProviderSettings(name="b", api_key="key-1"))
+    assert built[-1][0] == "key-1"
+    assert built[-1][1] is context.scheduler
+
+
+def test_provider_keys_are_masked_in_logs(tmp_path, restore_root_logger) -> None:
+    """Test that the keys of loaded and added providers never reach the logs."""
+    log_file = tmp_path / "app.log"
+    configure_logging(log_file=log_file)
+    context = _context()
+    context.provider_manager.add_provider(ProviderSettings(name="Own", api_key="own-key-123"))
+    logging.getLogger("tests.context").info("sending with own-key-123")
+    shutdown_logging()
+
+    assert json.loads(log_file.read_text().splitlines()[-1])["message"] == "sending with ***"
+
+
+def test_sessions_share_process_state() -> None:
+    """Test that screens of different sessions reuse the shared objects."""
+    context = _context()
+    first = ProviderScreen(Mock(spec=ft.Page), context, session_id="s1")
+    second = ProviderScreen(Mock(spec=ft.Page), context, session_id="s2")
+
+    assert first.mistral_api is second.mistral_api
+    assert first.provider_manager is second.provider_manager
+    assert first.scheduler is second.scheduler
+    assert first.usage_ledger is second.usage_ledger
+    assert context.stats()["sessions"] == 2
+    assert len(context.provider_manager.list_providers()) == 1
+
+
+def test_idle_sessions_are_evicted() -> None:
+    """Test that sessions without activity are closed after the timeout."""
+    clock = Clock()
+    context = _context(clock, idle_timeout=60)
+    closed: list[str] = []
+    context.open_session("old", on_close=lambda: closed.append("old"))
+    clock.now = 30
+    context.open_session("active", on_close=lambda: closed.append("active"))
+
+    clock.now = 70
+    context.touch("active")
+    assert context.evict_idle() == ["old"]
+    assert closed == ["old"]
+
+    # Opening a session also evicts idle ones
+    clock.now = 200
+    context.open_session("new")
+    assert closed == ["old", "active"]
+    assert context.session_count == 1
+
+
+def test_least_recently_used_session_makes_room() -> None:
+    """Test that the session limit closes the least recently active session."""
+    context = _context(max_sessions=2)
+    closed: list[str] = []
+    for name in ("a", "b"):
+        context.open_session(name, on_close=lambda name=name: closed.append(name))
+    context.touch("a")
+
+    context.open_session("c")
+    assert closed == ["b"]
+    assert context.session_count == 2
+
+
+def test_closing_session_releases_chat() -> None:
+    """Test that a closed session drops its chat window and stops its reply."""
+    context = _context()
+    page = Mock(spec=ft.Page)
+    screen = ProviderScreen(page, context, session_id="s1")
+    screen.open_chat_window(Mock())
+    chat_screen = screen.chat_screen
+    chat_screen.stop_generation = Mock()
+
+    assert context.close_session("s1") is True
+    assert screen.chat_screen is None
+    chat_screen.stop_generation.assert_called_once()
+    assert context.close_session("s1") is False
+
+
+def test_client_pool_drops_unused_keys() -> None:
+    """Test that deleting a provider releases the client of its key."""
+    context = _context()
+    context.provider_manager.add_provider(ProviderSettings(name="Own", api_key="key-1"))
+    own = context.clients.client_for(context.provider_manager.get_provider("Own"))
+
+    context.provider_manager.add_provider(ProviderSettings(name="Shared", api_key="key-1"))
+    context.provider_manager.delete_provider("Own")
+    assert context.clients.client_for(ProviderSettings(name="x", api_key="key-1")) is own
+
+    context.provider_manager.delete_provider("Shared")
+    assert len(context.clients) == 0
+
+
+def _reply(screen: ProviderScreen, question: str, answer: str) -> None:
+    """Send a message from a session's chat window and stream a canned answer."""
+    chat_screen = screen.chat_screen
+    chat_screen.mistral_api.chat_completion_stream = Mock(
+        return_value=iter([{"choices": [{"delta": {"content": answer}}]}])
+    )
+    chat_screen.send_message(question, Mock(spec=ft.TextField))
+
+
+def test_sessions_keep_separate_conversations(tmp_path) -> None:
+    """Test that sessions sharing the stores neither mix nor see each other's chats."""
+    store = ConversationStore(tmp_path)
+    context = _context(conversation_store=store)
+    screens = []
+    for session_id in ("alice", "bob"):
+        page = Mock(spec=ft.Page)
+        page.run_thread.side_effect = lambda handler, *args: handler(*args)
+        screen = ProviderScreen(page, context, session_id=session_id)
+        screen.open_chat_window(Mock())
+        screens.append(screen)
+    alice, bob = screens
+
+    _reply(alice, "alice kiwi question", "alice answer")
+    _reply(bob, "bob kiwi question", "bob answer")
+
+    assert alice.chat_screen.conversation_id != bob.chat_screen.conversation_id
+    alice_log = store.read_all(alice.chat_screen.conversation_id)
+    assert [record["content"] for record in alice_log] == ["alice kiwi question", "alice answer"]
+    hits = alice.chat_screen.search_history("kiwi")
+    assert [hit.conversation_id for hit in hits] == [alice.chat_screen.conversation_id]
+
+
+def test_chat_follows_other_writers(tmp_path) -> None:
+    """Test that a conversation written from two windows keeps each branch intact."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    store = ConversationStore(tmp_path)
+    first = ChatScreen(page, store=store, conversation_id="shared")
+    second = ChatScreen(page, store=store, conversation_id="shared")
+    for chat_screen in (first, second):
+        chat_screen.build()
+
+    for turn in range(2):
+        for name, chat_screen in (("first", first), ("second", second)):
+            chat_screen.mistral_api.chat_completion_stream = Mock(
+                return_value=iter([{"choices": [{"delta": {"content": f"{name} a{turn}"}}]}])
+            )
+            chat_screen.send_message(f"{name} q{turn}", Mock(spec=ft.TextField))
+
+    stored = ConversationTree.from_records(store.read_all("shared"))
+    assert [m.content for m in stored.messages(stored.nodes[first.tree.head.seq])] == [
+        "first q0",
+        "first a0",
+        "first q1",
+        "first a1",
+    ]
+    # The second window resumed after the first turn, then branched off
+    assert [m.content for m in second.messages] == [
+        "first q0",
+        "first a0",
+        "second q0",
+        "second a0",
+        "second q1",
+        "second a1",
+    ]
+    assert second.tree.head.seq == store.count("shared") - 1
+    assert [entry.text for entry in first.transcript.entries] == [m.content for m in first.messages]
@@ -0,0 +1,127 @@
+"""Tests for cassette recording and replay."""
+
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+from conftest import Clock, FakeStream
+
+from services.cassette import (
+    Cassette,
+    CassetteMissError,
+    RecordingClient,
+    ReplayClient,
+    cassette_from_env,
+)
+from services.mistral_api import MistralAPI, delta_text
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+REQUEST = {
+    "model": "mistral-small-latest",
+    "messages": MESSAGES,
+    "max_tokens": 4096,
+    "temperature": 0.7,
+    "top_p": 1.0,
+}
+
+
+def _record(path: Path, texts: list[str]) -> Cassette:
+    """Record one streamed reply through a fake SDK client."""
+    cassette = Cassette(path, mode="record")
+    sdk = Mock()
+    sdk.chat.stream.return_value = FakeStream(texts)
+    sdk.models.list.return_value.model_dump.return_value = {
+        "data": [{"id": "mistral-small-latest"}]
+    }
+    api = MistralAPI("test-key", cassette=cassette)
+    api.client = RecordingClient(sdk, cassette, clock=Clock(step=0.5))
+    chunks = list(api.chat_completion_stream(MESSAGES, model="mistral-small-latest"))
+    assert [delta_text(chunk) for chunk in chunks] == texts
+    api.list_models()
+    return cassette
+
+
+def test_record_writes_interactions(tmp_path: Path) -> None:
+    """Test that streams and responses are recorded with their timing."""
+    path = tmp_path / "chat.jsonl"
+    _record(path, ["Hel", "lo"])
+
+    replay = Cassette(path)
+    assert len(replay) == 2
+    interaction = replay.next("chat.stream", REQUEST)
+    assert [delay for delay, _ in interaction.chunks] == [0.5, 0.5]
+    assert interaction.latency == 1.0
+    assert interaction.error is None
+
+
+def test_replay_serves_recording_without_api_key(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that replay mode answers from the cassette with no key or network."""
+    path = tmp_path / "chat.jsonl"
+    _record(path, ["Hel", "lo"])
+    monkeypatch.delenv("MISTRAL_API_KEY", raising=False)
+    monkeypatch.setattr("services.mistral_api.load_dotenv", lambda: None)
+
+    api = MistralAPI(cassette=Cassette(path, speed=0))
+    chunks = api.chat_completion_stream(MESSAGES, model="mistral-small-latest")
+    assert "".join(delta_text(chunk) for chunk in chunks) == "Hello"
+    assert api.list_models()["data"][0]["id"] == "mistral-small-latest"
+
+
+def test_replay_scales_timing(tmp_path: Path) -> None:
+    """Test that recorded delays are divided by the replay speed."""
+    path = tmp_path / "chat.jsonl"
+    _record(path, ["a", "b", "c"])
+    waits: list[float] = []
+
+    api = MistralAPI("test-key", cassette=Cassette(path))
+    api.client = ReplayClient(Cassette(path, speed=2.0), sleep=waits.append)
+    list(api.chat_completion_stream(MESSAGES, model="mistral-small-latest"))
+    assert waits == [0.25, 0.25, 0.25]
+
+
+def test_replay_miss_and_loop(tmp_path: Path) -> None:
+    """Test unknown requests and exhausted recordings."""
+    path = tmp_path / "chat.jsonl"
+    _record(path, ["a"])
+
+    with pytest.raises(CassetteMissError):
+        Cassette(path).next("chat.stream", {**REQUEST, "model": "other"})
+
+    looping = Cassette(path)
+    assert looping.next("chat.stream", REQUEST) is looping.next("chat.stream", REQUEST)
+
+    once = Cassette(path, loop=False)
+    once.next("chat.stream", REQUEST)
+    with pytest.raises(CassetteMissError):
+        once.next("chat.stream", REQUEST)
+
+
+def test_recorded_error_is_replayed(tmp_path: Path) -> None:
+    """Test that a failed request fails the same way on replay."""
+    path = tmp_path / "chat.jsonl"
+    cassette = Cassette(path, mode="record")
+    sdk = Mock()
+    sdk.chat.complete.side_effect = ConnectionError("boom")
+    api = MistralAPI("test-key", cassette=cassette)
+    api.client = RecordingClient(sdk, cassette)
+    with pytest.raises(RuntimeError, match="boom"):
+        api.chat_completion(MESSAGES)
+
+    replay = MistralAPI("test-key", cassette=Cassette(path, speed=0))
+    with pytest.raises(RuntimeError, match="boom"):
+        replay.chat_completion(MESSAGES)
+
+
+def test_cassette_from_env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the environment configures one shared cassette."""
+    monkeypatch.delenv("FLET_CHAT_CASSETTE", raising=False)
+    assert cassette_from_env() is None
+
+    monkeypatch.setenv("FLET_CHAT_CASSETTE", str(tmp_path / "env.jsonl"))
+    monkeypatch.setenv("FLET_CHAT_CASSETTE_MODE", "record")
+    cassette = cassette_from_env()
+    assert cassette is not None
+    assert cassette.recording
+    assert cassette_from_env() is cassette
@@ -0,0 +1,227 @@
+"""Tests for the windowed chat transcript."""
+
+import threading
+import time
+from unittest.mock import Mock
+
+import flet as ft
+import pytest
+
+from screens.chat_transcript import ChatTranscript, TranscriptEntry
+from screens.markdown_text import MarkdownText
+
+
+@pytest.fixture
+def transcript() -> ChatTranscript:
+    """Create a small transcript so windowing kicks in quickly."""
+    return ChatTranscript(window_size=10, buffer_size=5, page_size=5, on_change=Mock())
+
+
+def _texts(transcript: ChatTranscript) -> list[str]:
+    """Get the text of every live bubble."""
+    return [bubble.data.text for bubble in transcript.view.controls]
+
+
+def test_append_keeps_live_controls_bounded(transcript: ChatTranscript) -> None:
+    """Test that thousands of messages keep the control count bounded."""
+    for i in range(1000):
+        transcript.append("user", f"message {i}")
+
+    assert len(transcript.entries) == 1000
+    assert len(transcript.view.controls) <= transcript.max_live
+    assert _texts(transcript)[-1] == "message 999"
+    assert len(transcript.view.controls) == len(transcript.live_range)
+
+
+def test_load_older_and_newer(transcript: ChatTranscript) -> None:
+    """Test materializing pages around the live window."""
+    for i in range(100):
+        transcript.append("user", f"message {i}")
+    first_live = transcript.live_range.start
+
+    assert transcript.load_older() == 5
+    assert transcript.live_range.start == first_live - 5
+    assert _texts(transcript)[0] == f"message {first_live - 5}"
+    assert transcript.view.auto_scroll is True
+
+    # Keep paging up until the bottom is released
+    transcript.load_older()
+    transcript.load_older()
+    assert len(transcript.view.controls) <= transcript.max_live
+    assert transcript.live_range.stop < 100
+    assert transcript.view.auto_scroll is False
+
+    # Paging back down restores the latest messages
+    while transcript.load_newer():
+        pass
+    assert _texts(transcript)[-1] == "message 99"
+    assert transcript.view.auto_scroll is True
+
+
+def test_append_while_scrolled_up_jumps_to_latest(transcript: ChatTranscript) -> None:
+    """Test that a new message moves the window back to the end."""
+    for i in range(100):
+        transcript.append("user", f"message {i}")
+    for _ in range(4):
+        transcript.load_older()
+
+    index = transcript.append("user", "latest")
+
+    assert index == 100
+    assert _texts(transcript)[-1] == "latest"
+    assert transcript.live_range.stop == 101
+    assert len(transcript.view.controls) == len(transcript.live_range)
+
+
+def test_update_live_and_released_entries(transcript: ChatTranscript) -> None:
+    """Test updating entries inside and outside the live window."""
+    pending = transcript.append("pending", "...")
+    transcript.update(pending, text="Hello", role="assistant")
+
+    bubble = transcript.live_control(pending)
+    assert bubble is not None
+    assert bubble.data.text == "Hello"
+    assert bubble.bgcolor == ft.Colors.GREY_200
+
+    for i in range(50):
+        transcript.append("user", f"message {i}")
+    assert transcript.live_control(pending) is None
+
+    # Updating a released entry only changes the data
+    transcript.update(pending, text="Edited")
+    assert transcript.entries[pending].text == "Edited"
+
+
+def test_scroll_to_top_loads_older(transcript: ChatTranscript) -> None:
+    """Test that scrolling near the top pages in older messages."""
+    for i in range(100):
+        transcript.append("user", f"message {i}")
+    first_live = transcript.live_range.start
+
+    transcript._on_scroll(Mock(pixels=0, min_scroll_extent=0, max_scroll_extent=2000))
+
+    assert transcript.live_range.start == first_live - 5
+    transcript.on_change.assert_called_once()
+
+
+def test_scroll_in_middle_does_nothing(transcript: ChatTranscript) -> None:
+    """Test that scrolling away from the edges leaves the window alone."""
+    for i in range(100):
+        transcript.append("user", f"message {i}")
+    live = transcript.live_range
+
+    transcript._on_scroll(Mock(pixels=1000, min_scroll_extent=0, max_scroll_extent=2000))
+
+    assert transcript.live_range == live
+    transcript.on_change.assert_not_called()
+
+
+def test_append_text_only_touches_tail(transcript: ChatTranscript) -> None:
+    """Test that streamed text is appended to the live bubble."""
+    index = transcript.append("pending", "Hello")
+    bubble = transcript.live_control(index)
+    sealed = list(bubble.data.spans[:-1])
+
+    transcript.append_text(index, ", world")
+
+    assert transcript.entries[index].text == "Hello, world"
+    assert bubble.data.text == "Hello, world"
+    assert bubble.data.spans[: len(sealed)] == sealed
+
+
+def test_columns(transcript: ChatTranscript) -> None:
+    """Test side-by-side columns for compare mode."""
+    index = transcript.append_columns(["A", "B"])
+    transcript.update_column(index, 0, text="Hi", role="assistant")
+    transcript.append_column_text(index, 0, " there")
+    transcript.update_column(index, 1, text="Error: down", role="error", title="B · failed")
+
+    row = transcript.live_control(index).content
+    assert isinstance(row, ft.Row)
+    assert row.controls[0].data.text == "Hi there"
+    assert row.controls[1].bgcolor == ft.Colors.RED_50
+    assert transcript.entries[index].columns[1].title == "B · failed"
+
+
+def test_load_history_loads_pages_on_demand(transcript: ChatTranscript) -> None:
+    """Test that a stored history is only loaded as it is materialized."""
+    calls: list[tuple[int, int]] = []
+
+    def loader(start: int, stop: int) -> list[TranscriptEntry]:
+        calls.append((start, stop))
+        return [TranscriptEntry("user", f"stored {i}") for i in range(start, stop)]
+
+    transcript.load_history(1000, loader)
+
+    assert calls == [(990, 1000)]
+    assert _texts(transcript)[-1] == "stored 999"
+    assert sum(entry is not None for entry in transcript.entries) == 10
+
+    transcript.load_older()
+    assert calls[-1] == (985, 990)
+    assert _texts(transcript)[0] == "stored 985"
+
+    index = transcript.append("user", "new")
+    assert index == 1000
+
+
+def test_truncate_keeps_shared_controls(transcript: ChatTranscript) -> None:
+    """Test that truncating only removes the controls after the cut."""
+    for i in range(8):
+        transcript.append("user", f"message {i}")
+    kept = transcript.view.controls[:5]
+
+    transcript.truncate(5)
+    transcript.append("assistant", "replacement")
+
+    assert transcript.view.controls[:5] == kept
+    assert all(a is b for a, b in zip(transcript.view.controls, kept, strict=False))
+    assert _texts(transcript)[-1] == "replacement"
+    assert len(transcript.entries) == 6
+
+
+def test_assistant_replies_render_markdown(transcript: ChatTranscript) -> None:
+    """Test that assistant bubbles render Markdown blocks as they stream."""
+    index = transcript.append("assistant", "# Title\n\n")
+    bubble = transcript.live_control(index)
+    first_block = bubble.data.control.controls[0]
+
+    transcript.append_text(index, "Some *text*")
+
+    assert isinstance(bubble.data, MarkdownText)
+    assert bubble.data.text == "# Title\n\nSome *text*"
+    assert bubble.data.control.controls[0] is first_block
+    assert isinstance(bubble.data.control.controls[-1], ft.Markdown)
+
+
+
+def test_append_waits_for_scroll_paging(transcript: ChatTranscript) -> None:
+    """Test that a reply from a worker thread cannot land halfway through paging."""
+    paging = threading.Event()
+    racing = False
+
+    def loader(start: int, stop: int) -> list[TranscriptEntry]:
+        if racing:
+            paging.set()
+            # Without the lock the append would move the window right now
+            time.sleep(0.1)
+        return [TranscriptEntry("user", f"message {i}") for i in range(start, stop)]
+
+    transcript.load_history(100, loader)
+    for _ in range(3):
+        transcript.load_older()
+    assert transcript.live_range.stop < 100
+
+    def reply() -> None:
+        paging.wait(5)
+        transcript.append("assistant", "reply")
+
+    writer = threading.Thread(target=reply)
+    racing = True
+    writer.start()
+    transcript._on_scroll(Mock(pixels=0, min_scroll_extent=0, max_scroll_extent=2000))
+    writer.join()
+
+    assert len(transcript.view.controls) == len(transcript.live_range)
+    assert _texts(transcript) == [transcript.entries[i].text for i in transcript.live_range]
+    assert _texts(transcript)[-1] == "reply"
@@ -0,0 +1,114 @@
+"""Tests for multi-provider comparison."""
+
+import threading
+from unittest.mock import Mock
+
+from conftest import Clock
+
+from services.compare import ProviderRunStats, run_comparison, stream_with_stats
+from services.provider_manager import ProviderSettings
+
+
+def _chunks(*contents: str, completion_tokens: int | None = None) -> list[dict]:
+    """Build streamed chunks, with usage on the last one."""
+    chunks = [{"choices": [{"delta": {"content": content}}]} for content in contents]
+    if completion_tokens is not None:
+        chunks.append({"choices": [], "usage": {"completion_tokens": completion_tokens}})
+    return chunks
+
+
+def test_stream_with_stats_measures_timings() -> None:
+    """Test TTFT, latency and tokens per second."""
+    client = Mock()
+    client.chat_completion_stream.return_value = iter(_chunks("a", "b", completion_tokens=6))
+    settings = ProviderSettings(name="P", api_key="", model="m")
+
+    stats = stream_with_stats(client, settings, [], clock=Clock(step=1.0))
+
+    assert stats.text == "ab"
+    assert stats.ttft == 1.0
+    assert stats.total_latency == 2.0
+    assert stats.completion_tokens == 6
+    assert stats.tokens_per_second == 6.0
+    assert stats.error is None
+    assert "TTFT 1.00s" in stats.summary()
+    assert client.chat_completion_stream.call_args.kwargs["cached"] is False
+
+
+def test_stream_with_stats_reports_cache_hits() -> None:
+    """Test that a cached answer is not reported as the provider's timing."""
+    client = Mock()
+    client.chat_completion_stream.return_value = iter(
+        [{"choices": [{"delta": {"content": "cached answer"}}], "cache_hit": True}]
+    )
+    settings = ProviderSettings(name="P", api_key="")
+
+    stats = stream_with_stats(client, settings, [], clock=Clock(step=1.0))
+
+    assert stats.cache_hit is True
+    assert stats.ttft is None
+    assert stats.tokens_per_second is None
+    assert stats.summary() == "cached"
+
+
+def test_stream_with_stats_records_errors() -> None:
+    """Test that a failing provider is recorded instead of raising."""
+    client = Mock()
+    client.chat_completion_stream.side_effect = RuntimeError("down")
+    settings = ProviderSettings(name="P", api_key="")
+
+    stats = stream_with_stats(client, settings, [])
+
+    assert stats.error == "down"
+    assert stats.tokens_per_second is None
+    assert stats.summary().startswith("failed")
+
+
+def test_run_comparison_is_concurrent() -> None:
+    """Test that all providers are streamed at the same time."""
+    providers = [ProviderSettings(name=f"P{i}", api_key="") for i in range(3)]
+    barrier = threading.Barrier(3, timeout=5)
+
+    def stream(messages, **kwargs):
+        # Only passes if all three providers are running concurrently
+        barrier.wait()
+        yield from _chunks("x", "y")
+
+    client = Mock()
+    client.chat_completion_stream.side_effect = stream
+    deltas: list[tuple[int, str]] = []
+    done: list[int] = []
+
+    results = run_comparison(
+        [{"role": "user", "content": "hi"}],
+        providers,
+        lambda settings: client,
+        on_delta=lambda position, delta: deltas.append((position, delta)),
+        on_done=lambda position, stats: done.append(position),
+    )
+
+    assert [stats.provider for stats in results] == ["P0", "P1", "P2"]
+    assert all(stats.text == "xy" for stats in results)
+    assert sorted(done) == [0, 1, 2]
+    assert len(deltas) == 6
+
+
+def test_run_comparison_client_error() -> None:
+    """Test that a provider whose client cannot be created is reported."""
+    providers = [ProviderSettings(name="Broken", api_key="")]
+
+    def client_for(settings: ProviderSettings):
+        raise ValueError("no key")
+
+    results = run_comparison([], providers, client_for)
+
+    assert results == [
+        ProviderRunStats(
+            provider="Broken", model=providers[0].model, total_latency=0.0, error="no key"
+        )
+    ]
+
+
+def test_run_comparison_without_providers() -> None:
+    """Test that comparing no providers returns no results."""
+    assert run_comparison([], [], Mock()) == []
@@ -0,0 +1,82 @@
+"""Tests for the conversation store."""
+
+from pathlib import Path
+
+import pytest
+
+from services.conversation_store import ConversationStore
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> ConversationStore:
+    """Create a conversation store in a temporary directory."""
+    return ConversationStore(tmp_path / "conversations")
+
+
+def test_append_and_read(store: ConversationStore) -> None:
+    """Test appending records and reading them back."""
+    assert store.count("chat") == 0
+    assert store.read_all("chat") == []
+
+    for i in range(5):
+        assert store.append("chat", {"role": "user", "content": f"message {i}"}) == i
+
+    assert store.count("chat") == 5
+    assert store.read_all("chat")[2] == {"role": "user", "content": "message 2"}
+    assert [r["content"] for r in store.read_range("chat", 1, 3)] == ["message 1", "message 2"]
+
+    # A record can be built for the position it is stored at
+    assert store.append("chat", lambda seq: {"role": "user", "content": f"at {seq}"}) == 5
+    assert store.read_all("chat")[5]["content"] == "at 5"
+
+
+def test_tail_reads_only_latest(store: ConversationStore) -> None:
+    """Test reading the tail of a long conversation."""
+    for i in range(1000):
+        store.append("chat", {"role": "user", "content": f"message {i}"})
+
+    tail = store.tail("chat", 3)
+
+    assert [record["content"] for record in tail] == ["message 997", "message 998", "message 999"]
+    assert store.tail("chat", 5000)[0]["content"] == "message 0"
+
+
+def test_unicode_and_newlines(store: ConversationStore) -> None:
+    """Test that content with newlines and non-ASCII text round-trips."""
+    content = "línea 1\nlínea 2 — ✓"
+    store.append("chat", {"role": "assistant", "content": content})
+    store.append("chat", {"role": "user", "content": "next"})
+
+    assert store.read_range("chat", 0, 1) == [{"role": "assistant", "content": content}]
+
+
+def test_unindexed_partial_record_is_ignored(store: ConversationStore) -> None:
+    """Test that a log write without an index entry does not corrupt reads."""
+    store.append("chat", {"role": "user", "content": "one"})
+    log_path = store.root / "chat.log"
+    with open(log_path, "ab") as log:
+        log.write(b'{"role":"user","con')
+
+    store.append("chat", {"role": "user", "content": "two"})
+
+    assert store.count("chat") == 2
+    assert store.read_all("chat")[0]["content"] == "one"
+
+
+def test_conversations_are_separate(store: ConversationStore) -> None:
+    """Test that conversation ids map to separate, safe file names."""
+    store.append("a/../b", {"role": "user", "content": "x"})
+    store.append("other", {"role": "user", "content": "y"})
+
+    assert store.count("a/../b") == 1
+    assert store.count("other") == 1
+    assert all(path.parent == store.root for path in store.root.iterdir())
+
+
+def test_delete(store: ConversationStore) -> None:
+    """Test deleting a conversation."""
+    store.append("chat", {"role": "user", "content": "x"})
+
+    assert store.delete("chat") is True
+    assert store.count("chat") == 0
+    assert store.delete("chat") is False
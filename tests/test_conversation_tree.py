@@ -0,0 +1,100 @@
+"""Tests for the branching conversation history."""
+
+from unittest.mock import patch
+
+from services.conversation_store import ConversationStore
+from services.conversation_tree import ConversationTree, StoredPath
+from services.message import Message
+
+
+def _tree() -> ConversationTree:
+    """Build a tree with a regenerated answer and an edited question."""
+    tree = ConversationTree()
+    question = tree.add(Message("user", "q1"))
+    tree.add(Message("assistant", "a1"))
+    # Regenerate the answer
+    tree.head = question
+    tree.add(Message("assistant", "a1 again"))
+    tree.add(Message("user", "q2"))
+    # Edit the first question
+    tree.head = None
+    tree.add(Message("user", "q1 edited"))
+    tree.add(Message("assistant", "a3"))
+    return tree
+
+
+def test_branches_share_their_prefix() -> None:
+    """Test that alternatives reuse the messages before them."""
+    tree = ConversationTree()
+    question = tree.add(Message("user", "q"))
+    first = tree.add(Message("assistant", "a"))
+    tree.head = question
+    second = tree.add(Message("assistant", "b"))
+
+    assert tree.messages(first)[0] is tree.messages(second)[0]
+    assert [m.content for m in tree.messages()] == ["q", "b"]
+    assert tree.siblings(second) == [first, second]
+    assert tree.branch_point() is second
+    assert len(tree.nodes) == 3
+
+
+def test_leaf_and_common_prefix() -> None:
+    """Test finding branch ends and shared prefixes."""
+    tree = _tree()
+    q1, a1, a1_again, q2, q1_edited, a3 = tree.nodes
+
+    assert tree.leaf(q1) is q2
+    assert tree.leaf(q1_edited) is a3
+    assert tree.common_prefix(a1, q2) == 1
+    assert tree.common_prefix(q2, a1_again) == 2
+    assert tree.common_prefix(a3, q2) == 0
+    assert tree.common_prefix(None, a3) == 0
+    assert tree.siblings(q1) == [q1, q1_edited]
+
+
+def test_records_round_trip() -> None:
+    """Test that stored records rebuild the same branches."""
+    tree = _tree()
+    records = [tree.to_record(node) for node in tree.nodes]
+
+    # Linear appends store no links
+    assert "parent" not in records[1]
+    assert records[2]["parent"] == 0
+    assert records[2]["depth"] == 1
+    assert records[4]["parent"] is None
+
+    rebuilt = ConversationTree.from_records(records)
+    assert rebuilt.head is rebuilt.nodes[-1]
+    assert [m.content for m in rebuilt.messages()] == ["q1 edited", "a3"]
+    assert [m.content for m in rebuilt.messages(rebuilt.nodes[3])] == ["q1", "a1 again", "q2"]
+
+
+def test_stored_path_reads_current_branch(tmp_path) -> None:
+    """Test reading the head branch of a stored tree."""
+    store = ConversationStore(tmp_path)
+    tree = _tree()
+    tree.head = tree.nodes[3]
+    tree.add(Message("assistant", "a2"))
+    for node in tree.nodes:
+        store.append("chat", tree.to_record(node))
+
+    path = StoredPath(store, "chat")
+    assert path.length == 4
+    assert [r["content"] for r in path.read(2, 4)] == ["q2", "a2"]
+    assert [r["content"] for r in path.read(0, 2)] == ["q1", "a1 again"]
+
+
+def test_stored_path_reads_only_the_tail(tmp_path) -> None:
+    """Test that resuming a long linear history does not read all of it."""
+    store = ConversationStore(tmp_path)
+    for i in range(1000):
+        store.append("chat", {"role": "user", "content": f"m{i}"})
+
+    with patch.object(store, "read_range", wraps=store.read_range) as read_range:
+        path = StoredPath(store, "chat")
+        records = path.read(980, 1000)
+
+    assert path.length == 1000
+    assert [r["content"] for r in records] == [f"m{i}" for i in range(980, 1000)]
+    read = sum(call.args[2] - call.args[1] for call in read_range.call_args_list)
+    assert read <= 21
@@ -0,0 +1,178 @@
+"""Tests for the local document store."""
+
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import flet as ft
+import pytest
+
+from screens.chat_screen import ChatScreen
+from services.document_store import DocumentChunk, DocumentStore, chunk_text
+
+TOPICS = ["volcano", "lava", "glacier", "ice", "tax", "invoice"]
+
+
+def embed_many(texts: list[str]) -> list[list[float]]:
+    """Embed texts as topic word counts."""
+    return [[float(text.lower().count(topic)) + 0.01 for topic in TOPICS] for text in texts]
+
+
+def test_chunk_text_breaks_at_paragraphs_with_overlap() -> None:
+    """Test that chunks stay within the size and prefer paragraph breaks."""
+    text = "\n\n".join(f"Paragraph {i}. " + "word " * 30 for i in range(10))
+
+    chunks = chunk_text(text, size=400, overlap=50)
+
+    assert all(len(chunk) <= 400 for chunk in chunks)
+    assert chunks[0].startswith("Paragraph 0.")
+    assert chunks[0].endswith("word")
+    assert "Paragraph 9." in chunks[-1]
+    assert chunk_text("   ") == []
+
+
+def test_search_returns_top_chunks(numpy: None, tmp_path: Path) -> None:
+    """Test that searches return the most similar chunks with their sources."""
+    store = DocumentStore(embed_many, tmp_path, chunk_size=60, overlap=0, batch_size=2)
+    added = store.add_text(
+        "The volcano erupted and lava flowed. " * 2 + "Glacier ice melts slowly. " * 2,
+        "nature.txt",
+    )
+    store.add_text("Send the invoice before the tax deadline.", "office.txt")
+
+    hits = store.search("where does lava come from, a volcano?", k=2)
+
+    assert added >= 2
+    assert [hit.source for hit in hits] == ["nature.txt", "nature.txt"]
+    assert "lava" in hits[0].text
+    assert hits[0].score >= hits[1].score
+    assert store.search("tax invoice", k=1)[0].source == "office.txt"
+    assert store.documents() == ["nature.txt", "office.txt"]
+
+
+def test_store_persists_and_skips_duplicates(numpy: None, tmp_path: Path) -> None:
+    """Test that documents survive reopening and are added only once."""
+    file = tmp_path / "notes.md"
+    file.write_text("Glacier ice and more ice.", encoding="utf-8")
+    store = DocumentStore(embed_many, tmp_path / "docs")
+    assert store.add_file(file) == 1
+    assert store.add_file(file) == 0
+
+    reopened = DocumentStore(embed_many, tmp_path / "docs")
+    assert len(reopened) == 1
+    assert reopened.search("ice")[0].text == "Glacier ice and more ice."
+
+
+def test_failed_document_leaves_store_unchanged(numpy: None, tmp_path: Path) -> None:
+    """Test that a document failing halfway is rolled back."""
+    store = DocumentStore(embed_many, tmp_path, chunk_size=40, overlap=0, batch_size=1)
+    store.add_text("Lava and a volcano.", "first.txt")
+    failing = Mock(side_effect=[embed_many(["x"]), RuntimeError("upstream down")])
+    store.embed_many = failing
+
+    with pytest.raises(RuntimeError):
+        store.add_text("Tax invoice due. " * 5, "second.txt")
+
+    store.embed_many = embed_many
+    assert len(store) == 1
+    assert (tmp_path / "vectors.f32").stat().st_size == len(TOPICS) * 4
+    store.add_text("Glacier ice.", "third.txt")
+    assert [hit.source for hit in store.search("glacier ice", k=5)] == [
+        "third.txt",
+        "first.txt",
+    ]
+
+
+def test_documents_are_searched_per_owner(numpy: None, tmp_path: Path) -> None:
+    """Test that an owner's searches only see the documents added for it."""
+    store = DocumentStore(embed_many, tmp_path, chunk_size=40, overlap=0)
+    store.add_text("Lava from a volcano.", "alice.txt", owner="alice")
+    store.add_text("Glacier ice.", "bob.txt", owner="bob")
+    store.add_text("More lava and volcano ash.", "alice-2.txt", owner="alice")
+    # The same content is stored again for another owner
+    assert store.add_text("Lava from a volcano.", "bob-lava.txt", owner="bob") == 1
+    assert store.add_text("Lava from a volcano.", "again.txt", owner="alice") == 0
+
+    assert store.documents(owner="alice") == ["alice.txt", "alice-2.txt"]
+    # Bob's glacier is the best match overall, but not Alice's to see
+    assert {hit.source for hit in store.search("glacier ice", k=5, owner="alice")} == {
+        "alice.txt",
+        "alice-2.txt",
+    }
+    assert {hit.source for hit in store.search("lava", k=5, owner="bob")} == {
+        "bob.txt",
+        "bob-lava.txt",
+    }
+    assert store.search("lava", owner="carol") == []
+    assert len(store.search("lava", k=10)) == 4
+
+
+def test_chat_screen_grounds_replies_on_documents() -> None:
+    """Test that retrieved passages are sent ahead of the conversation."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    documents = Mock()
+    documents.documents.return_value = ["nature.txt"]
+    documents.search.return_value = [DocumentChunk("nature.txt", 0, "Lava is molten rock.", 0.9)]
+    chat_screen = ChatScreen(page, documents=documents)
+    chat_screen.mistral_api.chat_completion_stream = Mock(return_value=iter([]))
+    chat_screen.build()
+
+    chat_screen.send_message("What is lava?", Mock(spec=ft.TextField))
+
+    messages = chat_screen.mistral_api.chat_completion_stream.call_args.args[0]
+    assert messages[0].role == "system"
+    assert "[1] nature.txt (part 1)\nLava is molten rock." in messages[0].content
+    assert messages[1].content == "What is lava?"
+    documents.search.assert_called_once_with(
+        "What is lava?", k=4, owner=chat_screen.conversation_id
+    )
+    # Passages are not stored in the conversation
+    assert [message.role for message in chat_screen.messages] == ["user"]
+    assert chat_screen.documents_label.value == "1 document"
+
+
+class FakePicker:
+    """File picker in a browser: files have no path and must be uploaded."""
+
+    def __init__(self, on_upload=None) -> None:
+        self.on_upload = on_upload
+        self.uploads: list[ft.FilePickerUploadFile] = []
+        FakePicker.last = self
+
+    async def pick_files(self, **kwargs) -> list[ft.FilePickerFile]:
+        return [ft.FilePickerFile(id=7, name="notes.txt", size=12)]
+
+    async def upload(self, files: list[ft.FilePickerUploadFile]) -> None:
+        self.uploads.extend(files)
+
+
+def test_web_documents_are_uploaded_then_added(monkeypatch, tmp_path: Path) -> None:
+    """Test that browser files are uploaded, added for the chat and removed."""
+    monkeypatch.setenv("FLET_CHAT_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(ft, "FilePicker", FakePicker)
+    page = Mock(spec=ft.Page)
+    page.web = True
+    page.get_upload_url.side_effect = lambda name, expires: f"https://app/upload/{name}"
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    documents = Mock()
+    documents.documents.return_value = ["notes.txt"]
+    chat_screen = ChatScreen(page, documents=documents, conversation_id="session-1")
+    chat_screen.build()
+
+    asyncio.run(chat_screen.pick_documents(Mock()))
+
+    picker = FakePicker.last
+    assert picker.uploads[0].id == 7
+    name = page.get_upload_url.call_args.args[0]
+    assert name.endswith("/notes.txt")
+    uploaded = tmp_path / "uploads" / name
+    uploaded.parent.mkdir(parents=True)
+    uploaded.write_text("Glacier ice.", encoding="utf-8")
+
+    picker.on_upload(SimpleNamespace(file_name="notes.txt", progress=1.0, error=None))
+
+    documents.add_file.assert_called_once_with(str(uploaded), owner="session-1")
+    assert not uploaded.exists()
+    assert chat_screen.documents_label.value == "1 document"
@@ -0,0 +1,139 @@
+"""Tests for embedding batching and caching."""
+
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from services.embeddings import EmbeddingBatcher
+from services.mistral_api import MistralAPI
+from services.shared_state import SharedCache
+
+
+class FakeEmbedder:
+    """Batch embedding function recording its batches."""
+
+    def __init__(self, error: Exception | None = None) -> None:
+        self.batches: list[list[str]] = []
+        self.error = error
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        self.batches.append(texts)
+        if self.error is not None:
+            raise self.error
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_concurrent_calls_share_a_batch() -> None:
+    """Test that texts embedded from many threads go out in one request."""
+    embedder = FakeEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_wait=0.2)
+    barrier = threading.Barrier(8)
+    results: dict[int, list[float]] = {}
+
+    def run(i: int) -> None:
+        barrier.wait()
+        results[i] = batcher.embed("x" * i, timeout=5)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(embedder.batches) == 1
+    assert sorted(embedder.batches[0]) == sorted("x" * i for i in range(8))
+    assert results[3] == [3.0, 1.0]
+    batcher.close()
+
+
+def test_batches_respect_max_batch() -> None:
+    """Test that a long queue is split into requests of at most max_batch."""
+    embedder = FakeEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch=3, max_wait=0.2)
+
+    vectors = batcher.embed_many([f"text {i}" for i in range(7)], timeout=5)
+
+    assert len(vectors) == 7
+    assert [len(batch) for batch in embedder.batches] == [3, 3, 1]
+    batcher.close()
+
+
+def test_duplicates_and_repeats_are_not_sent_again() -> None:
+    """Test that identical texts share a request and later calls hit the cache."""
+    embedder = FakeEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_wait=0.05)
+
+    first = batcher.embed_many(["same", "same", "other"], timeout=5)
+    again = batcher.embed("same", timeout=5)
+
+    assert embedder.batches == [["same", "other"]]
+    assert first[0] == first[1] == again
+    stats = batcher.stats()
+    assert stats["deduplicated"] == 1
+    assert stats["cache_hits"] == 1
+    assert stats["sent"] == 2
+    batcher.close()
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    """Test that the memory cache keeps at most cache_size vectors."""
+    embedder = FakeEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_wait=0, cache_size=2)
+    for text in ("a", "b", "a", "c", "a"):
+        batcher.embed(text, timeout=5)
+
+    assert [batch[0] for batch in embedder.batches] == ["a", "b", "c"]
+    batcher.embed("b", timeout=5)
+    assert len(embedder.batches) == 4
+    batcher.close()
+
+
+def test_failed_batch_fails_every_caller() -> None:
+    """Test that an upstream error reaches all callers and is not cached."""
+    embedder = FakeEmbedder(RuntimeError("upstream down"))
+    batcher = EmbeddingBatcher(embedder, max_wait=0.05)
+    futures = [batcher.submit(text) for text in ("a", "b")]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="upstream down"):
+            future.result(5)
+    embedder.error = None
+    assert batcher.embed("a", timeout=5) == [1.0, 1.0]
+    assert len(embedder.batches) == 2
+    batcher.close()
+
+
+def test_shared_cache_serves_other_workers() -> None:
+    """Test that vectors fetched by one worker are reused by another."""
+    cache = SharedCache(":memory:")
+    first = EmbeddingBatcher(FakeEmbedder(), max_wait=0, shared_cache=cache)
+    first.embed("hello", timeout=5)
+    embedder = FakeEmbedder()
+    second = EmbeddingBatcher(embedder, max_wait=0, shared_cache=cache)
+
+    assert second.embed("hello", timeout=5) == [5.0, 1.0]
+    assert embedder.batches == []
+    first.close()
+    second.close()
+
+
+def test_mistral_api_embed_batches_requests() -> None:
+    """Test that MistralAPI.embed sends batched, ordered embedding requests."""
+    api = MistralAPI("test-key", cassette=None)
+    api.client = Mock()
+
+    def create(model, inputs, timeout_ms):
+        response = Mock()
+        data = [{"index": i, "embedding": [float(i)]} for i in range(len(inputs))]
+        response.model_dump.return_value = {"data": list(reversed(data))}
+        return response
+
+    api.client.embeddings.create.side_effect = create
+
+    assert api.embeddings(["a", "b", "c"]) == [[0.0], [1.0], [2.0]]
+    assert api.embed("a", timeout=5) == [0.0]
+    assert api.embed("a", timeout=5) == [0.0]
+    assert api.client.embeddings.create.call_count == 2
+    assert api.client.embeddings.create.call_args.kwargs["model"] == "mistral-embed"
+    api.embedder.close()
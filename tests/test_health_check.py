@@ -0,0 +1,166 @@
+"""Tests for provider health checks."""
+
+import socket
+import threading
+from unittest.mock import Mock
+
+from conftest import Clock
+
+from services.health_check import measure_connect, probe_all, probe_provider
+from services.provider_manager import ProviderSettings
+from services.request_scheduler import RequestScheduler
+
+
+def _client(models: int = 2) -> Mock:
+    """Create an API stub answering every probe stage."""
+    client = Mock()
+    client.list_models.return_value = {"data": [{"id": f"m{i}"} for i in range(models)]}
+
+    def stream(messages, **kwargs):
+        yield {"choices": [{"delta": {"content": "p"}}]}
+        yield {"choices": [{"delta": {"content": "ong"}}]}
+
+    client.chat_completion_stream.side_effect = stream
+    return client
+
+
+def test_probe_provider_success() -> None:
+    """Test that every stage is measured."""
+    settings = ProviderSettings(name="P", api_key="", request_timeout=3)
+    client = _client()
+
+    result = probe_provider(settings, client, connect=lambda url, timeout: 0.01)
+
+    assert result.ok
+    assert result.connect_time == 0.01
+    assert result.models_latency is not None
+    assert result.ttft is not None
+    assert result.model_count == 2
+    kwargs = client.chat_completion_stream.call_args.kwargs
+    assert kwargs["max_tokens"] == 1
+    assert kwargs["timeout"] == 3
+    assert kwargs["cached"] is False
+    assert client.list_models.call_args.kwargs["cached"] is False
+
+
+def test_probe_ttft_waits_for_first_token() -> None:
+    """Test that chunks without text do not count as the first token."""
+    settings = ProviderSettings(name="P", api_key="")
+    client = _client()
+
+    def stream(messages, **kwargs):
+        yield {"choices": [{"delta": {"role": "assistant", "content": ""}}]}
+        clock.now += 0.5
+        yield {"choices": [{"delta": {"content": "pong"}}]}
+
+    client.chat_completion_stream.side_effect = stream
+    clock = Clock()
+
+    result = probe_provider(settings, client, connect=lambda url, timeout: 0.01, clock=clock)
+
+    assert result.ttft == 0.5
+
+
+def test_probe_provider_stops_at_first_failure() -> None:
+    """Test that a failing stage is recorded and later stages skipped."""
+    settings = ProviderSettings(name="P", api_key="")
+    client = _client()
+    client.list_models.side_effect = RuntimeError("unauthorized")
+
+    result = probe_provider(settings, client, connect=lambda url, timeout: 0.01)
+
+    assert not result.ok
+    assert result.error == "unauthorized"
+    assert result.ttft is None
+    client.chat_completion_stream.assert_not_called()
+
+
+def test_probe_all_bounded_concurrency() -> None:
+    """Test that probes run concurrently but never above the pool size."""
+    providers = [ProviderSettings(name=f"P{i}", api_key="") for i in range(10)]
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def slow_models(**kwargs):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        threading.Event().wait(0.05)
+        with lock:
+            running -= 1
+        return {"data": []}
+
+    client = _client()
+    client.list_models.side_effect = slow_models
+    seen: list[int] = []
+
+    results = probe_all(
+        providers,
+        lambda settings: client,
+        max_workers=3,
+        on_result=lambda position, result: seen.append(position),
+        connect=lambda url, timeout: 0.0,
+    )
+
+    assert [result.provider for result in results] == [f"P{i}" for i in range(10)]
+    assert all(result.ok for result in results)
+    assert sorted(seen) == list(range(10))
+    assert 1 < peak <= 3
+
+
+def test_probes_of_different_providers_share_no_session_limit() -> None:
+    """Test that more probes run at once than one session is allowed."""
+    scheduler = RequestScheduler(max_concurrent=8, per_session=2, reserved_interactive=0)
+    providers = [ProviderSettings(name=f"P{i}", api_key="") for i in range(6)]
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def scheduled_models(session, priority, **kwargs):
+        nonlocal running, peak
+        with scheduler.slot(session, priority, timeout=5):
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            threading.Event().wait(0.05)
+            with lock:
+                running -= 1
+        return {"data": []}
+
+    client = _client()
+    client.list_models.side_effect = scheduled_models
+
+    results = probe_all(
+        providers, lambda settings: client, max_workers=6, connect=lambda url, timeout: 0.0
+    )
+
+    assert all(result.ok for result in results)
+    assert peak > 2
+    sessions = {call.kwargs["session"] for call in client.list_models.call_args_list}
+    assert sessions == {f"health-check:P{i}" for i in range(6)}
+
+
+def test_probe_all_client_error() -> None:
+    """Test that a provider without a usable client is reported."""
+    providers = [ProviderSettings(name="Broken", api_key="")]
+
+    def client_for(settings: ProviderSettings):
+        raise ValueError("no key")
+
+    results = probe_all(providers, client_for)
+
+    assert results[0].error == "no key"
+
+
+def test_measure_connect_local_server() -> None:
+    """Test measuring the connect time to a local listening socket."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    try:
+        port = server.getsockname()[1]
+        assert measure_connect(f"http://127.0.0.1:{port}/v1/", timeout=2) >= 0
+    finally:
+        server.close()
@@ -0,0 +1,122 @@
+"""Tests for incremental JSON parsing of streamed answers."""
+
+import json
+import re
+from unittest.mock import Mock
+
+import pytest
+from conftest import FakeStream
+
+from services.json_stream import JsonStreamError, JsonStreamParser
+from services.mistral_api import MistralAPI
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "year": {"type": "integer"},
+        "tags": {"type": "array", "items": {"enum": ["drama", "comedy"]}},
+    },
+    "required": ["title", "year"],
+    "additionalProperties": False,
+}
+
+
+def _feed(parser: JsonStreamParser, text: str, size: int) -> list:
+    """Feed text in pieces of a fixed size and collect the completed values."""
+    fields = []
+    for start in range(0, len(text), size):
+        fields.extend(parser.feed(text[start : start + size]))
+    return fields
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_parser_matches_json_loads(size: int) -> None:
+    """Test that any split of the text gives the same document."""
+    document = {
+        "text": 'quote " backslash \\ unicode é ☃',
+        "numbers": [0, -1, 2.5, 1e-3, 12345678901234567890],
+        "nested": {"empty": {}, "list": [[], [None, True, False]]},
+    }
+    text = json.dumps(document, indent=2)
+    parser = JsonStreamParser()
+
+    fields = _feed(parser, text, size)
+
+    assert parser.close() == document
+    assert fields[-1].path == ()
+    assert ("numbers", 2) in [field.path for field in fields]
+
+
+def test_fields_are_emitted_as_they_complete() -> None:
+    """Test that values are reported before the document is finished."""
+    parser = JsonStreamParser(SCHEMA)
+
+    assert parser.feed('{"title": "Metrop') == []
+    fields = parser.feed('olis", "year": 1927, "tags": ["dra')
+
+    assert [(field.path, field.value) for field in fields] == [
+        (("title",), "Metropolis"),
+        (("year",), 1927),
+    ]
+    assert parser.value == {"title": "Metropolis", "year": 1927, "tags": []}
+    assert not parser.done
+    assert [field.path for field in parser.feed('ma"]}')] == [("tags", 0), ("tags",), ()]
+    assert parser.done
+
+
+@pytest.mark.parametrize(
+    ("text", "message"),
+    [
+        ('{"title": 5,', "$.title should be string"),
+        ('{"year": 1927.5,', "$.year should be integer"),
+        ('{"tags": ["horror"', "$.tags[0] should be one of"),
+        ('{"rating": ', "Unexpected key 'rating'"),
+        ('{"title": "M"}', "$ is missing year"),
+        ('{"title" "M"}', "Expected ':'"),
+        ('{"title": "M",}', "Expected a key"),
+    ],
+)
+def test_invalid_answers_fail_early(text: str, message: str) -> None:
+    """Test that errors are raised as soon as the offending value arrives."""
+    parser = JsonStreamParser(SCHEMA)
+
+    with pytest.raises(JsonStreamError, match=re.escape(message)):
+        parser.feed(text)
+
+
+def test_truncated_document_fails_on_close() -> None:
+    """Test that an answer cut off early is reported."""
+    parser = JsonStreamParser()
+    parser.feed('{"title": "Metropolis"')
+
+    with pytest.raises(JsonStreamError, match="Incomplete"):
+        parser.close()
+
+
+def test_json_stream_requests_schema_and_yields_fields() -> None:
+    """Test that the schema is sent and fields are yielded while streaming."""
+    api = MistralAPI("test-key", cassette=None)
+    api.client = Mock()
+    api.client.chat.stream.return_value = FakeStream(
+        ['{"title": "Metropolis", ', '"year": 19', '27, "tags": []}']
+    )
+
+    fields = list(api.chat_completion_json_stream([{"role": "user", "content": "Film?"}], SCHEMA))
+
+    request = api.client.chat.stream.call_args.kwargs
+    assert request["response_format"]["type"] == "json_schema"
+    assert request["response_format"]["json_schema"]["schema"] == SCHEMA
+    assert [field.path for field in fields] == [("title",), ("year",), ("tags",), ()]
+    assert fields[-1].value == {"title": "Metropolis", "year": 1927, "tags": []}
+
+
+def test_json_stream_without_schema_asks_for_json_object() -> None:
+    """Test JSON mode without a schema and the error on a cut off answer."""
+    api = MistralAPI("test-key", cassette=None)
+    api.client = Mock()
+    api.client.chat.stream.return_value = FakeStream(['{"answer": [1, 2'])
+
+    with pytest.raises(JsonStreamError):
+        list(api.chat_completion_json_stream([{"role": "user", "content": "Numbers?"}]))
+    assert api.client.chat.stream.call_args.kwargs["response_format"] == {"type": "json_object"}
@@ -0,0 +1,116 @@
+"""Tests for the logging pipeline."""
+
+import json
+import logging
+import threading
+
+from services.logging_pipeline import (
+    JsonFormatter,
+    RedactingFilter,
+    SamplingFilter,
+    configure_logging,
+    register_secrets,
+    shutdown_logging,
+)
+
+
+def _record(name: str = "app", level: int = logging.INFO, msg: str = "hi", args=None):
+    """Create a log record."""
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_sampling_keeps_share_and_all_warnings() -> None:
+    """Test deterministic per-logger sampling."""
+    sampler = SamplingFilter({"noisy": 0.25})
+
+    kept = sum(sampler.filter(_record("noisy.child")) for _ in range(100))
+    assert kept == 25
+    assert all(sampler.filter(_record("noisy", logging.WARNING)) for _ in range(10))
+    assert all(sampler.filter(_record("quiet")) for _ in range(10))
+
+
+def test_redaction_and_truncation() -> None:
+    """Test that secrets are masked and long messages cut."""
+    redactor = RedactingFilter(secrets=["sk-literal-secret"], max_length=40)
+
+    assert redactor.redact("key sk-literal-secret used") == "key *** used"
+    assert redactor.redact("api_key='abcdef123456'") == "api_key='***'"
+    assert redactor.redact("Authorization: Bearer abcdefgh12345") == "Authorization: Bearer ***"
+    long = redactor.redact("x" * 100)
+    assert long.startswith("x" * 40)
+    assert long.endswith("[60 chars truncated]")
+
+    # Running the filter again for a second handler changes nothing
+    record = _record(msg="%s", args=("y" * 100,))
+    redactor.filter(record)
+    redactor.filter(record)
+    assert record.getMessage() == "y" * 40 + "… [60 chars truncated]"
+
+
+def test_redaction_keeps_token_counts() -> None:
+    """Test that only credential names mark a value as secret."""
+    redactor = RedactingFilter()
+
+    assert redactor.redact("max_tokens=1024 prompt_tokens=20000000") == (
+        "max_tokens=1024 prompt_tokens=20000000"
+    )
+    assert redactor.redact("tokens=12345678") == "tokens=12345678"
+    assert redactor.redact("MISTRAL_API_KEY=abcdef123456") == "MISTRAL_API_KEY=***"
+    assert redactor.redact("access_token: abcdef123456") == "access_token: ***"
+    assert redactor.redact("password=hunter2hunter2") == "password=***"
+
+
+def test_registered_secrets_are_masked(tmp_path, restore_root_logger) -> None:
+    """Test that secrets registered after configuration are masked too."""
+    log_file = tmp_path / "app.log"
+    configure_logging(log_file=log_file)
+    register_secrets(["late-provider-key"])
+    logging.getLogger("tests.pipeline").info("using late-provider-key")
+    shutdown_logging()
+
+    assert json.loads(log_file.read_text().splitlines()[-1])["message"] == "using ***"
+
+
+def test_json_formatter_includes_extra_fields() -> None:
+    """Test structured JSON output."""
+    record = _record(msg="sent %d chars", args=(5,))
+    record.session = "chat"
+
+    data = json.loads(JsonFormatter().format(record))
+
+    assert data["message"] == "sent 5 chars"
+    assert data["level"] == "INFO"
+    assert data["logger"] == "app"
+    assert data["session"] == "chat"
+
+
+def test_pipeline_formats_off_thread_and_rotates(tmp_path, restore_root_logger) -> None:
+    """Test that records are formatted by the listener and the file rotates."""
+    formatted_on: list[str] = []
+
+    class Payload:
+        def __str__(self) -> str:
+            formatted_on.append(threading.current_thread().name)
+            return "payload"
+
+    log_file = tmp_path / "logs" / "app.log"
+    configure_logging(
+        level="DEBUG",
+        log_file=log_file,
+        max_bytes=4000,
+        backup_count=9,
+        secrets=["topsecret"],
+    )
+    test_logger = logging.getLogger("tests.pipeline")
+    test_logger.info("first %s", Payload(), extra={"session": "s1"})
+    for i in range(100):
+        test_logger.debug("message %d with topsecret", i)
+    shutdown_logging()
+
+    assert formatted_on
+    assert threading.current_thread().name not in formatted_on
+    first = json.loads(sorted(tmp_path.glob("logs/app.log.*"))[-1].read_text().splitlines()[0])
+    assert first["message"] == "first payload"
+    assert first["session"] == "s1"
+    assert len(list(tmp_path.glob("logs/app.log*"))) >= 3
+    assert "topsecret" not in log_file.read_text()
@@ -0,0 +1,165 @@
+"""Tests for map-reduce over long inputs."""
+
+import threading
+import time
+from unittest.mock import Mock
+
+import flet as ft
+import pytest
+from conftest import StalledStream
+
+from screens import chat_screen as chat_screen_module
+from screens.chat_screen import ChatScreen
+from services.map_reduce import FINAL_GOAL, group_notes, map_reduce
+from services.mistral_api import MistralAPI
+
+
+def _stream_chunks(text: str) -> list[dict]:
+    """Build streamed chunks for a text, one per word."""
+    words = text.split(" ")
+    deltas = [words[0]] + [" " + word for word in words[1:]]
+    return [{"choices": [{"delta": {"content": delta}}]} for delta in deltas]
+
+
+class FakeClient:
+    """Client answering parts and merges with a short note."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.prompts: list[str] = []
+        self.requests: list[dict] = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def chat_completion_stream(self, messages, **kwargs):
+        prompt = messages[0].content
+        with self._lock:
+            self.prompts.append(prompt)
+            self.requests.append(kwargs)
+        if FINAL_GOAL in prompt:
+            yield from _stream_chunks("The final answer")
+            yield {"usage": {"prompt_tokens": 10, "completion_tokens": 3}}
+            return
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        yield from _stream_chunks(("note " * 50).strip())
+        yield {"usage": {"prompt_tokens": 100, "completion_tokens": 50}}
+
+
+def test_group_notes_fits_budget() -> None:
+    """Test that notes are packed in order with at least two per group."""
+    notes = ["a" * 40, "b" * 40, "c" * 40, "d" * 40, "e" * 40]
+
+    groups = group_notes(notes, max_tokens=25)
+
+    assert [note for group in groups for note in group] == notes
+    assert all(len(group) >= 2 for group in groups)
+    assert len(groups) == 2
+    assert group_notes(["x" * 400, "y" * 400], max_tokens=10) == [["x" * 400, "y" * 400]]
+
+
+def test_map_reduce_processes_parts_concurrently() -> None:
+    """Test that parts are mapped in parallel, merged, and the answer streamed."""
+    client = FakeClient(delay=0.05)
+    progress = []
+    deltas = []
+    text = "\n\n".join(f"Section {i}. " + "word " * 200 for i in range(8))
+
+    result = map_reduce(
+        client,
+        "Summarize.",
+        text,
+        max_chunk_tokens=300,
+        max_workers=4,
+        on_progress=progress.append,
+        on_delta=deltas.append,
+    )
+
+    assert result.text == "The final answer"
+    assert "".join(deltas) == result.text
+    assert result.parts == 8
+    assert result.levels > 1
+    assert result.requests == len(client.prompts)
+    assert result.completion_tokens == (result.requests - 1) * 50 + 3
+    assert 1 < client.peak <= 4
+    assert "part 1 of 8" in client.prompts[0]
+    assert progress[0].stage == "map"
+    assert "combine" in {p.stage for p in progress}
+    assert progress[-1].stage == "reduce"
+
+
+def test_cancelled_run_sends_no_further_requests() -> None:
+    """Test that a cancelled run stops before the final answer."""
+    client = FakeClient()
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    result = map_reduce(
+        client, "Summarize.", "word " * 5000, max_chunk_tokens=300, cancel_event=cancel_event
+    )
+
+    assert result.text == ""
+    assert client.prompts == []
+
+
+def test_chat_screen_uses_map_reduce_for_long_messages(monkeypatch) -> None:
+    """Test that an oversized message is answered through map-reduce."""
+    monkeypatch.setattr(chat_screen_module, "MAP_REDUCE_TOKENS", 100)
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    chat_screen = ChatScreen(page)
+    client = FakeClient()
+    chat_screen.mistral_api.chat_completion_stream = Mock(side_effect=client.chat_completion_stream)
+    chat_screen.build()
+
+    chat_screen.send_message("Please summarize this. " + "word " * 2000, Mock(spec=ft.TextField))
+
+    assert len(client.prompts) > 1
+    assert chat_screen.messages[-1].role == "assistant"
+    assert chat_screen.messages[-1].content == "The final answer"
+    # Every request is bounded by the provider's timeout
+    timeouts = {request["timeout"] for request in client.requests}
+    assert timeouts == {chat_screen.settings.request_timeout}
+    # Only the notes are sent in the final request, not the whole message
+    final_messages = chat_screen.mistral_api.chat_completion_stream.call_args.args[0]
+    assert len(final_messages[0].content) < 2000
+
+
+def _stalled_api() -> MistralAPI:
+    """Create a client whose upstream accepts requests and then sends nothing."""
+    api = MistralAPI("test-key", cassette=None)
+    api.client = Mock()
+    api.client.chat.stream.side_effect = lambda **kwargs: StalledStream([])
+    return api
+
+
+def test_stop_ends_requests_in_flight() -> None:
+    """Test that stopping a run interrupts map requests already waiting for data."""
+    api = _stalled_api()
+    cancel_event = threading.Event()
+    threading.Timer(0.2, cancel_event.set).start()
+
+    start = time.monotonic()
+    result = map_reduce(
+        api, "Summarize.", "word " * 5000, max_chunk_tokens=300, cancel_event=cancel_event
+    )
+
+    assert result.text == ""
+    assert time.monotonic() - start < 5
+    assert api.client.chat.stream.call_count == 4
+
+
+def test_stalled_run_times_out() -> None:
+    """Test that a map request sending nothing fails at the timeout."""
+    api = _stalled_api()
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        map_reduce(api, "Summarize.", "word " * 5000, max_chunk_tokens=300, timeout=0.2)
+
+    assert time.monotonic() - start < 5
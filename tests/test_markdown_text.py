@@ -0,0 +1,82 @@
+"""Tests for incremental Markdown rendering."""
+
+import flet as ft
+
+from screens.markdown_text import CODE_THEME, MarkdownCache, MarkdownText, split_blocks
+from screens.segmented_text import SegmentedText
+
+REPLY = "Intro paragraph.\n\n```python\nprint('hi')\n```\n\n- one\n- two\n"
+
+
+def test_split_blocks() -> None:
+    """Test splitting into paragraphs and fenced code."""
+    blocks = split_blocks(REPLY)
+
+    assert [block.text for block in blocks] == [
+        "Intro paragraph.",
+        "```python\nprint('hi')\n```",
+        "- one\n- two",
+    ]
+    assert [block.complete for block in blocks] == [True, True, False]
+    assert blocks[1].code is True
+    assert blocks[1].language == "python"
+
+
+def test_blank_lines_inside_code_do_not_split() -> None:
+    """Test that code blocks keep their blank lines."""
+    blocks = split_blocks("```\na\n\nb\n")
+
+    assert len(blocks) == 1
+    assert blocks[0].code is True
+    assert blocks[0].complete is False
+
+
+def test_streaming_seals_blocks_incrementally() -> None:
+    """Test that streamed text only changes the tail block."""
+    text = MarkdownText(cache=MarkdownCache())
+    for char in REPLY:
+        text.append(char)
+        if char == "'":
+            # Unfinished code is shown as plain monospace text
+            assert isinstance(text._tail, SegmentedText)
+
+    assert text.text == REPLY
+    assert text.sealed_count == 2
+    intro, code, tail = text.control.controls
+    assert intro.value == "Intro paragraph."
+    assert intro.code_theme is None
+    assert code.code_theme == CODE_THEME
+    assert isinstance(tail, ft.Markdown)
+    assert tail.value == "- one\n- two"
+
+    # Further text keeps the sealed block controls
+    text.append("\nDone.")
+    assert text.control.controls[:2] == [intro, code]
+    assert text.control.controls[0] is intro
+
+
+def test_set_text_keeps_sealed_prefix() -> None:
+    """Test that replacing the text reuses sealed blocks."""
+    text = MarkdownText("First.\n\nSecond", cache=MarkdownCache())
+    first = text.control.controls[0]
+
+    text.set_text("First.\n\nSecond and more")
+    assert text.control.controls[0] is first
+    assert text.control.controls[-1].value == "Second and more"
+
+    text.set_text("Other")
+    assert text.text == "Other"
+    assert len(text.control.controls) == 1
+
+
+def test_cache_reuses_parsed_texts() -> None:
+    """Test that rebuilding a bubble for the same text hits the cache."""
+    cache = MarkdownCache(max_entries=2)
+    MarkdownText(REPLY, cache=cache)
+    MarkdownText(REPLY, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    MarkdownText("a", cache=cache)
+    MarkdownText("b", cache=cache)
+    MarkdownText(REPLY, cache=cache)
+    assert cache.misses == 4
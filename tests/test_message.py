@@ -0,0 +1,47 @@
+"""Tests for the compact message type."""
+
+
+import pytest
+
+from services.message import Message, to_wire
+
+
+def test_roles_are_interned() -> None:
+    """Test that equal roles share one string object."""
+    role = "".join(["assi", "stant"])
+    first = Message(role, "a")
+    second = Message("assistant", "b")
+
+    assert first.role is second.role
+
+
+def test_slots_prevent_per_message_dict() -> None:
+    """Test that messages have no instance dictionary."""
+    message = Message("user", "hi")
+
+    assert not hasattr(message, "__dict__")
+    with pytest.raises(AttributeError):
+        message.extra = 1
+
+
+def test_wire_format_excludes_metadata() -> None:
+    """Test conversion to the API format at send time."""
+    messages = [
+        Message("user", "hi", tokens=1, created_at=1.5),
+        {"role": "assistant", "content": "hello"},
+    ]
+
+    assert to_wire(messages) == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ]
+
+
+def test_record_round_trip() -> None:
+    """Test persistence records keep metadata only when set."""
+    message = Message("assistant", "ans", tokens=12, created_at=1700000000.0, error="Timed out")
+    bare = Message("user", "question")
+
+    assert Message.from_record(message.to_record()) == message
+    assert bare.to_record() == {"role": "user", "content": "question"}
+    assert Message.from_record({"role": "user", "content": "question"}) == bare
@@ -1,11 +1,17 @@
 """Tests for Mistral API service."""
 
 import os
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import Mock
 
 import pytest
+from conftest import FakeStream, StalledStream
 from dotenv import load_dotenv
 
-from services.mistral_api import MistralAPI
+from services.mistral_api import MistralAPI, delta_text, sdk_server_url
+from services.request_scheduler import Priority, QueueFullError, RequestScheduler
 
 # Load environment variables
 load_dotenv()
@@ -77,3 +83,142 @@ def test_api_key_cleaning() -> None:
     # Test with None (should load from .env)
     api = MistralAPI(api_key=None)
     assert api.api_key  # Should have a value from .env
+
+
+def test_delta_text() -> None:
+    """Test extracting text from streamed chunks."""
+    assert delta_text({"choices": [{"delta": {"content": "Hel"}}]}) == "Hel"
+    assert delta_text({"choices": [{"delta": {"content": None}}]}) == ""
+    assert delta_text({"choices": []}) == ""
+    assert delta_text({}) == ""
+    chunk = {"choices": [{"delta": {"content": [{"type": "text", "text": "lo"}]}}]}
+    assert delta_text(chunk) == "lo"
+
+
+def test_sdk_server_url() -> None:
+    """Test converting provider URLs to SDK server URLs."""
+    assert sdk_server_url("https://api.mistral.ai/v1/") is None
+    assert sdk_server_url("") is None
+    assert sdk_server_url("http://localhost:8080/v1") == "http://localhost:8080"
+    assert sdk_server_url("https://proxy.example/mistral/") == "https://proxy.example/mistral"
+
+
+def test_chat_completion_stream_cancel() -> None:
+    """Test that setting the cancel event stops and closes the stream."""
+    api = MistralAPI(api_key="test_key")
+    stream = FakeStream(["a", "b", "c"])
+    api.client = Mock()
+    api.client.chat.stream.return_value = stream
+    cancel_event = threading.Event()
+
+    received = []
+    for chunk in api.chat_completion_stream([], cancel_event=cancel_event, timeout=10):
+        received.append(delta_text(chunk))
+        cancel_event.set()
+
+    assert received == ["a"]
+    assert stream.closed
+    assert api.client.chat.stream.call_args.kwargs["timeout_ms"] == 10000
+
+
+def test_chat_completion_stream_timeout_budget() -> None:
+    """Test that exceeding the budget raises TimeoutError."""
+    api = MistralAPI(api_key="test_key")
+    stream = FakeStream(["a", "b"])
+    api.client = Mock()
+    api.client.chat.stream.return_value = stream
+
+    with pytest.raises(TimeoutError):
+        for _ in api.chat_completion_stream([], timeout=0.05):
+            time.sleep(0.1)
+    assert stream.closed
+
+    # A budget spent before sending sends nothing
+    api.client.chat.stream.reset_mock()
+    with pytest.raises(TimeoutError):
+        list(api.chat_completion_stream([], timeout=1e-9))
+    api.client.chat.stream.assert_not_called()
+
+
+def test_stop_interrupts_stalled_stream() -> None:
+    """Test that a stream sending nothing is closed once stopped."""
+    api = MistralAPI(api_key="test_key")
+    stream = StalledStream(["a", "b"])
+    api.client = Mock()
+    api.client.chat.stream.return_value = stream
+    cancel_event = threading.Event()
+    timer = threading.Timer(0.1, cancel_event.set)
+
+    start = time.monotonic()
+    timer.start()
+    chunks = api.chat_completion_stream([], cancel_event=cancel_event)
+    received = [delta_text(chunk) for chunk in chunks]
+
+    assert received == ["a"]
+    assert time.monotonic() - start < 5
+    assert stream.interrupted.is_set()
+    assert stream.closed
+
+
+def test_deadline_interrupts_stalled_stream() -> None:
+    """Test that a stream sending nothing fails once its budget is spent."""
+    api = MistralAPI(api_key="test_key")
+    stream = StalledStream(["a", "b"])
+    api.client = Mock()
+    api.client.chat.stream.return_value = stream
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        list(api.chat_completion_stream([], timeout=0.2))
+
+    assert time.monotonic() - start < 5
+    assert stream.interrupted.is_set()
+
+
+def test_chat_completion_stream_holds_scheduler_slot() -> None:
+    """Test that a stream holds its slot until it is closed."""
+    scheduler = RequestScheduler(max_concurrent=2, max_queue=1)
+    api = MistralAPI(api_key="test_key", scheduler=scheduler)
+    api.client = Mock()
+    api.client.chat.stream.return_value = FakeStream(["a", "b"])
+
+    stream = api.chat_completion_stream([], session="chat")
+    next(stream)
+    assert scheduler.active == 1
+    stream.close()
+    assert scheduler.active == 0
+
+
+def test_rate_limiter_waits_only_for_remaining_budget() -> None:
+    """Test that the scheduler and rate limiter waits share one timeout."""
+
+    @contextmanager
+    def slow_slot(*args):
+        time.sleep(0.2)
+        yield
+
+    scheduler = Mock()
+    scheduler.slot.side_effect = slow_slot
+    rate_limiter = Mock()
+    api = MistralAPI(api_key="test_key", scheduler=scheduler, rate_limiter=rate_limiter)
+
+    with api._slot("chat", Priority.INTERACTIVE, timeout=1.0):
+        pass
+    assert rate_limiter.acquire.call_args.kwargs["timeout"] <= 0.8
+
+    rate_limiter.reset_mock()
+    with pytest.raises(TimeoutError), api._slot("chat", Priority.INTERACTIVE, timeout=0.1):
+        pass
+    rate_limiter.acquire.assert_not_called()
+
+
+def test_shed_requests_raise_queue_full() -> None:
+    """Test that shed requests surface as QueueFullError, not a generic failure."""
+    scheduler = RequestScheduler(max_concurrent=2, max_queue=1)
+    api = MistralAPI(api_key="test_key", scheduler=scheduler)
+    api.client = Mock()
+    scheduler._waiting = 1  # Simulate a full queue
+
+    with pytest.raises(QueueFullError):
+        api.list_models(priority=Priority.BATCH)
+    api.client.models.list.assert_not_called()
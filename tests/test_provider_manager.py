@@ -1,8 +1,12 @@
 """Tests for Provider Manager."""
 
+import dataclasses
+import threading
+from unittest.mock import Mock
+
 import pytest
 
-from services.provider_manager import ProviderManager, ProviderSettings
+from services.provider_manager import ProviderManager, ProviderSettings, ProviderSnapshot
 
 
 @pytest.fixture
@@ -97,3 +101,56 @@ def test_provider_settings_defaults() -> None:
     assert settings.top_p == 1.0
     assert settings.reasoning_effort == "med"
     assert settings.enable_thinking is True
+    assert settings.request_timeout == 60.0
+
+
+def test_snapshots_are_immutable_versions(provider_manager: ProviderManager) -> None:
+    """Test that writes publish new snapshots and leave old ones unchanged."""
+    provider_manager.add_provider(ProviderSettings(name="A", api_key="key"))
+    before = provider_manager.snapshot
+
+    provider_manager.add_provider(ProviderSettings(name="B", api_key="key"))
+    provider_manager.delete_provider("A")
+
+    assert [settings.name for settings in before] == ["A"]
+    assert before.version == 1
+    assert provider_manager.snapshot.version == 3
+    assert provider_manager.list_providers() is provider_manager.snapshot.providers
+    with pytest.raises(TypeError):
+        provider_manager.providers["C"] = ProviderSettings(name="C", api_key="")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        before.get("A").api_key = "other"
+
+
+def test_subscribers_receive_changes(provider_manager: ProviderManager) -> None:
+    """Test that subscribers get every published snapshot until they leave."""
+    seen: list[ProviderSnapshot] = []
+    unsubscribe = provider_manager.subscribe(seen.append)
+    provider_manager.subscribe(Mock(side_effect=RuntimeError("broken")))
+
+    provider_manager.add_provider(ProviderSettings(name="A", api_key="key"))
+    provider_manager.update_provider("A", ProviderSettings(name="A", api_key="new"))
+    # Failed writes publish nothing
+    assert provider_manager.delete_provider("Missing") is False
+    unsubscribe()
+    provider_manager.delete_provider("A")
+
+    assert [snapshot.version for snapshot in seen] == [1, 2]
+    assert seen[-1].get("A").api_key == "new"
+
+
+def test_concurrent_writers_lose_no_updates(provider_manager: ProviderManager) -> None:
+    """Test that writes from many threads all end up in the latest snapshot."""
+
+    def add(worker: int) -> None:
+        for i in range(50):
+            provider_manager.add_provider(ProviderSettings(name=f"{worker}-{i}", api_key=""))
+
+    threads = [threading.Thread(target=add, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(provider_manager.list_providers()) == 400
+    assert provider_manager.snapshot.version == 400
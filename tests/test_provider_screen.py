@@ -1,11 +1,17 @@
 """Tests for Provider Screen UI."""
 
-from unittest.mock import Mock
+import threading
+from unittest.mock import Mock, patch
 
 import flet as ft
 
 from screens.chat_screen import ChatScreen
 from screens.provider_screen import ProviderScreen
+from services.conversation_store import ConversationStore
+from services.provider_manager import ProviderManager, ProviderSettings
+from services.request_scheduler import QueueFullError
+from services.search_index import SearchIndex
+from services.usage_ledger import UsageLedger
 
 
 def test_provider_screen_initialization() -> None:
@@ -89,6 +95,26 @@ def test_sidebar_provider_items() -> None:
     assert len(sidebar.controls) >= 2  # Title + Divider + items
 
 
+def test_sidebar_follows_provider_changes() -> None:
+    """Test that providers added or deleted elsewhere refresh the sidebar."""
+    page = Mock(spec=ft.Page)
+    provider_screen = ProviderScreen(page)
+    provider_screen.build()
+    before = provider_screen.main_content.controls[0]
+
+    provider_screen.provider_manager.add_provider(ProviderSettings(name="Other", api_key=""))
+
+    sidebar = provider_screen.main_content.controls[0]
+    assert sidebar is not before
+    assert len(sidebar.controls) == len(before.controls) + 1
+    page.update.assert_called()
+
+    # Closed sessions stop listening
+    provider_screen.close()
+    provider_screen.provider_manager.delete_provider("Other")
+    assert provider_screen.main_content.controls[0] is sidebar
+
+
 def test_provider_form_fields() -> None:
     """Test that provider form has all required fields."""
     # Create a mock page
@@ -253,3 +279,389 @@ def test_chat_screen_icons() -> None:
     icon = send_button.icon
     assert hasattr(icon, 'name'), f"Invalid icon: {icon}"
     assert hasattr(ft.Icons, icon.name), f"Invalid icon name: {icon.name}"
+
+
+def test_chat_screen_send_message_streams_response() -> None:
+    """Test that a streamed reply is coalesced into few page updates."""
+    # Create a mock page
+    page = Mock(spec=ft.Page)
+
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+
+    # Initialize chat screen with a streaming API stub
+    chat_screen = ChatScreen(page)
+    chunks = [{"choices": [{"delta": {"content": f"tok{i} "}}]} for i in range(200)]
+    chat_screen.mistral_api.chat_completion_stream = Mock(return_value=iter(chunks))
+    chat_screen.build()
+    input_field = Mock(spec=ft.TextField)
+
+    chat_screen.send_message("Hello", input_field)
+
+    # Verify history and transcript
+    expected = "".join(f"tok{i} " for i in range(200))
+    assert [message.to_wire() for message in chat_screen.messages] == [
+        {"role": "user", "content": "Hello"},
+        {"role": "assistant", "content": expected},
+    ]
+    assert chat_screen.transcript.entries[-1].role == "assistant"
+    assert chat_screen.transcript.entries[-1].text == expected
+    assert input_field.value == ""
+
+    # Verify updates were coalesced instead of one per token
+    assert page.update.call_count < 10
+
+
+def test_chat_screen_send_message_error() -> None:
+    """Test that API errors are shown in the transcript."""
+    # Create a mock page
+    page = Mock(spec=ft.Page)
+
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+
+    # Initialize chat screen with a failing API
+    chat_screen = ChatScreen(page)
+    chat_screen.mistral_api.chat_completion_stream = Mock(side_effect=RuntimeError("boom"))
+    chat_screen.build()
+
+    chat_screen.send_message("Hello", Mock(spec=ft.TextField))
+
+    entry = chat_screen.transcript.entries[-1]
+    assert entry.role == "error"
+    assert "boom" in entry.text
+
+
+def test_chat_screen_keeps_partial_reply_on_error(tmp_path) -> None:
+    """Test that text streamed before a failure is recorded with the error."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    store = ConversationStore(tmp_path)
+
+    def failing_stream(messages, **kwargs):
+        yield {"choices": [{"delta": {"content": "partial"}}]}
+        raise RuntimeError("connection reset")
+
+    chat_screen = ChatScreen(page, store=store, conversation_id="c")
+    chat_screen.mistral_api.chat_completion_stream = failing_stream
+    chat_screen.build()
+
+    chat_screen.send_message("Hello", Mock(spec=ft.TextField))
+
+    assert [entry.role for entry in chat_screen.transcript.entries] == [
+        "user",
+        "assistant",
+        "error",
+    ]
+    reply = chat_screen.messages[-1]
+    assert reply.to_wire() == {"role": "assistant", "content": "partial"}
+    assert "connection reset" in reply.error
+    assert store.read_all("c")[-1]["error"] == reply.error
+
+
+def test_chat_screen_send_runs_in_background() -> None:
+    """Test that sending dispatches the API call off the event handler."""
+    # Create a mock page that does not run threads
+    page = Mock(spec=ft.Page)
+
+    chat_screen = ChatScreen(page)
+    chat_screen.mistral_api.chat_completion_stream = Mock()
+    chat_screen.build()
+
+    chat_screen.send_message("Hello", Mock(spec=ft.TextField))
+
+    # The reply is pending and the stop button is shown
+    page.run_thread.assert_called_once()
+    chat_screen.mistral_api.chat_completion_stream.assert_not_called()
+    assert chat_screen.is_generating
+    assert chat_screen.stop_button.visible is True
+    assert chat_screen.send_button.visible is False
+
+    # A second message is ignored while generating
+    chat_screen.send_message("Again", Mock(spec=ft.TextField))
+    assert page.run_thread.call_count == 1
+
+
+def test_chat_screen_stop_generation() -> None:
+    """Test that the stop button cancels the running reply."""
+    page = Mock(spec=ft.Page)
+    chat_screen = ChatScreen(page)
+    chat_screen.build()
+    started = threading.Event()
+
+    def fake_stream(messages, cancel_event=None, **kwargs):
+        yield {"choices": [{"delta": {"content": "partial"}}]}
+        started.set()
+        cancel_event.wait(timeout=5)
+
+    chat_screen.mistral_api.chat_completion_stream = fake_stream
+    page.run_thread.side_effect = lambda handler, *args: threading.Thread(
+        target=handler, args=args
+    ).start()
+
+    chat_screen.send_message("Hello", Mock(spec=ft.TextField))
+    assert started.wait(timeout=5)
+    chat_screen.stop_generation()
+
+    # Wait for the worker to finish
+    for _ in range(100):
+        if not chat_screen.is_generating:
+            break
+        threading.Event().wait(0.05)
+
+    assert not chat_screen.is_generating
+    assert chat_screen.send_button.visible is True
+    assert chat_screen.messages[-1].to_wire() == {"role": "assistant", "content": "partial"}
+
+
+def test_chat_screen_uses_provider_timeout() -> None:
+    """Test that provider settings, including the timeout, are used."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    manager = ProviderManager()
+    manager.add_provider(
+        ProviderSettings(name="Fast", api_key="", model="mistral-small-latest", request_timeout=5)
+    )
+    chat_screen = ChatScreen(page, provider_name="Fast", provider_manager=manager)
+    chat_screen.mistral_api.chat_completion_stream = Mock(
+        side_effect=TimeoutError("Chat completion exceeded 5s budget")
+    )
+    chat_screen.build()
+
+    chat_screen.send_message("Hello", Mock(spec=ft.TextField))
+
+    kwargs = chat_screen.mistral_api.chat_completion_stream.call_args.kwargs
+    assert kwargs["model"] == "mistral-small-latest"
+    assert kwargs["timeout"] == 5
+    entry = chat_screen.transcript.entries[-1]
+    assert entry.role == "error"
+    assert "Timed out" in entry.text
+
+
+def test_chat_screen_compare_mode() -> None:
+    """Test that compare mode streams every provider side by side."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    manager = ProviderManager()
+    manager.add_provider(ProviderSettings(name="A", api_key=""))
+    manager.add_provider(ProviderSettings(name="B", api_key=""))
+    chat_screen = ChatScreen(page, provider_name="A", provider_manager=manager)
+    chat_screen.mistral_api.chat_completion_stream = Mock(
+        side_effect=lambda messages, **kwargs: iter(
+            [{"choices": [{"delta": {"content": kwargs["model"]}}]}]
+        )
+    )
+    chat_screen.build()
+    chat_screen.compare_switch.value = True
+
+    chat_screen.send_message("Hello", Mock(spec=ft.TextField))
+
+    # Comparison turns do not change the history
+    assert [message.to_wire() for message in chat_screen.messages] == []
+    entry = chat_screen.transcript.entries[-1]
+    assert [column.text for column in entry.columns] == ["mistral-medium-latest"] * 2
+    assert entry.columns[0].title.startswith("A (mistral-medium-latest)")
+    assert entry.columns[1].title.startswith("B (mistral-medium-latest)")
+    assert len(chat_screen.comparisons) == 1
+    assert not chat_screen.is_generating
+
+
+def test_test_all_providers_fills_table() -> None:
+    """Test that Test all shows a row per provider with probe results."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    provider_screen = ProviderScreen(page)
+    provider_screen.provider_manager.add_provider(ProviderSettings(name="Other", api_key=""))
+    provider_screen.mistral_api.list_models = Mock(return_value={"data": [{"id": "m"}]})
+
+    def stream(messages, **kwargs):
+        yield {"choices": [{"delta": {"content": "x"}}]}
+
+    provider_screen.mistral_api.chat_completion_stream = stream
+
+    with patch("services.health_check.measure_connect", return_value=0.005):
+        provider_screen.test_all_providers(Mock())
+
+    table = page.dialog.content.controls[0]
+    assert isinstance(table, ft.DataTable)
+    assert [row.cells[0].content.value for row in table.rows] == ["MistralMedium", "Other"]
+    for row in table.rows:
+        assert row.cells[1].content.value == "✓ 1 models"
+        assert row.cells[2].content.value == "5 ms"
+
+
+def test_chat_screen_resumes_stored_conversation(tmp_path) -> None:
+    """Test that reopening a chat shows the stored conversation."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    store = ConversationStore(tmp_path)
+    for i in range(300):
+        store.append("MistralMedium", {"role": "user", "content": f"old {i}"})
+
+    chat_screen = ChatScreen(page, store=store)
+    chat_screen.build()
+
+    # Only the displayed tail is loaded
+    transcript = chat_screen.transcript
+    assert len(transcript.entries) == 300
+    assert transcript.entries[0] is None
+    assert transcript.entries[-1].text == "old 299"
+    assert [message.to_wire() for message in chat_screen.messages] == []
+
+    # Sending loads the full history and persists both turns
+    chat_screen.mistral_api.chat_completion_stream = Mock(
+        return_value=iter([{"choices": [{"delta": {"content": "new answer"}}]}])
+    )
+    chat_screen.send_message("new question", Mock(spec=ft.TextField))
+
+    assert len(chat_screen.messages) == 302
+    assert store.count("MistralMedium") == 302
+    record = store.tail("MistralMedium", 1)[0]
+    assert record["role"] == "assistant"
+    assert record["content"] == "new answer"
+    assert "created_at" in record
+
+    # A fresh chat screen resumes where the last one stopped
+    reopened = ChatScreen(page, store=store)
+    assert reopened.transcript.entries[-1].text == "new answer"
+
+
+def test_chat_screen_search_history() -> None:
+    """Test that sent messages are indexed and can be searched."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    search_index = SearchIndex(":memory:")
+    chat_screen = ChatScreen(page, search_index=search_index)
+    chat_screen.search_page_size = 2
+    chat_screen.build()
+
+    for i in range(3):
+        chat_screen.mistral_api.chat_completion_stream = Mock(
+            return_value=iter([{"choices": [{"delta": {"content": f"kiwi answer {i}"}}]}])
+        )
+        chat_screen.send_message(f"question {i}", Mock(spec=ft.TextField))
+
+    hits = chat_screen.search_history("kiwi")
+    assert len(hits) == 2
+    assert isinstance(chat_screen.search_results.controls[-1], ft.TextButton)
+
+    more = chat_screen.search_history("kiwi", more=True)
+    assert len(more) == 1
+    assert len(chat_screen.search_results.controls) == 3
+
+    # Selecting a hit shows its message
+    chat_screen.show_search_hit(more[0])
+    entry = chat_screen.transcript.entries[chat_screen.transcript.live_range.start]
+    assert entry.text == f"kiwi answer {more[0].seq // 2}"
+
+
+def _replying(chat_screen: ChatScreen, *replies: str) -> None:
+    """Make the chat screen's API stream the given replies, one per request."""
+    chat_screen.mistral_api.chat_completion_stream = Mock(
+        side_effect=[iter([{"choices": [{"delta": {"content": reply}}]}]) for reply in replies]
+    )
+
+
+def test_chat_screen_regenerate_and_switch_branches(tmp_path) -> None:
+    """Test that regenerated answers become branches sharing the question."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    store = ConversationStore(tmp_path)
+    chat_screen = ChatScreen(page, store=store)
+    chat_screen.build()
+    _replying(chat_screen, "first", "second")
+
+    chat_screen.send_message("question", Mock(spec=ft.TextField))
+    question_bubble = chat_screen.transcript.view.controls[0]
+    chat_screen.regenerate()
+
+    assert [m.content for m in chat_screen.messages] == ["question", "second"]
+    assert [e.text for e in chat_screen.transcript.entries] == ["question", "second"]
+    assert chat_screen.branch_label.visible is True
+    assert chat_screen.branch_label.value == "2/2"
+    # Both branches share the question message and its bubble
+    first, second = chat_screen.tree.nodes[1:]
+    assert chat_screen.tree.messages(first)[0] is chat_screen.tree.messages(second)[0]
+    assert chat_screen.transcript.view.controls[0] is question_bubble
+
+    chat_screen.switch_branch(-1)
+    assert [e.text for e in chat_screen.transcript.entries] == ["question", "first"]
+    assert chat_screen.transcript.view.controls[0] is question_bubble
+    assert chat_screen.branch_label.value == "1/2"
+
+    # Reopening shows the branch that was added last
+    reopened = ChatScreen(page, store=store)
+    assert [e.text for e in reopened.transcript.entries] == ["question", "second"]
+
+
+def test_chat_screen_edit_last_message() -> None:
+    """Test that an edited question is sent as a new branch."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    chat_screen = ChatScreen(page)
+    chat_screen.build()
+    _replying(chat_screen, "a1", "a2", "a2 edited")
+    chat_screen.send_message("q1", Mock(spec=ft.TextField))
+    chat_screen.send_message("q2", Mock(spec=ft.TextField))
+
+    chat_screen.edit_last_message()
+    assert chat_screen.input_field.value == "q2"
+    chat_screen.send_message("q2 edited", chat_screen.input_field)
+
+    assert [m.content for m in chat_screen.messages] == ["q1", "a1", "q2 edited", "a2 edited"]
+    assert [e.text for e in chat_screen.transcript.entries] == [
+        "q1",
+        "a1",
+        "q2 edited",
+        "a2 edited",
+    ]
+    sent = chat_screen.mistral_api.chat_completion_stream.call_args.args[0]
+    assert [m.content for m in sent] == ["q1", "a1", "q2 edited"]
+    assert len(chat_screen.tree.nodes) == 6
+
+
+def test_chat_screen_shows_busy_when_shed() -> None:
+    """Test that a shed request is shown as busy rather than as a failure."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    chat_screen = ChatScreen(page)
+    chat_screen.build()
+    chat_screen.mistral_api.chat_completion_stream = Mock(
+        side_effect=QueueFullError("Too many requests waiting (32), try again")
+    )
+
+    chat_screen.send_message("Hello", Mock(spec=ft.TextField))
+
+    entry = chat_screen.transcript.entries[-1]
+    assert entry.role == "error"
+    assert entry.text.startswith("Busy: ")
+    kwargs = chat_screen.mistral_api.chat_completion_stream.call_args.kwargs
+    assert kwargs["session"] == chat_screen.conversation_id
+
+
+def test_chat_screen_records_usage() -> None:
+    """Test that each reply's usage and timings go to the ledger."""
+    page = Mock(spec=ft.Page)
+    page.run_thread.side_effect = lambda handler, *args: handler(*args)
+    ledger = UsageLedger(":memory:")
+    chat_screen = ChatScreen(page, usage_ledger=ledger)
+    chat_screen.build()
+    chat_screen.mistral_api.chat_completion_stream = Mock(
+        return_value=iter(
+            [
+                {"choices": [{"delta": {"content": "Hi"}}]},
+                {
+                    "choices": [{"delta": {"content": "!"}}],
+                    "usage": {"prompt_tokens": 7, "completion_tokens": 2},
+                },
+            ]
+        )
+    )
+
+    chat_screen.send_message("Hello", Mock(spec=ft.TextField))
+
+    (record,) = ledger.records()
+    assert record.provider == "MistralMedium"
+    assert (record.prompt_tokens, record.completion_tokens) == (7, 2)
+    assert record.ttft is not None
+    assert record.latency >= record.ttft
+    assert record.session == chat_screen.conversation_id
+    assert record.error is None
@@ -0,0 +1,152 @@
+"""Tests for the priority request scheduler."""
+
+import threading
+import time
+
+import pytest
+
+from services.request_scheduler import Priority, QueueFullError, RequestScheduler
+
+
+def _start(
+    scheduler: RequestScheduler,
+    session: str,
+    priority: Priority,
+    order: list[str],
+    release: threading.Event,
+    name: str | None = None,
+) -> threading.Thread:
+    """Run a request in a thread that records when it starts and then holds its slot."""
+
+    def run() -> None:
+        with scheduler.slot(session, priority):
+            order.append(name or session)
+            release.wait(5)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_for(condition, timeout: float = 2.0) -> None:
+    """Wait until a condition becomes true."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_slot_runs_immediately_when_free() -> None:
+    """Test that an idle scheduler admits requests at once."""
+    scheduler = RequestScheduler(max_concurrent=2)
+
+    with scheduler.slot("chat"):
+        assert scheduler.active == 1
+        assert scheduler.waiting == 0
+    assert scheduler.active == 0
+
+
+def test_interactive_requests_go_first() -> None:
+    """Test that queued interactive work starts before batch work."""
+    scheduler = RequestScheduler(max_concurrent=2, per_session=2, reserved_interactive=1)
+    order: list[str] = []
+    hold = threading.Event()
+    release = threading.Event()
+
+    # Fill both slots
+    blockers = [_start(scheduler, f"busy{i}", Priority.INTERACTIVE, [], hold) for i in range(2)]
+    _wait_for(lambda: scheduler.active == 2)
+
+    batch = _start(scheduler, "batch", Priority.BATCH, order, release)
+    _wait_for(lambda: scheduler.waiting == 1)
+    chat = _start(scheduler, "chat", Priority.INTERACTIVE, order, release)
+    _wait_for(lambda: scheduler.waiting == 2)
+
+    hold.set()
+    release.set()
+    for thread in [*blockers, batch, chat]:
+        thread.join(5)
+    assert order == ["chat", "batch"]
+
+
+def test_reserved_slot_only_for_interactive() -> None:
+    """Test that bulk work cannot take the reserved slots."""
+    scheduler = RequestScheduler(max_concurrent=2, reserved_interactive=1)
+    release = threading.Event()
+    order: list[str] = []
+
+    first = _start(scheduler, "a", Priority.BATCH, order, release)
+    second = _start(scheduler, "b", Priority.BATCH, order, release)
+    _wait_for(lambda: scheduler.active == 1 and scheduler.waiting == 1)
+
+    # The reserved slot is still free for a chat turn
+    with scheduler.slot("chat", Priority.INTERACTIVE, timeout=1):
+        assert scheduler.active == 2
+
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert sorted(order) == ["a", "b"]
+
+
+def test_per_session_limit_and_fair_sharing() -> None:
+    """Test that sessions take turns instead of one draining the queue."""
+    scheduler = RequestScheduler(max_concurrent=2, per_session=1, reserved_interactive=1)
+    order: list[str] = []
+    hold = threading.Event()
+    release = threading.Event()
+
+    blocker = _start(scheduler, "x", Priority.BATCH, [], hold)
+    _wait_for(lambda: scheduler.active == 1)
+
+    threads = []
+    for count, name in enumerate(["a1", "a2", "a3", "b1"], 1):
+        threads.append(_start(scheduler, name[0], Priority.BATCH, order, release, name))
+        _wait_for(lambda count=count: scheduler.waiting == count)
+
+    # Requests start one at a time as earlier ones finish
+    release.set()
+    hold.set()
+    for thread in [blocker, *threads]:
+        thread.join(5)
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_low_priority_is_shed_first() -> None:
+    """Test queue-depth based load shedding."""
+    scheduler = RequestScheduler(max_concurrent=2, max_queue=4, reserved_interactive=1)
+    release = threading.Event()
+
+    threads = [_start(scheduler, "bulk", Priority.BATCH, [], release)]
+    _wait_for(lambda: scheduler.active == 1)
+    threads.append(_start(scheduler, "bulk", Priority.BATCH, [], release))
+    _wait_for(lambda: scheduler.waiting == 1)
+
+    assert scheduler.queue_limit(Priority.BATCH) == 1
+    with pytest.raises(QueueFullError), scheduler.slot("bulk", Priority.BATCH):
+        pass
+
+    # Interactive requests are still admitted
+    with scheduler.slot("chat", Priority.INTERACTIVE, timeout=1):
+        pass
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert scheduler.active == 0
+    assert scheduler.waiting == 0
+
+
+def test_wait_timeout_leaves_queue() -> None:
+    """Test that a request giving up waiting is removed from the queue."""
+    scheduler = RequestScheduler(max_concurrent=2, per_session=1)
+    release = threading.Event()
+    thread = _start(scheduler, "chat", Priority.INTERACTIVE, [], release)
+    _wait_for(lambda: scheduler.active == 1)
+
+    with pytest.raises(TimeoutError), scheduler.slot("chat", timeout=0.05):
+        pass
+    assert scheduler.waiting == 0
+
+    release.set()
+    thread.join(5)
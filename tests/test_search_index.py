@@ -0,0 +1,83 @@
+"""Tests for the chat history search index."""
+
+import pytest
+
+from services.search_index import SearchIndex, build_match_query
+
+
+@pytest.fixture
+def index() -> SearchIndex:
+    """Create an in-memory search index."""
+    search_index = SearchIndex(":memory:")
+    yield search_index
+    search_index.close()
+
+
+def test_build_match_query() -> None:
+    """Test that free text becomes a safe prefix query."""
+    assert build_match_query("") == ""
+    assert build_match_query("   ") == ""
+    assert build_match_query("python list") == '"python" "list"*'
+    assert build_match_query('say "hi" OR') == '"say" """hi""" "OR"*'
+
+
+def test_search_ranks_and_highlights(index: SearchIndex) -> None:
+    """Test ranked search with snippets."""
+    index.add("chat", 0, "user", "How do I sort a list in Python?")
+    index.add("chat", 1, "assistant", "Use sorted() or list.sort() in Python. Python sorts lists.")
+    index.add("other", 0, "user", "What is the weather like?")
+
+    hits = index.search("python")
+
+    assert [(hit.conversation_id, hit.seq) for hit in hits] == [("chat", 1), ("chat", 0)]
+    assert "[Python]" in hits[0].snippet
+    assert hits[0].role == "assistant"
+    assert index.count("python") == 2
+    assert index.search("weather")[0].conversation_id == "other"
+    assert index.search("python", conversation_id="other") == []
+    assert index.count("weather", conversation_id="chat") == 0
+
+
+def test_prefix_and_operator_safety(index: SearchIndex) -> None:
+    """Test prefix matching and that FTS syntax in queries does not fail."""
+    index.add("chat", 0, "user", "Streaming responses are great")
+
+    assert len(index.search("stream")) == 1
+    assert index.search('"unbalanced (quote') == []
+    assert index.search("AND OR NOT") == []
+
+
+def test_pagination(index: SearchIndex) -> None:
+    """Test paging through many results."""
+    for i in range(2000):
+        index.add("chat", i, "user", f"message number {i} about flet")
+
+    first = index.search("flet", limit=50)
+    second = index.search("flet", limit=50, offset=50)
+
+    assert len(first) == 50
+    assert len(second) == 50
+    assert not {hit.seq for hit in first} & {hit.seq for hit in second}
+    assert index.count("flet") == 2000
+
+
+def test_delete_conversation(index: SearchIndex) -> None:
+    """Test removing a conversation from the index."""
+    index.add("chat", 0, "user", "remove me")
+    index.add("keep", 0, "user", "remove me too")
+
+    index.delete_conversation("chat")
+
+    assert [hit.conversation_id for hit in index.search("remove")] == ["keep"]
+
+
+def test_file_index_persists(tmp_path) -> None:
+    """Test that a file-backed index survives reopening."""
+    path = tmp_path / "data" / "search.db"
+    first = SearchIndex(path)
+    first.add("chat", 0, "user", "persistent words")
+    first.close()
+
+    second = SearchIndex(path)
+    assert second.count("persistent") == 1
+    second.close()
@@ -0,0 +1,56 @@
+"""Tests for segmented text rendering."""
+
+import pytest
+
+from screens.segmented_text import SegmentedText
+
+
+def test_append_seals_full_segments() -> None:
+    """Test that appended text is split into sealed spans and a tail."""
+    text = SegmentedText(segment_size=10)
+
+    for _ in range(25):
+        text.append("ab")
+
+    assert text.text == "ab" * 25
+    assert [len(span.text) for span in text.spans] == [10, 10, 10, 10, 10]
+    assert text.control.spans is text.spans
+
+
+def test_sealed_spans_are_never_modified() -> None:
+    """Test that appending only changes the live tail."""
+    text = SegmentedText("x" * 35, segment_size=10)
+    sealed = [(span, span.text) for span in text.spans[:-1]]
+
+    text.append("y" * 3)
+
+    for span, value in sealed:
+        assert span.text == value
+    assert text.spans[-1].text == "x" * 5 + "y" * 3
+
+
+def test_set_text_keeps_common_prefix() -> None:
+    """Test that replacing text keeps sealed spans of the shared prefix."""
+    text = SegmentedText("a" * 10 + "b" * 10 + "c" * 5, segment_size=10)
+    first, second = text.spans[0], text.spans[1]
+
+    text.set_text("a" * 10 + "d" * 12)
+
+    assert text.text == "a" * 10 + "d" * 12
+    assert text.spans[0] is first
+    assert second not in text.spans
+
+
+def test_empty_text() -> None:
+    """Test that empty text has a single empty tail."""
+    text = SegmentedText()
+    text.append("")
+
+    assert text.text == ""
+    assert len(text.spans) == 1
+
+
+def test_invalid_segment_size() -> None:
+    """Test that a non-positive segment size is rejected."""
+    with pytest.raises(ValueError):
+        SegmentedText(segment_size=0)
@@ -0,0 +1,152 @@
+"""Tests for the semantic response cache."""
+
+from unittest.mock import Mock
+
+import pytest
+from conftest import Clock, FakeStream
+
+from services import semantic_cache
+from services.mistral_api import MistralAPI, delta_text
+from services.semantic_cache import SemanticCache, SemanticHit, semantic_cache_from_env
+
+VECTORS = {
+    "What is the capital of France?": [1.0, 0.0, 0.0],
+    "what's the capital of france": [0.98, 0.2, 0.0],
+    "How tall is Mont Blanc?": [0.0, 1.0, 0.0],
+    "Tell me a joke": [0.0, 0.0, 1.0],
+}
+
+
+def test_similar_prompt_hits(numpy: None) -> None:
+    """Test that a close paraphrase returns the stored answer."""
+    cache = SemanticCache(VECTORS.__getitem__, threshold=0.95)
+    cache.store("What is the capital of France?", "Paris")
+
+    hit = cache.lookup("what's the capital of france")
+    assert hit is not None
+    assert hit.answer == "Paris"
+    assert hit.similarity > 0.95
+    assert cache.lookup("How tall is Mont Blanc?") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_scopes_do_not_mix(numpy: None) -> None:
+    """Test that answers only match within their scope."""
+    cache = SemanticCache(VECTORS.__getitem__)
+    cache.store("What is the capital of France?", "Paris", scope="model-a")
+
+    assert cache.lookup("What is the capital of France?", scope="model-b") is None
+    assert cache.lookup("What is the capital of France?", scope="model-a").answer == "Paris"
+
+
+def test_full_cache_evicts_least_recently_used(numpy: None) -> None:
+    """Test that the capacity is kept by replacing the least recently used entry."""
+    clock = Clock()
+    cache = SemanticCache(VECTORS.__getitem__, capacity=2, clock=clock)
+    cache.store("What is the capital of France?", "Paris")
+    clock.now = 1
+    cache.store("How tall is Mont Blanc?", "4806 m")
+    clock.now = 2
+    cache.lookup("What is the capital of France?")
+
+    clock.now = 3
+    cache.store("Tell me a joke", "No.")
+
+    assert len(cache) == 2
+    assert cache.lookup("How tall is Mont Blanc?") is None
+    assert cache.lookup("What is the capital of France?").answer == "Paris"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_scopes_are_dropped_with_their_entries(numpy: None) -> None:
+    """Test that scopes of replaced entries do not accumulate."""
+    cache = SemanticCache(VECTORS.__getitem__, capacity=2)
+
+    for turn in range(50):
+        cache.store("Tell me a joke", "No.", scope=f"conversation-{turn}")
+
+    assert cache.stats()["scopes"] == 2
+    assert cache.lookup("Tell me a joke", scope="conversation-49").answer == "No."
+    assert cache.lookup("Tell me a joke", scope="conversation-0") is None
+
+
+def test_entries_expire(numpy: None) -> None:
+    """Test that entries older than the lifetime no longer match."""
+    clock = Clock()
+    cache = SemanticCache(VECTORS.__getitem__, ttl=10, clock=clock)
+    cache.store("Tell me a joke", "No.")
+    clock.now = 11
+
+    assert cache.lookup("Tell me a joke") is None
+
+
+def test_cache_from_env_needs_numpy(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the cache is disabled without configuration or NumPy."""
+    monkeypatch.delenv("FLET_CHAT_SEMANTIC_CACHE", raising=False)
+    assert semantic_cache_from_env(Mock()) is None
+
+    monkeypatch.setenv("FLET_CHAT_SEMANTIC_CACHE", "0.9")
+    monkeypatch.setattr(semantic_cache, "np", None)
+    assert semantic_cache_from_env(Mock()) is None
+
+
+class FakeSemanticCache:
+    """Semantic cache stand-in matching prompts exactly."""
+
+    def __init__(self) -> None:
+        self.entries: dict[tuple[str, str], str] = {}
+
+    def lookup(self, prompt: str, scope: str = "") -> SemanticHit | None:
+        answer = self.entries.get((prompt, scope))
+        return SemanticHit(prompt, answer, 1.0) if answer is not None else None
+
+    def store(self, prompt: str, answer: str, scope: str = "") -> None:
+        self.entries[(prompt, scope)] = answer
+
+
+def _api() -> MistralAPI:
+    """Create a client with a mocked SDK and a semantic cache."""
+    api = MistralAPI("test-key", cassette=None, semantic_cache=FakeSemanticCache())
+    api.client = Mock()
+    api.client.chat.complete.return_value.model_dump.return_value = {
+        "choices": [{"message": {"role": "assistant", "content": "Paris"}}]
+    }
+    return api
+
+
+def test_repeated_question_skips_generation() -> None:
+    """Test that a repeated question is answered without generating."""
+    api = _api()
+    messages = [{"role": "user", "content": "Capital of France?"}]
+
+    first = api.chat_completion(messages, model="m")
+    second = api.chat_completion(messages, model="m")
+
+    assert api.client.chat.complete.call_count == 1
+    assert "cache_hit" not in first
+    assert second["cache_hit"] is True
+    assert second["choices"][0]["message"]["content"] == "Paris"
+
+    # Other sampling parameters, earlier turns or cached=False generate again
+    api.chat_completion(messages, model="m", temperature=0.1)
+    api.chat_completion(
+        [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello"}, *messages],
+        model="m",
+    )
+    api.chat_completion(messages, model="m", cached=False)
+    assert api.client.chat.complete.call_count == 4
+
+
+def test_stream_serves_and_stores_answers() -> None:
+    """Test that complete streamed answers are cached and replayed as one chunk."""
+    api = _api()
+    api.client.chat.stream.side_effect = lambda **kwargs: FakeStream(["Par", "is"])
+    messages = [{"role": "user", "content": "Capital of France?"}]
+
+    assert "".join(delta_text(chunk) for chunk in api.chat_completion_stream(messages)) == "Paris"
+    chunks = list(api.chat_completion_stream(messages))
+
+    assert api.client.chat.stream.call_count == 1
+    assert len(chunks) == 1
+    assert chunks[0]["cache_hit"] is True
+    assert delta_text(chunks[0]) == "Paris"
@@ -0,0 +1,149 @@
+"""Tests for the cache and rate limit shared between worker processes."""
+
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+from conftest import Clock
+
+from services.mistral_api import MistralAPI
+from services.shared_state import RateLimiter, SharedCache, cache_key, shared_state_from_env
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+
+def test_cache_expires_entries() -> None:
+    """Test that values are returned until their lifetime ends."""
+    clock = Clock(1000.0)
+    cache = SharedCache(":memory:", default_ttl=10, clock=clock)
+    cache.set("models", "a", {"data": [1, 2]})
+    cache.set("models", "b", "short", ttl=1)
+
+    assert cache.get("models", "a") == {"data": [1, 2]}
+    assert cache.get("chat", "a") is None
+    clock.now += 5
+    assert cache.get("models", "b") is None
+    assert cache.get("models", "a") == {"data": [1, 2]}
+    clock.now += 10
+    assert cache.get("models", "a") is None
+
+
+def test_cache_is_shared_between_connections(tmp_path: Path) -> None:
+    """Test that a value written by one process is read by another."""
+    path = tmp_path / "shared.db"
+    writer = SharedCache(path)
+    reader = SharedCache(path)
+    writer.set("models", "key", ["model"])
+
+    assert reader.get("models", "key") == ["model"]
+    writer.close()
+    reader.close()
+
+
+def test_purge_trims_to_max_entries() -> None:
+    """Test that purging drops expired entries and those expiring first."""
+    clock = Clock(1000.0)
+    cache = SharedCache(":memory:", max_entries=2, clock=clock)
+    cache.set("chat", "expired", 0, ttl=1)
+    for ttl in (10, 20, 30):
+        cache.set("chat", str(ttl), ttl, ttl=ttl)
+    clock.now += 2
+
+    assert cache.purge() == 2
+    assert cache.get("chat", "10") is None
+    assert cache.get("chat", "30") == 30
+
+
+def test_cache_key_is_canonical() -> None:
+    """Test that equal parameters give equal keys."""
+    assert cache_key("m", {"a": 1, "b": 2}) == cache_key("m", {"b": 2, "a": 1})
+    assert cache_key("m", 0.7) != cache_key("m", 0.8)
+
+
+def test_rate_limiter_waits_for_tokens() -> None:
+    """Test that requests beyond the burst wait for the bucket to refill."""
+    clock = Clock(1000.0)
+    sleeps: list[float] = []
+
+    def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    limiter = RateLimiter(":memory:", rate=2, burst=2, clock=clock, sleep=sleep)
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() == pytest.approx(0.5)
+
+    limiter.acquire()
+    assert sleeps == [pytest.approx(0.5)]
+
+
+def test_rate_limiter_times_out() -> None:
+    """Test that waiting longer than the timeout raises."""
+    clock = Clock(1000.0)
+    limiter = RateLimiter(":memory:", rate=1, burst=1, clock=clock, sleep=Mock())
+    limiter.acquire()
+
+    with pytest.raises(TimeoutError):
+        limiter.acquire(timeout=0.5)
+
+
+def test_shared_state_from_env(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test that the environment enables the cache and the rate limit."""
+    monkeypatch.delenv("FLET_CHAT_SHARED_STATE", raising=False)
+    assert shared_state_from_env() == (None, None)
+
+    monkeypatch.setenv("FLET_CHAT_SHARED_STATE", str(tmp_path / "shared.db"))
+    monkeypatch.setenv("FLET_CHAT_CACHE_TTL", "0")
+    monkeypatch.setenv("FLET_CHAT_RATE_LIMIT", "3")
+    cache, limiter = shared_state_from_env()
+    assert cache is None
+    assert limiter.rate == 3
+
+
+def _api(cache: SharedCache, rate_limiter: RateLimiter | None = None) -> MistralAPI:
+    """Create a client with a mocked SDK."""
+    api = MistralAPI("test-key", cassette=None, cache=cache, rate_limiter=rate_limiter)
+    api.client = Mock()
+    api.client.models.list.return_value.model_dump.return_value = {"data": ["m"]}
+    api.client.chat.complete.return_value.model_dump.return_value = {"id": "1"}
+    return api
+
+
+def test_cached_model_list() -> None:
+    """Test that model lists are fetched once unless the cache is bypassed."""
+    cache = SharedCache(":memory:")
+    api = _api(cache)
+
+    assert api.list_models() == {"data": ["m"]}
+    assert api.list_models() == {"data": ["m"]}
+    assert api.client.models.list.call_count == 1
+    api.list_models(cached=False)
+    assert api.client.models.list.call_count == 2
+
+    # Another worker with the same key finds the list
+    other = _api(cache)
+    other.list_models()
+    other.client.models.list.assert_not_called()
+
+
+def test_cached_completion_depends_on_parameters() -> None:
+    """Test that only identical requests share a cached completion."""
+    api = _api(SharedCache(":memory:"))
+
+    api.chat_completion(MESSAGES, model="a")
+    api.chat_completion(MESSAGES, model="a")
+    assert api.client.chat.complete.call_count == 1
+    api.chat_completion(MESSAGES, model="a", temperature=0.2)
+    api.chat_completion(MESSAGES, model="b")
+    assert api.client.chat.complete.call_count == 3
+
+
+def test_requests_take_rate_limit_tokens() -> None:
+    """Test that upstream requests go through the rate limiter."""
+    limiter = Mock()
+    api = _api(SharedCache(":memory:"), limiter)
+
+    api.list_models()
+    api.list_models()
+    limiter.acquire.assert_called_once()
@@ -0,0 +1,74 @@
+"""Tests for interrupting stalled streams."""
+
+import socket
+import threading
+import time
+from contextlib import suppress
+from types import SimpleNamespace
+
+import httpx
+
+from services.stream_watchdog import StreamWatchdog
+
+
+def _stalling_server() -> socket.socket:
+    """Start a server sending response headers and one chunk, then nothing."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+
+    def serve() -> None:
+        connection, _ = server.accept()
+        connection.recv(4096)
+        connection.sendall(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n5\r\ndata:\r\n"
+        )
+        time.sleep(30)
+        connection.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server
+
+
+def test_cancel_wakes_blocked_read() -> None:
+    """Test that a read blocked on a real socket returns once cancelled."""
+    server = _stalling_server()
+    url = f"http://127.0.0.1:{server.getsockname()[1]}/"
+    watchdog = StreamWatchdog(interval=0.01)
+    cancel_event = threading.Event()
+    received = []
+
+    with httpx.Client(timeout=60) as client, client.stream("GET", url) as response:
+        threading.Timer(0.1, cancel_event.set).start()
+        start = time.monotonic()
+        with (
+            watchdog.watch(SimpleNamespace(response=response), cancel_event),
+            suppress(httpx.HTTPError),
+        ):
+            received.extend(response.iter_bytes())
+        elapsed = time.monotonic() - start
+
+    server.close()
+    assert received == [b"data:"]
+    assert elapsed < 5
+
+
+def test_deadline_interrupts_and_thread_stops_when_idle() -> None:
+    """Test that only overdue streams are interrupted and the thread exits."""
+    interrupted = []
+    watchdog = StreamWatchdog(interval=0.01, interrupt=interrupted.append)
+
+    with watchdog.watch("late", deadline=time.monotonic() + 0.05), watchdog.watch(
+        "on time", deadline=time.monotonic() + 60
+    ):
+        time.sleep(0.2)
+    thread = watchdog._thread
+    if thread is not None:
+        thread.join(1)
+
+    assert interrupted == ["late"]
+    assert watchdog._thread is None
+    # Nothing to watch without an event or deadline
+    with watchdog.watch("free"):
+        assert watchdog._thread is None
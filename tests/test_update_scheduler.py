@@ -0,0 +1,79 @@
+"""Tests for the page update scheduler."""
+
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+from conftest import Clock
+
+from screens.update_scheduler import UpdateScheduler
+
+
+def test_first_request_flushes_immediately() -> None:
+    """Test that an idle scheduler updates the page right away."""
+    page = Mock()
+    scheduler = UpdateScheduler(page, max_fps=10, clock=Clock(100.0))
+
+    scheduler.request_update()
+
+    assert page.update.call_count == 1
+
+
+def test_requests_within_a_frame_are_coalesced() -> None:
+    """Test that many requests in one frame produce a single delayed update."""
+    page = Mock()
+    scheduler = UpdateScheduler(page, max_fps=20)
+
+    for _ in range(500):
+        scheduler.request_update()
+    assert page.update.call_count == 1
+
+    time.sleep(scheduler.min_interval * 3)
+    assert page.update.call_count == 2
+
+
+def test_update_now_cancels_scheduled_flush() -> None:
+    """Test that completion flushes immediately and only once."""
+    page = Mock()
+    scheduler = UpdateScheduler(page, max_fps=5)
+
+    scheduler.request_update()
+    scheduler.request_update()
+    scheduler.update_now()
+    assert page.update.call_count == 2
+
+    time.sleep(scheduler.min_interval * 1.5)
+    assert page.update.call_count == 2
+
+
+def test_request_after_frame_interval_flushes_immediately() -> None:
+    """Test that requests spaced by a full frame are not delayed."""
+    page = Mock()
+    clock = Clock(100.0)
+    scheduler = UpdateScheduler(page, max_fps=10, clock=clock)
+
+    for _ in range(5):
+        scheduler.request_update()
+        clock.now += scheduler.min_interval
+    assert page.update.call_count == 5
+
+
+def test_invalid_frame_rate() -> None:
+    """Test that a non-positive frame rate is rejected."""
+    with pytest.raises(ValueError):
+        UpdateScheduler(Mock(), max_fps=0)
+
+
+def test_page_is_updated_under_the_given_lock() -> None:
+    """Test that controls are sent while holding the lock their writers take."""
+    lock = threading.Lock()
+    page = Mock()
+    page.update.side_effect = lambda: held.append(lock.locked())
+    held: list[bool] = []
+    scheduler = UpdateScheduler(page, max_fps=10, clock=Clock(100.0), lock=lock)
+
+    scheduler.update_now()
+
+    assert held == [True]
+    assert not lock.locked()
@@ -0,0 +1,123 @@
+"""Tests for the usage ledger."""
+
+import pytest
+
+from services.usage_ledger import UsageLedger, UsageRecord, main
+
+# 2024-01-01 10:00 UTC
+HOUR = 1704103200.0
+
+
+@pytest.fixture
+def ledger() -> UsageLedger:
+    """Create a ledger with requests for two models over two hours."""
+    ledger = UsageLedger(":memory:")
+    for i, model in enumerate(["small", "small", "large"]):
+        ledger.record(
+            UsageRecord(
+                provider="Mistral",
+                model=model,
+                prompt_tokens=10,
+                completion_tokens=100,
+                latency=2.0,
+                ttft=0.5,
+                created_at=HOUR + i * 60,
+            )
+        )
+    ledger.record(
+        UsageRecord(
+            provider="Other",
+            model="small",
+            latency=1.0,
+            cache_hit=True,
+            error="Error: down",
+            created_at=HOUR + 3600,
+        )
+    )
+    return ledger
+
+
+def test_records_newest_first(ledger: UsageLedger) -> None:
+    """Test reading back recorded requests."""
+    records = ledger.records(limit=2)
+
+    assert [record.provider for record in records] == ["Other", "Mistral"]
+    assert records[0].cache_hit is True
+    assert records[0].ttft is None
+    assert records[1].model == "large"
+
+
+def test_rollup_by_hour(ledger: UsageLedger) -> None:
+    """Test hourly rollups."""
+    first, second = ledger.rollup(by=("hour",))
+
+    assert first.key == {"hour": "2024-01-01 10:00"}
+    assert first.requests == 3
+    assert first.total_tokens == 330
+    assert first.avg_ttft == 0.5
+    assert first.tokens_per_second == pytest.approx(300 / 4.5)
+    assert second.errors == 1
+    assert second.cache_hits == 1
+    # Cached answers do not count as upstream latency
+    assert second.avg_latency == 0.0
+    assert second.tokens_per_second is None
+
+
+def test_throughput_counts_only_streamed_answers() -> None:
+    """Test that answers without a first token time add no tokens to tok/s."""
+    ledger = UsageLedger(":memory:")
+    for ttft, cache_hit in [(0.5, False), (None, False), (None, True), (0.1, True)]:
+        ledger.record(
+            UsageRecord(
+                provider="Mistral",
+                model="small",
+                completion_tokens=100,
+                latency=2.5,
+                ttft=ttft,
+                cache_hit=cache_hit,
+                created_at=HOUR,
+            )
+        )
+
+    (rollup,) = ledger.rollup(by=())
+
+    assert rollup.completion_tokens == 400
+    assert rollup.generation_time == 2.0
+    assert rollup.tokens_per_second == 50.0
+
+
+def test_rollup_by_model_and_provider(ledger: UsageLedger) -> None:
+    """Test grouping by several dimensions and filtering by time."""
+    rollups = ledger.rollup(by=("provider", "model"))
+    assert [(r.key["provider"], r.key["model"], r.requests) for r in rollups] == [
+        ("Mistral", "large", 1),
+        ("Mistral", "small", 2),
+        ("Other", "small", 1),
+    ]
+
+    recent = ledger.rollup(by=("model",), since=HOUR + 3000)
+    assert [(r.key["model"], r.requests) for r in recent] == [("small", 1)]
+
+    with pytest.raises(ValueError):
+        ledger.rollup(by=("color",))
+
+
+def test_rollup_of_empty_ledger() -> None:
+    """Test that an empty ledger has no rollups."""
+    ledger = UsageLedger(":memory:")
+
+    assert ledger.rollup(by=()) == []
+
+
+def test_cli_prints_rollups(tmp_path, capsys) -> None:
+    """Test the command line report."""
+    path = tmp_path / "usage.db"
+    ledger = UsageLedger(path)
+    ledger.record(UsageRecord(provider="Mistral", model="small", completion_tokens=5))
+    ledger.close()
+
+    main(["--db", str(path), "--by", "provider,model", "--since", "1"])
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split()[:3] == ["provider", "model", "requests"]
+    assert lines[1].split()[:4] == ["Mistral", "small", "1", "0"]